@@ -0,0 +1,437 @@
+"""
+清洗/NLP热点函数的基准测试
+- 每个函数在 synthetic_data 生成的模拟数据上运行，报告 行/秒、秒/百万行 和峰值内存（tracemalloc）
+- 仍写在notebook里的函数（filter_pet_funeral_merchants、count_no_star_merchants、classify_pet_funeral、
+  analyze_sentiment、弹幕 clean_text）直接从notebook中取出定义来测，测的就是notebook里实际运行的代码
+- 结果可存为基线（cleaning_benchmark_baseline.json），之后每次运行与基线对比，
+  秒/百万行 或 MB/百万行 比基线高出 --threshold（默认20%）的函数标记为退化，退出码为1
+- --compare 与改写前的原写法对比耗时并检查结果是否一致（文本清洗、关键词匹配、地址分区、企业登记统计）
+
+用法：python cleaning_benchmark.py [函数名前缀 ...] [--rows 100000] [--repeat 3] [--save] [--threshold 0.2]
+     python cleaning_benchmark.py --compare text_normalize [--rows 1000000]
+"""
+import argparse
+import ast
+import gc
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+import synthetic_data
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+VISUALIZATION_DIR = os.path.join(MODULE_DIR, os.pardir, 'Data Visualization Code')
+BASELINE_PATH = os.path.join(MODULE_DIR, 'cleaning_benchmark_baseline.json')
+
+DIANPING_NOTEBOOK = os.path.join(MODULE_DIR, '大众点评-数据清洗(北京.ipynb')
+DANMAKU_NOTEBOOK = os.path.join(MODULE_DIR, 'bilibili弹幕清洗.ipynb')
+PRODUCTS_NOTEBOOK = os.path.join(VISUALIZATION_DIR, '殡葬用品-可视化.ipynb')
+SENTIMENT_NOTEBOOK = os.path.join(VISUALIZATION_DIR, '评论情绪分析+总词云图.ipynb')
+
+
+def notebook_functions(path, names):
+    """
+    从notebook中取出指定函数的定义（不执行读文件、画图等其他代码）
+    执行的内容：所有单元格的import语句（缺少的可选依赖如matplotlib跳过）、
+    定义这些函数的单元格中的函数定义和全大写常量（如 TOPIC_FILTER）；同名函数取第一个定义
+    :return: {函数名: 函数}
+    """
+    with open(path, encoding='utf-8') as f:
+        cells = [''.join(c['source']) for c in json.load(f)['cells'] if c['cell_type'] == 'code']
+
+    imports, bodies, found = [], [], set()
+    for source in cells:
+        try:
+            tree = ast.parse(source)
+        except SyntaxError:  # !pip、conda install 等魔法命令
+            continue
+        imports += [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+        defined = {node.name for node in tree.body if isinstance(node, ast.FunctionDef)}
+        if not defined & (set(names) - found):
+            continue
+        for node in tree.body:
+            if isinstance(node, ast.FunctionDef) and node.name not in found:
+                bodies.append(node)
+                found.add(node.name)
+            elif isinstance(node, ast.Assign) and all(isinstance(t, ast.Name) and t.id.isupper() for t in node.targets):
+                bodies.append(node)
+    missing = set(names) - found
+    if missing:
+        raise ValueError(f"{os.path.basename(path)} 中没有找到函数：{sorted(missing)}")
+
+    namespace = {'__name__': 'notebook'}
+    for node in imports:
+        try:
+            exec(compile(ast.Module([node], []), path, 'exec'), namespace)
+        except ImportError:
+            pass
+    exec(compile(ast.Module(bodies, []), path, 'exec'), namespace)
+    return {name: namespace[name] for name in names}
+
+
+class Case:
+    """
+    一个被测函数
+    dataset: synthetic_data 中的数据集名
+    run: run(df) 执行一次被测函数
+    fraction: 实际行数 = --rows × fraction（SnowNLP等很慢的函数用较小的比例）
+    """
+
+    def __init__(self, name, dataset, run, fraction=1.0):
+        self.name = name
+        self.dataset = dataset
+        self.run = run
+        self.fraction = fraction
+
+
+def build_cases():
+    from district_geocoder import DistrictGeocoder
+    from jieba_tokenizer import tokenize_texts
+    from sentiment_cache import analyze_sentiment_column
+    from text_normalize import clean_bilibili_comment, clean_text, clean_texts, clean_weibo_comment
+
+    dianping = notebook_functions(DIANPING_NOTEBOOK, ['filter_pet_funeral_merchants', 'count_no_star_merchants'])
+    danmaku = notebook_functions(DANMAKU_NOTEBOOK, ['clean_text', 'is_relevant'])
+    topic_filter = danmaku['is_relevant'].__globals__['TOPIC_FILTER']
+    classify_pet_funeral = notebook_functions(PRODUCTS_NOTEBOOK, ['classify_pet_funeral'])['classify_pet_funeral']
+    analyze_sentiment = notebook_functions(SENTIMENT_NOTEBOOK, ['analyze_sentiment'])['analyze_sentiment']
+
+    def address_rows(addresses):
+        """逐行调用 address_to_district 的写法"""
+        geocoder = DistrictGeocoder('北京')
+        return [geocoder.geocode(address) for address in addresses]
+
+    return [
+        # 微博帖子 / 评论
+        Case('weibo.clean_text', 'weibo_posts', lambda df: [clean_text(t) for t in df['text']]),
+        Case('weibo.clean_texts', 'weibo_posts', lambda df: clean_texts(df['text'])),
+        Case('weibo_comment.clean_weibo_comment', 'weibo_comments', lambda df: df['评论内容'].map(clean_weibo_comment)),
+        Case('weibo_comment.clean_texts', 'weibo_comments', lambda df: clean_texts(df['评论内容'], kind='weibo_comment')),
+        # B站评论（原notebook中的 clean_single_comment 已移到 text_normalize.clean_bilibili_comment）
+        Case('bilibili.clean_single_comment', 'bilibili_comments',
+             lambda df: df['content'].dropna().map(clean_bilibili_comment)),
+        Case('bilibili.clean_texts', 'bilibili_comments', lambda df: clean_texts(df['content'].dropna(), kind='bilibili')),
+        Case('bilibili.tokenize_texts', 'bilibili_comments', lambda df: tokenize_texts(df['content'].dropna()), 0.2),
+        # 弹幕
+        Case('danmaku.clean_text', 'danmaku', lambda df: df['bullet_content'].map(danmaku['clean_text'])),
+        Case('danmaku.is_relevant', 'danmaku', lambda df: df['bullet_content'].map(danmaku['is_relevant'])),
+        Case('danmaku.relevant_column', 'danmaku', lambda df: topic_filter.relevant_column(df['bullet_content'].fillna(''))),
+        # 大众点评（每次新建分区器，不让上一轮的地址缓存影响计时）
+        Case('dianping.filter_pet_funeral_merchants', 'dianping', dianping['filter_pet_funeral_merchants']),
+        Case('dianping.count_no_star_merchants', 'dianping', dianping['count_no_star_merchants']),
+        Case('dianping.address_to_district', 'dianping', lambda df: address_rows(df['address'])),
+        Case('dianping.districts_for', 'dianping', lambda df: DistrictGeocoder('北京').geocode_column(df['address'])),
+        # 殡葬用品
+        Case('products.classify_pet_funeral', 'products', lambda df: df['商品名称'].apply(classify_pet_funeral)),
+        # 情感分析（SnowNLP每条约毫秒级，只测少量行；不用缓存和进程池，测单进程的打分开销）
+        Case('sentiment.analyze_sentiment', 'weibo_comments',
+             lambda df: df['评论内容'].map(clean_weibo_comment).map(analyze_sentiment), 0.02),
+        Case('sentiment.analyze_sentiment_column', 'weibo_comments',
+             lambda df: analyze_sentiment_column(clean_texts(df['评论内容'], kind='weibo_comment'), workers=1,
+                                                 cache_path=None, verbose=False), 0.02),
+    ]
+
+
+def measure(case, df, repeat=3):
+    """
+    计时取 repeat 次中最快的一次；内存另跑一次（tracemalloc 会拖慢执行，不与计时混在一起）
+    :return: 指标字典
+    """
+    case.run(df.head(100))  # 预热：jieba词典、SnowNLP模型等只在第一次调用时加载
+
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        case.run(df)
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        case.run(df)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    rows = len(df)
+    return {
+        'rows': rows,
+        'seconds': round(best, 4),
+        'rows_per_sec': round(rows / best) if best else None,
+        'sec_per_million': round(best / rows * 1e6, 2),
+        'peak_mb': round(peak / 2 ** 20, 2),
+        'mb_per_million': round(peak / 2 ** 20 / rows * 1e6, 1),
+    }
+
+
+def run_benchmarks(prefixes=None, rows=100000, repeat=3, seed=0):
+    """
+    prefixes: 只测名字以这些前缀开头的函数，None为全部
+    :return: {函数名: 指标}
+    """
+    cases = [c for c in build_cases() if not prefixes or any(c.name.startswith(p) for p in prefixes)]
+    if not cases:
+        raise ValueError(f"没有匹配的函数：{prefixes}")
+
+    datasets = {}
+    results = {}
+    for case in cases:
+        n = max(100, int(rows * case.fraction))
+        if (case.dataset, n) not in datasets:
+            datasets[(case.dataset, n)] = synthetic_data.generate(case.dataset, n, seed=seed)
+        results[case.name] = measure(case, datasets[(case.dataset, n)], repeat)
+        r = results[case.name]
+        print(f"✓ {case.name:<40}{r['rows']:>9}行 {r['seconds']:>8.3f}秒 {r['rows_per_sec']:>10}行/秒 "
+              f"{r['sec_per_million']:>9.2f}秒/百万行 {r['peak_mb']:>8.1f}MB")
+    return results
+
+
+# ---------------------- 与原写法对比 ----------------------
+def _legacy_clean_text(text):
+    """原微博爬虫中的写法：每次调用 re.sub 三遍"""
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'https?://\S+', '', text)
+    text = re.sub(r'\[.*?\]', '', text)
+    return text.strip()
+
+
+def _legacy_address_to_district(address, city):
+    """原清洗代码的写法：每次调用重建映射表，按行政区顺序逐个关键词查找"""
+    from district_geocoder import MISSING, UNKNOWN, load_gazetteer
+
+    if pd.isna(address):
+        return MISSING
+    addr = str(address).strip().replace(" ", "").lower()
+    if addr == "":
+        return MISSING
+    district_mapping = {d: list(kws) for d, kws in load_gazetteer()['cities'][city].items()}
+    for district, keywords in district_mapping.items():
+        for kw in keywords:
+            if kw in addr:
+                return district
+    return UNKNOWN
+
+
+def compare_text_normalize(n=1000000):
+    """对比原写法、预编译单条清洗、批量清洗在n条文本上的耗时"""
+    from text_normalize import clean_text, clean_texts
+
+    texts = synthetic_data.make_weibo_texts(n)
+    series = pd.Series(texts)
+    print(f"测试数据：{n}条模拟微博文本")
+
+    results = {}
+    for name, func in [
+        ('原写法（3次re.sub）', lambda: [_legacy_clean_text(t) for t in texts]),
+        ('预编译逐步替换 clean_text', lambda: [clean_text(t) for t in texts]),
+        ('批量 clean_texts(list)', lambda: clean_texts(texts)),
+        ('批量 clean_texts(Series)', lambda: clean_texts(series)),
+    ]:
+        gc.collect()
+        start = time.perf_counter()
+        output = func()
+        elapsed = time.perf_counter() - start
+        results[name] = list(output)
+        print(f"  {name:<28} {elapsed:.2f}s  ({n / elapsed:,.0f} 条/秒)")
+
+    baseline = results['原写法（3次re.sub）']
+    same = all(r == baseline for r in results.values())
+    print(f"结果与原写法一致: {'✓' if same else '✗'}")
+    return results
+
+
+def compare_keyword_matcher(n=1000000, keywords=None):
+    """对比逐个关键词 in 判断、str.contains('|'.join())、KeywordMatcher 在n条文本上的耗时"""
+    from keyword_matcher import KeywordMatcher
+
+    keywords = keywords or ['宠物殡葬', '宠物火化', '宠物善后', '宠物善终', '壁葬', '安葬', '宠物天堂', '善终',
+                            '宠物安葬', '宠物葬礼', '宠物纪念', '毛孩子殡葬', '火化', '生命纪念馆', '骨灰', '告别',
+                            '泪目', '安息', '想念', '猫咪', '宠物', '毛孩子', '纪念', '走好']
+    texts = synthetic_data.make_danmaku_texts(n)
+    series = pd.Series(texts)
+    matcher = KeywordMatcher(keywords)
+    print(f"测试数据：{n}条模拟弹幕，{len(keywords)}个关键词")
+
+    results = {}
+    for name, func in [
+        ('逐个关键词 any(kw in t)', lambda: [any(kw in t for kw in keywords) for t in texts]),
+        ("str.contains('|'.join())", lambda: series.str.contains('|'.join(keywords)).tolist()),
+        ('KeywordMatcher.contains_column', lambda: matcher.contains_column(texts)),
+    ]:
+        gc.collect()
+        start = time.perf_counter()
+        output = func()
+        elapsed = time.perf_counter() - start
+        results[name] = list(output)
+        print(f"  {name:<32} {elapsed:.2f}s  ({n / elapsed:,.0f} 条/秒)")
+
+    start = time.perf_counter()
+    naive_sets = [{kw for kw in keywords if kw in t} for t in texts]
+    naive_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    _, found = matcher.match_column(texts)
+    elapsed = time.perf_counter() - start
+    print(f"  {'逐个关键词求命中集合':<32} {naive_elapsed:.2f}s  ({n / naive_elapsed:,.0f} 条/秒)")
+    print(f"  {'KeywordMatcher.match_column':<32} {elapsed:.2f}s  ({n / elapsed:,.0f} 条/秒)")
+    same_sets = all(f == s for f, s in zip(found, naive_sets))
+
+    baseline = results['逐个关键词 any(kw in t)']
+    same = all(r == baseline for r in results.values())
+    print(f"是否命中与原写法一致: {'✓' if same else '✗'}；命中关键词集合一致: {'✓' if same_sets else '✗'}")
+    return results
+
+
+def compare_district_geocoder(n=200000):
+    """四个城市分别对比原写法（逐行apply）与整列分区的耗时，并统计最长匹配规则改变了多少结果"""
+    from district_geocoder import DistrictGeocoder, load_gazetteer
+
+    for city in load_gazetteer()['cities']:
+        addresses = pd.Series(synthetic_data.make_addresses(city, n))
+        start = time.perf_counter()
+        legacy = addresses.apply(lambda a: _legacy_address_to_district(a, city))
+        legacy_elapsed = time.perf_counter() - start
+
+        geocoder = DistrictGeocoder(city)  # 新建一个，不使用之前的缓存
+        start = time.perf_counter()
+        result = geocoder.geocode_column(addresses)
+        elapsed = time.perf_counter() - start
+
+        changed = addresses[legacy != result]
+        print(f"{city}：{n}条地址，原写法 {legacy_elapsed:.2f}s，整列分区 {elapsed:.3f}s"
+              f"（{legacy_elapsed / elapsed:.0f}倍）；最长匹配改变结果 {len(changed)} 条")
+        for address in changed.drop_duplicates().head(3):
+            print(f"   {address}: {_legacy_address_to_district(address, city)} → {geocoder.geocode(address)}")
+
+
+def compare_registry_stats(n=1000000):
+    """与原写法（整表读入 + isin + pd.to_datetime）对比结果和用时"""
+    import resource
+
+    from registry_stats import CompanyIndex, scan_registry
+
+    def peak_mb():
+        # Linux 下 ru_maxrss 单位为KB，macOS 下为字节
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+    targets = [f'宠物殡葬服务{i}（北京）有限公司' for i in range(3000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'registry.csv')
+        synthetic_data.make_registry_csv(path, n, targets)
+        print(f"测试数据：{n}行，{os.path.getsize(path) / 1e6:.0f}MB")
+
+        start = time.time()
+        stats = scan_registry(path, CompanyIndex([pd.DataFrame({'企业名称': targets})]), verbose=False)
+        streamed = time.time() - start
+        peak_streamed = peak_mb()
+
+        start = time.time()
+        df = pd.read_csv(path)
+        selected = df[df['企业名称'].isin(pd.Series(targets))].copy()
+        region_summary = selected['所属省份'].value_counts()
+        selected['成立年份'] = pd.to_datetime(selected['成立日期']).dt.year
+        yearly = selected['成立年份'].value_counts().sort_index()
+        legacy = time.time() - start
+        peak_legacy = peak_mb()
+
+    assert region_summary.sort_index().to_dict() == stats.province_summary.sort_index().to_dict()
+    assert yearly.to_dict() == dict(zip(stats.yearly_counts['成立年份'], stats.yearly_counts['企业数量']))
+    print(f"分块统计：{streamed:.2f}秒，峰值内存{peak_streamed:.0f}MB")
+    print(f"整表读入：{legacy:.2f}秒，峰值内存{peak_legacy:.0f}MB（结果一致）")
+
+
+# --compare 的名字 -> (对比函数(n), 默认行数)
+COMPARISONS = {
+    'text_normalize': (compare_text_normalize, 1000000),
+    'keyword_matcher': (compare_keyword_matcher, 1000000),
+    'district_geocoder': (compare_district_geocoder, 200000),
+    'registry_stats': (compare_registry_stats, 1000000),
+}
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    """与已有基线合并：只更新这次测过的函数"""
+    baseline = load_baseline(path) or {'results': {}}
+    baseline['environment'] = environment()
+    baseline['results'].update(results)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+    print(f"✓ 基线已保存：{path}")
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    秒/百万行、MB/百万行 比基线高出 threshold 比例的记为退化
+    :return: [(函数名, 指标, 基线值, 当前值)]
+    """
+    regressions = []
+    for name, r in results.items():
+        base = baseline['results'].get(name)
+        if not base:
+            continue
+        for key in ('sec_per_million', 'mb_per_million'):
+            if base.get(key) and r[key] > base[key] * (1 + threshold):
+                regressions.append((name, key, base[key], r[key]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="清洗/NLP函数基准测试")
+    parser.add_argument('prefixes', nargs='*', help="只测名字以这些前缀开头的函数（如 weibo dianping.districts_for）")
+    parser.add_argument('--rows', type=int, default=None, help="每个函数的测试行数，默认10万（--compare 时见 COMPARISONS）")
+    parser.add_argument('--repeat', type=int, default=3, help="计时重复次数（取最快一次）")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="基线文件路径")
+    parser.add_argument('--save', action='store_true', help="把本次结果存为基线")
+    parser.add_argument('--threshold', type=float, default=0.2, help="超过基线多少比例算退化，默认0.2")
+    parser.add_argument('--compare', choices=sorted(COMPARISONS), help="与改写前的原写法对比耗时和结果")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_func, default_rows = COMPARISONS[args.compare]
+        compare_func(args.rows or default_rows)
+        sys.exit(0)
+
+    rows = args.rows or 100000
+    print(f"测试数据：每个函数 {rows} 行（情感分析、分词按比例减少）")
+    results = run_benchmarks(args.prefixes, rows, args.repeat, args.seed)
+
+    baseline = load_baseline(args.baseline)
+    if baseline and not args.save:
+        if baseline.get('environment', {}).get('machine') != platform.machine():
+            print("注意：基线来自不同的机器，对比结果仅供参考")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n✗ {len(regressions)} 项比基线慢/占内存超过{args.threshold:.0%}：")
+            for name, key, before, after in regressions:
+                print(f"  {name} {key}: {before} -> {after}")
+            sys.exit(1)
+        print(f"\n✓ 与基线相比没有超过{args.threshold:.0%}的退化")
+    if args.save:
+        save_baseline(results, args.baseline)
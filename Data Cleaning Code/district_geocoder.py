@@ -0,0 +1,100 @@
+"""
+大众点评地址 -> 行政区（北上广深共用）
+- 地名/商圈/地标对照表放在 district_gazetteer.json（带版本号），导入后每个城市只编译一次索引
+- 一个地址里匹配到多个地名时取最长的那个（如“龙岗区龙华路”归龙岗区），同样长时按对照表中行政区的先后顺序
+- 整列处理时相同地址只解析一次，结果另有缓存，重复出现的商圈名不再重新匹配
+"""
+import json
+import os
+from functools import lru_cache
+
+import pandas as pd
+
+from keyword_matcher import KeywordMatcher
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'district_gazetteer.json')
+MISSING = "地址缺失"
+UNKNOWN = "待确认（需人工核对）"  # 未匹配到的地址
+# 爬虫和文件名里用的拼音城市名
+CITY_ALIASES = {'beijing': '北京', 'shanghai': '上海', 'guangzhou': '广州', 'shenzhen': '深圳'}
+
+
+@lru_cache(maxsize=None)
+def load_gazetteer(path=GAZETTEER_PATH):
+    """读取对照表（每个路径只读一次）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def normalize_address(address):
+    """与原清洗代码一致：去首尾空白、去空格、转小写"""
+    return str(address).strip().replace(" ", "").lower()
+
+
+class DistrictGeocoder:
+    """单个城市的地址分区器"""
+
+    def __init__(self, city, gazetteer_path=GAZETTEER_PATH):
+        gazetteer = load_gazetteer(gazetteer_path)
+        self.city = CITY_ALIASES.get(str(city).lower(), city)
+        if self.city not in gazetteer['cities']:
+            raise ValueError(f"对照表中没有城市：{city}（可选：{'、'.join(gazetteer['cities'])}）")
+        self.version = gazetteer['version']
+
+        # 关键词 -> 行政区；同一个地名出现在多个区时以先列出的为准（与原来按顺序匹配一致）
+        self.keyword_district = {}
+        self.priority = {}
+        for order, (district, keywords) in enumerate(gazetteer['cities'][self.city].items()):
+            self.priority[district] = order
+            for keyword in keywords:
+                self.keyword_district.setdefault(normalize_address(keyword), district)
+        self.matcher = KeywordMatcher(self.keyword_district)
+        self.memo = {}
+
+    def _resolve(self, addr):
+        candidates = self.matcher.longest_matches(addr)
+        if not candidates:
+            return UNKNOWN
+        best = max(candidates, key=lambda kw: (len(kw), -self.priority[self.keyword_district[kw]]))
+        return self.keyword_district[best]
+
+    def geocode(self, address):
+        """单个地址 -> 行政区 / 地址缺失 / 待确认（需人工核对）"""
+        if pd.isna(address):
+            return MISSING
+        addr = normalize_address(address)
+        if addr == "":
+            return MISSING
+        district = self.memo.get(addr)
+        if district is None:
+            district = self.memo[addr] = self._resolve(addr)
+        return district
+
+    def geocode_column(self, addresses):
+        """整列分区：先对不同的地址各解析一次，再映射回每一行；Series输入时保留原索引"""
+        series = addresses if isinstance(addresses, pd.Series) else pd.Series(list(addresses), dtype=object)
+        resolved = {address: self.geocode(address) for address in series.dropna().unique()}
+        result = series.map(resolved).fillna(MISSING)
+        result.name = 'district_cn'
+        return result if isinstance(addresses, pd.Series) else result.tolist()
+
+
+_GEOCODERS = {}
+
+
+def get_geocoder(city):
+    """每个城市的分区器只建一次"""
+    key = CITY_ALIASES.get(str(city).lower(), city)
+    if key not in _GEOCODERS:
+        _GEOCODERS[key] = DistrictGeocoder(key)
+    return _GEOCODERS[key]
+
+
+def address_to_district(address, city):
+    """单个地址分区（兼容原各城市清洗代码中的函数）"""
+    return get_geocoder(city).geocode(address)
+
+
+def districts_for(addresses, city):
+    """整列地址分区，一次调用替代 df["address"].apply(address_to_district)"""
+    return get_geocoder(city).geocode_column(addresses)
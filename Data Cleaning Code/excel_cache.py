@@ -0,0 +1,132 @@
+"""
+Excel读取缓存（清洗、可视化各阶段共用）
+- 每个工作表第一次读取时用 openpyxl 解析，结果另存为 Arrow 文件（.excel_cache/ 下），
+  之后直接内存映射读取列式缓存，不再重复解析 xlsx
+- 缓存键：文件绝对路径 + 修改时间 + 文件大小 + 工作表 + 读取参数，源文件改动后自动失效，旧缓存随之删除
+- 先写临时文件再 os.replace 原子替换，多个进程/notebook同时读同一文件也不会读到写了一半的缓存
+- 个别列类型混杂、Arrow无法表示时改存 pickle（同样不用再解析xlsx）；未安装pyarrow时直接调用 pd.read_excel
+- 列名不全是字符串（如表头里有年份数字）或不是默认索引（index_col 等）时也存 pickle：
+  Arrow 会把列名转成字符串、按自己的方式还原索引，读回来与直接读取不一致
+"""
+import glob
+import hashlib
+import os
+import pickle
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+except ImportError:  # 没有pyarrow时不使用缓存
+    pa = None
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.excel_cache')
+# 缓存格式版本，存储规则改变时加1，旧缓存自动失效
+CACHE_VERSION = 2
+
+
+def _cache_key(path, sheet_name, kwargs):
+    """
+    :return: (读取标识, 版本标识)
+    读取标识由路径、工作表和读取参数决定，用于清理同一份数据的旧缓存；版本标识随文件修改时间和大小变化
+    """
+    stat = os.stat(path)
+    source = repr((path, sheet_name, sorted(kwargs.items())))
+    path_key = hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+    version = repr((stat.st_mtime_ns, stat.st_size, pd.__version__, CACHE_VERSION))
+    return path_key, hashlib.sha1(version.encode('utf-8')).hexdigest()[:16]
+
+
+def _cacheable(sheet_name, kwargs):
+    """一次读多个工作表、或参数里有函数（converters等）时不缓存"""
+    if sheet_name is None or isinstance(sheet_name, (list, tuple)):
+        return False
+    return not any(callable(v) or isinstance(v, dict) and any(callable(x) for x in v.values())
+                   for v in kwargs.values())
+
+
+def _arrow_roundtrips(df):
+    """列名都是字符串且为默认的 0..n-1 索引时，Arrow 缓存读回来才与原DataFrame一致"""
+    index = df.index
+    return (all(isinstance(c, str) for c in df.columns)
+            and isinstance(index, pd.RangeIndex) and index.name is None and index.start == 0 and index.step == 1)
+
+
+def _write_atomic(target, write):
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _remove_stale(cache_dir, path_key, keep):
+    """删除同一份数据旧版本的缓存（其他进程可能正在删，忽略找不到的情况）"""
+    for old in glob.glob(os.path.join(cache_dir, f"{path_key}_*")):
+        if os.path.basename(old).split('.')[0] != keep and not old.endswith('.tmp'):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def read_excel(path, sheet_name=0, cache_dir=CACHE_DIR, verbose=False, **kwargs):
+    """
+    用法与 pd.read_excel 相同，返回的DataFrame与直接读取一致
+    cache_dir: 缓存目录，None为不使用缓存
+    """
+    if pa is None or cache_dir is None or not _cacheable(sheet_name, kwargs):
+        return pd.read_excel(path, sheet_name=sheet_name, **kwargs)
+
+    path = os.path.abspath(path)
+    path_key, version_key = _cache_key(path, sheet_name, kwargs)
+    name = f"{path_key}_{version_key}"
+    arrow_path = os.path.join(cache_dir, f"{name}.arrow")
+    pickle_path = os.path.join(cache_dir, f"{name}.pkl")
+
+    loaders = [
+        (arrow_path, lambda p: feather.read_table(p, memory_map=True).to_pandas()),
+        (pickle_path, pd.read_pickle),
+    ]
+    for cache_path, load in loaders:
+        try:
+            df = load(cache_path)
+        except FileNotFoundError:  # 没有缓存，或刚被其他进程当作旧缓存删掉
+            continue
+        if verbose:
+            print(f"✓ 读取缓存：{os.path.basename(path)}")
+        return df
+
+    df = pd.read_excel(path, sheet_name=sheet_name, **kwargs)
+    os.makedirs(cache_dir, exist_ok=True)
+    table = None
+    if _arrow_roundtrips(df):
+        try:
+            table = pa.Table.from_pandas(df)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass  # 混合类型的列（如数字和文字混在一列）
+    if table is not None:
+        # 不压缩，读取时才能直接内存映射
+        _write_atomic(arrow_path, lambda tmp: feather.write_feather(table, tmp, compression='uncompressed'))
+    else:
+        _write_atomic(pickle_path, lambda tmp: df.to_pickle(tmp, protocol=pickle.HIGHEST_PROTOCOL))
+    _remove_stale(cache_dir, path_key, name)
+    if verbose:
+        print(f"✓ 已解析并缓存：{os.path.basename(path)}")
+    return df
+
+
+def clear_cache(cache_dir=CACHE_DIR):
+    """删除全部缓存文件"""
+    removed = 0
+    for path in glob.glob(os.path.join(cache_dir, '*')):
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    print(f"已删除{removed}个缓存文件")
+    return removed
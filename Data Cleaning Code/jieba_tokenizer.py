@@ -0,0 +1,165 @@
+"""
+jieba分词共用模块（B站评论清洗、情感分析/词云、词频统计共用）
+- 宠物殡葬用户词典 pet_funeral_userdict.txt 与停用词在这里统一维护
+- 加载词典 + 用户词典后的前缀词典模型缓存在 .jieba_cache/ 下，之后启动直接读取缓存；
+  jieba版本或用户词典内容变化时自动重建
+- 批量分词可以分块交给进程池；count_terms 边读边分词边计数，不需要先把全部分词结果放进内存
+"""
+import hashlib
+import marshal
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import jieba
+import pandas as pd
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+USER_DICT_PATH = os.path.join(MODULE_DIR, 'pet_funeral_userdict.txt')
+CACHE_DIR = os.path.join(MODULE_DIR, '.jieba_cache')
+# 每个子任务分词的文本条数
+CHUNK_SIZE = 2000
+
+# 原B站评论清洗中使用的停用词表
+DEFAULT_STOPWORDS = frozenset({
+    "的", "了", "是", "我", "你", "他", "她", "它", "们", "在", "和", "就", "都", "而", "及", "与",
+    "也", "还", "不", "没", "有", "着", "过", "要", "会", "能", "可", "这", "那", "此", "彼",
+    "很", "非常", "比较", "太", "最", "更", "又", "再", "才", "只", "但", "却", "虽", "然",
+    "，", "。", "！", "？", "；", "：", "“", "”", "‘", "’", "（", "）", "【", "】", "、", " ",
+    "回复", "引用", "举报", "删除", "编辑", "一个", "一些", "一点", "一样"
+})
+
+_tokenizer = None
+
+
+def _cache_path(user_dict):
+    """缓存文件名包含jieba版本和用户词典内容的哈希"""
+    digest = hashlib.md5(jieba.__version__.encode())
+    if user_dict:
+        with open(user_dict, 'rb') as f:
+            digest.update(f.read())
+    return os.path.join(CACHE_DIR, f"jieba_{digest.hexdigest()[:12]}.cache")
+
+
+def load_tokenizer(user_dict=USER_DICT_PATH):
+    """新建一个已加载用户词典的jieba分词器（优先读取磁盘缓存）"""
+    tokenizer = jieba.Tokenizer()
+    cache_file = _cache_path(user_dict)
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'rb') as f:
+                tokenizer.FREQ, tokenizer.total, tokenizer.user_word_tag_tab = marshal.load(f)
+            tokenizer.initialized = True
+            return tokenizer
+        except (ValueError, EOFError, TypeError):
+            pass  # 缓存损坏时重新构建
+
+    tokenizer.initialize()
+    if user_dict:
+        tokenizer.load_userdict(user_dict)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        marshal.dump((tokenizer.FREQ, tokenizer.total, tokenizer.user_word_tag_tab), f)
+    os.replace(tmp_path, cache_file)
+    return tokenizer
+
+
+def get_tokenizer():
+    """当前进程共用的分词器，只加载一次"""
+    global _tokenizer
+    if _tokenizer is None:
+        _tokenizer = load_tokenizer()
+    return _tokenizer
+
+
+def tokenize(text, stopwords=DEFAULT_STOPWORDS):
+    """精确模式分词，去掉停用词和长度小于5的纯数字（保留年份等）"""
+    if not isinstance(text, str) or not text:
+        return []
+    return [
+        word for word in get_tokenizer().lcut(text, cut_all=False)
+        if word not in stopwords and not (word.isdigit() and len(word) < 5)
+    ]
+
+
+def _tokenize_chunk(args):
+    texts, stopwords = args
+    return [tokenize(text, stopwords) for text in texts]
+
+
+def _count_chunk(args):
+    texts, stopwords = args
+    counter = Counter()
+    for text in texts:
+        counter.update(tokenize(text, stopwords))
+    return counter
+
+
+def _chunks(texts, chunk_size, stopwords):
+    """把任意可迭代的文本按块切开（不需要先转成列表）"""
+    iterator = iter(texts)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk, stopwords
+
+
+def _run(func, texts, stopwords, workers, chunk_size):
+    """
+    workers为1时在当前进程逐块执行，否则交给进程池（结果按块的顺序返回）
+    进程池中同时提交的块最多 2×进程数：executor.map 会一次把生成器里的全部块取出提交，
+    大文件就整个进了内存；这里取回一块结果才再提交一块
+    """
+    chunks = _chunks(texts, chunk_size, stopwords)
+    if workers == 1:
+        yield from map(func, chunks)
+        return
+    window = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, initializer=get_tokenizer) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def tokenize_texts(texts, stopwords=DEFAULT_STOPWORDS, workers=1, chunk_size=CHUNK_SIZE):
+    """
+    批量分词
+    texts: Series或任意可迭代的文本
+    workers: 进程数（1为不使用进程池，None为CPU核数）
+    :return: 每条文本的词列表；Series输入时返回保留原索引的Series
+    """
+    words = [tokens for chunk in _run(_tokenize_chunk, texts, frozenset(stopwords), workers, chunk_size)
+             for tokens in chunk]
+    if isinstance(texts, pd.Series):
+        return pd.Series(words, index=texts.index, name=texts.name, dtype=object)
+    return words
+
+
+def count_terms(texts, stopwords=DEFAULT_STOPWORDS, workers=1, chunk_size=CHUNK_SIZE):
+    """
+    一遍扫描统计词频，每块分词后立即计数，不保留分词结果
+    texts: Series、列表或生成器（如逐行读取的大文件）
+    :return: Counter
+    """
+    total = Counter()
+    for counter in _run(_count_chunk, texts, frozenset(stopwords), workers, chunk_size):
+        total.update(counter)
+    return total
+
+
+def word_frequency_table(counter, top=None, min_length=1):
+    """
+    Counter -> 词频表 DataFrame[word, frequency]（按频次降序，可直接用于生成词云）
+    min_length: 词的最小长度（词云中通常去掉单字）
+    """
+    items = [(word, freq) for word, freq in counter.most_common() if len(word) >= min_length]
+    if top:
+        items = items[:top]
+    return pd.DataFrame(items, columns=['word', 'frequency'])
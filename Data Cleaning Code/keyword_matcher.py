@@ -0,0 +1,172 @@
+"""
+多关键词匹配模块（弹幕主题过滤、大众点评商家筛选共用）
+关键词集合在构建时编译成一个前缀树正则（相同前缀只比较一次，不可能开头的位置直接跳过），
+每段文本只扫描一遍，耗时只与文本长度有关，不再随关键词个数成倍增加
+- 每个位置只取最长的关键词，再展开它包含的短关键词（如“宠物殡葬”含“殡葬”），
+  得到与逐个 kw in text 判断完全一致的命中集合（相当于 Aho-Corasick 的输出表）
+"""
+import re
+
+import pandas as pd
+
+
+def _build_trie(words):
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True  # 关键词结尾
+    return trie
+
+
+def _trie_pattern(node):
+    """前缀树转正则：同一前缀只写一次，较长的分支优先，所以每个位置匹配到的是最长关键词"""
+    is_end = '' in node
+    children = [(ch, child) for ch, child in sorted(node.items()) if ch]
+    if not children:
+        return ''
+    if len(children) == 1 and not is_end:
+        ch, child = children[0]
+        return re.escape(ch) + _trie_pattern(child)
+    if all(list(child) == [''] for _, child in children):
+        group = '[' + ''.join(re.escape(ch) for ch, _ in children) + ']'  # 分支都只剩一个字
+    else:
+        group = '(?:' + '|'.join(re.escape(ch) + _trie_pattern(child) for ch, child in children) + ')'
+    return group + '?' if is_end else group
+
+
+class KeywordMatcher:
+    """
+    由一组关键词构建一次，之后反复使用
+    matcher.search(text)       是否包含任一关键词（同 any(kw in text for kw in keywords)）
+    matcher.find(text)         包含的全部关键词集合
+    matcher.match_column(col)  整列一次扫描，返回 (是否命中的bool Series, 命中关键词集合的Series)
+    """
+
+    def __init__(self, keywords, ignore_case=False):
+        """
+        keywords: 关键词的集合/列表
+        ignore_case: 是否忽略大小写（同 str.contains(case=False)）
+        """
+        words = {str(kw) for kw in keywords if kw}
+        self.keywords = frozenset(words)
+        self.ignore_case = ignore_case
+        fold = str.lower if ignore_case else (lambda s: s)
+        # 统一大小写后的关键词 -> 原关键词
+        self.originals = {}
+        for word in sorted(words):
+            self.originals.setdefault(fold(word), set()).add(word)
+        self.fold = fold
+
+        flags = re.IGNORECASE if ignore_case else 0
+        if self.originals:
+            self.pattern = re.compile(_trie_pattern(_build_trie(self.originals)), flags)
+        else:
+            self.pattern = re.compile(r'(?!)')  # 没有关键词时什么都不匹配
+
+        # 每个关键词包含的所有关键词（含自身），最长匹配展开后即得到全部命中
+        self.contained = {}
+        for word in self.originals:
+            hits = set()
+            for other, originals in self.originals.items():
+                if other in word:
+                    hits.update(originals)
+            self.contained[word] = frozenset(hits)
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def search(self, text):
+        """文本是否包含任一关键词"""
+        if not isinstance(text, str) or not text:
+            return False
+        return self.pattern.search(text) is not None
+
+    def longest_matches(self, text):
+        """每个起始位置上最长的关键词（统一大小写后），相邻位置的重叠匹配也都会找到"""
+        found = []
+        match = self.pattern.search(text)
+        while match is not None:
+            found.append(self.fold(match.group()))
+            match = self.pattern.search(text, match.start() + 1)
+        return found
+
+    def find(self, text):
+        """文本包含的全部关键词"""
+        if not isinstance(text, str) or not text:
+            return set()
+        hits = set()
+        for longest in self.longest_matches(text):
+            hits |= self.contained[longest]
+        return hits
+
+    def _prepare(self, texts):
+        items = texts.tolist() if isinstance(texts, pd.Series) else list(texts)
+        return [v if isinstance(v, str) else ('' if pd.isna(v) else str(v)) for v in items]
+
+    def contains_column(self, texts):
+        """整列判断是否包含任一关键词，Series输入时保留原索引"""
+        search = self.pattern.search
+        flags = [bool(v) and search(v) is not None for v in self._prepare(texts)]
+        if isinstance(texts, pd.Series):
+            return pd.Series(flags, index=texts.index, name=texts.name, dtype=bool)
+        return flags
+
+    def match_column(self, texts):
+        """
+        整列匹配
+        :return: (是否命中, 命中的关键词集合frozenset)；Series输入时都是保留原索引的Series，列表输入时都是列表
+        """
+        # 弹幕/店名重复很多，相同的最长匹配序列只展开一次
+        expanded = {(): frozenset()}
+        matches = []
+        for text in self._prepare(texts):
+            key = tuple(self.longest_matches(text)) if text else ()
+            hits = expanded.get(key)
+            if hits is None:
+                hits = expanded[key] = frozenset().union(*(self.contained[word] for word in key))
+            matches.append(hits)
+        flags = [bool(m) for m in matches]
+        if isinstance(texts, pd.Series):
+            return (pd.Series(flags, index=texts.index, name=texts.name, dtype=bool),
+                    pd.Series(matches, index=texts.index, name=texts.name, dtype=object))
+        return flags, matches
+
+
+class TopicFilter:
+    """
+    弹幕主题过滤的三层判断，四个关键词集合各编译一次：
+    1. 含相关关键词 → 相关
+    2. 含无关关键词 → 无关
+    3. 同时含情感词和宠物/离别场景词 → 相关
+    """
+
+    def __init__(self, relevant, irrelevant, emotion_words=(), scene_words=()):
+        self.relevant = KeywordMatcher(relevant)
+        self.irrelevant = KeywordMatcher(irrelevant)
+        self.emotion = KeywordMatcher(emotion_words)
+        self.scene = KeywordMatcher(scene_words)
+
+    def is_relevant(self, text):
+        """单条判断，结果与原来逐个关键词循环的写法一致"""
+        if not text:
+            return False
+        if self.relevant.search(text):
+            return True
+        if self.irrelevant.search(text):
+            return False
+        return self.emotion.search(text) and self.scene.search(text)
+
+    def relevant_column(self, texts):
+        """整列判断，返回bool Series（或列表）"""
+        relevant = pd.Series(self.relevant.contains_column(texts))
+        irrelevant = pd.Series(self.irrelevant.contains_column(texts))
+        emotion = pd.Series(self.emotion.contains_column(texts))
+        scene = pd.Series(self.scene.contains_column(texts))
+        flags = relevant | (~irrelevant & emotion & scene)
+        if isinstance(texts, pd.Series):
+            flags.index = texts.index
+            flags.name = texts.name
+            return flags
+        return flags.tolist()
@@ -0,0 +1,144 @@
+"""
+宠物殡葬项目的数据流水线定义（爬取结果 -> 清洗 -> 可视化），由 pipeline_runner 增量执行
+数据目录结构（爬虫把原始数据放到对应位置即可，其余文件由流水线生成）：
+    dianping/pet_funeral_{city}.xlsx                 大众点评原始数据（四个城市各一份）
+    dianping/pet_funeral_{city}_cleaned.xlsx         关键词筛选后的相关商家
+    dianping/{city}_second_cleaned.xlsx              加上行政区（district_cn）
+    charts/{city}_price_distribution.png             人均价格分布图
+    charts/{city}_rating_distribution.png            评分分布图
+    weibo/数据评论.xlsx                               微博评论原始数据
+    weibo/工作簿4.xlsx                                清洗 + 情感打分结果
+    weibo/微博词频.xlsx                               词频表
+    bilibili/bilibili.xlsx                           B站评论原始数据
+    bilibili/cleaned_bilibili.xlsx                   清洗 + 分词结果
+四个城市、微博、B站互不依赖，并行执行；只更新了微博数据时只重跑微博分支
+
+用法：python pet_funeral_pipeline.py 数据目录 [weibo dianping/北京 ...] [--workers N] [--force]
+"""
+import argparse
+import os
+import sys
+
+from district_geocoder import CITY_ALIASES
+from excel_cache import read_excel
+from pipeline_runner import Pipeline, Stage
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Data Visualization Code'))
+
+# 与各城市大众点评清洗notebook相同的筛选关键词
+CORE_KEYWORDS = ['宠物殡葬', '宠物火化', '宠物善后', '宠物善终', '壁葬', '安葬', '宠物天堂', '善终',
+                 '宠物安葬', '宠物葬礼', '宠物纪念', '毛孩子殡葬', '火化', '生命纪念馆']
+
+
+# ---------------------- 各步骤（func(inputs, outputs, **params)，在子进程中执行） ----------------------
+def filter_dianping_merchants(inputs, outputs):
+    """按关键词筛选宠物殡葬相关商家，按 name+address 去重"""
+    from keyword_matcher import KeywordMatcher
+
+    df = read_excel(inputs[0])
+    matcher = KeywordMatcher(CORE_KEYWORDS, ignore_case=True)
+    keyword_condition = (
+        matcher.contains_column(df['name'].astype(str)) |
+        matcher.contains_column(df['address'].astype(str)) |
+        matcher.contains_column(df['comment_num'].astype(str))
+    )
+    df_related = df[keyword_condition].drop_duplicates(subset=['name', 'address'], keep='first').reset_index(drop=True)
+    df_related.to_excel(outputs[0], index=False, engine='openpyxl')
+    print(f"相关商家：{len(df_related)}/{len(df)}")
+
+
+def assign_districts(inputs, outputs, city):
+    """地址 -> 行政区（district_cn列）"""
+    from district_geocoder import districts_for
+
+    df = read_excel(inputs[0])
+    df["district_cn"] = districts_for(df["address"], city)
+    df.to_excel(outputs[0], index=False, engine='openpyxl')
+
+
+def render_dianping_charts(inputs, outputs, city):
+    """人均价格柱状图 + 评分饼图"""
+    from dianping_charts import combine_cities, plot_price_distribution, plot_rating_distribution, summarize
+
+    summary = summarize(combine_cities({city: read_excel(inputs[0])}))
+    plot_price_distribution(summary, city, save_path=outputs[0])
+    plot_rating_distribution(summary, city, save_path=outputs[1])
+
+
+def score_weibo_comments(inputs, outputs, comment_column='comment'):
+    """清洗微博评论并做情感打分，去掉无法打分的行"""
+    from sentiment_cache import analyze_sentiment_column
+    from text_normalize import clean_texts
+
+    df = read_excel(inputs[0])
+    df["cleaned_comment"] = clean_texts(df[comment_column], kind="weibo_comment")
+    df[["sentiment_score", "sentiment_label"]] = analyze_sentiment_column(df["cleaned_comment"])
+    df.dropna(subset=["sentiment_score"]).to_excel(outputs[0], index=False)
+
+
+def weibo_word_frequency(inputs, outputs):
+    """
+    评论分词计数，导出词频表
+    只由输入的工作簿4.xlsx决定：不写入累计的词频库（term_frequency.sqlite），
+    输入重新清洗后旧文本的词频不会残留，其他数据目录或notebook的统计也不会混进来
+    """
+    from jieba_tokenizer import count_terms, word_frequency_table
+
+    df = read_excel(inputs[0])
+    texts = [t for t in df["cleaned_comment"] if isinstance(t, str) and t]
+    word_frequency_table(count_terms(texts), min_length=2).to_excel(outputs[0], index=False)
+
+
+def clean_bilibili_comments(inputs, outputs):
+    """B站评论：去重、去空、去短评论，清洗后分词（与 bilibili评论清洗.ipynb 相同）"""
+    from jieba_tokenizer import tokenize_texts
+    from text_normalize import clean_texts
+
+    df = read_excel(inputs[0], engine="openpyxl")
+    df = df.drop_duplicates(subset=["content"]).dropna(subset=["content"])
+    df = df[df["content"].str.len() >= 2].reset_index(drop=True)
+    df["cleaned_content"] = clean_texts(df["content"], kind="bilibili")
+    df = df[df["cleaned_content"].str.len() >= 2].reset_index(drop=True)
+    df["segmented_words"] = tokenize_texts(df["cleaned_content"])
+    df["segmented_text"] = df["segmented_words"].apply(lambda x: " ".join(x))
+    df[["content", "cleaned_content", "segmented_words", "segmented_text"]].to_excel(
+        outputs[0], index=False, engine="openpyxl")
+
+
+# ---------------------- 流水线 ----------------------
+def build_pipeline(data_dir):
+    def path(*parts):
+        return os.path.join(data_dir, *parts)
+
+    stages = []
+    for slug, city in CITY_ALIASES.items():
+        raw = path('dianping', f'pet_funeral_{slug}.xlsx')
+        related = path('dianping', f'pet_funeral_{slug}_cleaned.xlsx')
+        districts = path('dianping', f'{slug}_second_cleaned.xlsx')
+        stages += [
+            Stage(f'dianping/{city}/筛选', 'pet_funeral_pipeline:filter_dianping_merchants', [raw], [related]),
+            Stage(f'dianping/{city}/行政区', 'pet_funeral_pipeline:assign_districts', [related], [districts],
+                  {'city': city}),
+            Stage(f'dianping/{city}/图表', 'pet_funeral_pipeline:render_dianping_charts', [districts],
+                  [path('charts', f'{slug}_price_distribution.png'), path('charts', f'{slug}_rating_distribution.png')],
+                  {'city': city}),
+        ]
+    stages += [
+        Stage('weibo/情感分析', 'pet_funeral_pipeline:score_weibo_comments',
+              [path('weibo', '数据评论.xlsx')], [path('weibo', '工作簿4.xlsx')]),
+        Stage('weibo/词频', 'pet_funeral_pipeline:weibo_word_frequency',
+              [path('weibo', '工作簿4.xlsx')], [path('weibo', '微博词频.xlsx')]),
+        Stage('bilibili/评论清洗', 'pet_funeral_pipeline:clean_bilibili_comments',
+              [path('bilibili', 'bilibili.xlsx')], [path('bilibili', 'cleaned_bilibili.xlsx')]),
+    ]
+    return Pipeline(stages)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="宠物殡葬数据流水线（只重跑输入有变化的步骤）")
+    parser.add_argument('data_dir', help="数据目录")
+    parser.add_argument('targets', nargs='*', help="只运行这些步骤或分支（如 weibo、dianping/北京），默认全部")
+    parser.add_argument('--workers', type=int, default=None, help="并行进程数，默认CPU核数")
+    parser.add_argument('--force', action='store_true', help="忽略运行记录，全部重跑")
+    args = parser.parse_args()
+    build_pipeline(args.data_dir).run(args.targets, workers=args.workers, force=args.force)
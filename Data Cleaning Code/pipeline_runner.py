@@ -0,0 +1,292 @@
+"""
+增量流水线（爬取结果 -> 清洗 -> 可视化）
+- 每个步骤（Stage）声明输入文件和输出文件，步骤之间的依赖由“谁的输出是谁的输入”自动得出
+- 输入文件按内容哈希（sha256）做指纹；指纹、步骤参数都与上次成功运行相同且输出文件都在时跳过该步骤
+  （文件哈希按 路径+修改时间+大小 缓存，没改过的大文件不会重复读取；只是重新保存、内容没变时下游也不会重跑）
+- xlsx 每次保存都会把创建/修改时间写进 docProps/core.xml，同样的数据保存两次字节也不同，
+  所以 xlsx 只对压缩包里除 core.xml 以外的各部分（工作表、样式、共享字符串等）做哈希
+- 互不依赖的分支（如四个城市、三个平台）交给进程池并行执行
+- 运行记录存在 SQLite（pipeline_state.sqlite）
+"""
+import hashlib
+import importlib
+import os
+import sqlite3
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+DEFAULT_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeline_state.sqlite')
+
+# xlsx 中只记录创建者和保存时间的部分，不参与哈希
+XLSX_VOLATILE_PARTS = {'docProps/core.xml'}
+
+RAN = '已运行'
+SKIPPED = '未变化，跳过'
+FAILED = '失败'
+BLOCKED = '上游失败，未运行'
+
+
+def _content_hash(path):
+    """文件内容的sha256；xlsx 按各部分解压后的内容计算，不受保存时间影响"""
+    digest = hashlib.sha256()
+    if path.lower().endswith('.xlsx') and zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in sorted(archive.namelist()):
+                if name in XLSX_VOLATILE_PARTS:
+                    continue
+                digest.update(name.encode('utf-8') + b'\0')
+                with archive.open(name) as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(block)
+        return digest.hexdigest()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _resolve(func):
+    """'模块名:函数名' -> 函数（在子进程中导入，避免传递函数对象）"""
+    if callable(func):
+        return func
+    module_name, func_name = func.split(':')
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _run_stage(func, inputs, outputs, params):
+    """子进程中执行一个步骤，返回用时"""
+    start = time.time()
+    for path in outputs:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    _resolve(func)(inputs, outputs, **params)
+    missing = [path for path in outputs if not os.path.exists(path)]
+    if missing:
+        raise RuntimeError(f"步骤执行完但没有生成输出文件：{missing}")
+    return time.time() - start
+
+
+class Stage:
+    """
+    流水线中的一个步骤
+    func: 'module:function' 或模块级函数，调用方式 func(inputs, outputs, **params)
+    inputs/outputs: 文件路径列表
+    params: 额外参数（参与指纹计算，参数改了也会重跑）
+    """
+
+    def __init__(self, name, func, inputs, outputs, params=None):
+        self.name = name
+        self.func = func
+        self.inputs = [os.path.abspath(p) for p in inputs]
+        self.outputs = [os.path.abspath(p) for p in outputs]
+        self.params = params or {}
+
+    @property
+    def func_name(self):
+        if callable(self.func):
+            return f"{self.func.__module__}:{self.func.__qualname__}"
+        return self.func
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+class PipelineState:
+    """文件哈希缓存 + 每个步骤上次成功运行时的指纹"""
+
+    def __init__(self, db_path=DEFAULT_STATE_PATH):
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER,
+                size INTEGER,
+                sha256 TEXT
+            );
+            CREATE TABLE IF NOT EXISTS stage_runs (
+                stage TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                finished_at TEXT,
+                seconds REAL
+            );
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def file_hash(self, path):
+        """文件内容的sha256（见 _content_hash）；修改时间和大小都没变时直接用上次的结果"""
+        stat = os.stat(path)
+        row = self.conn.execute(
+            "SELECT sha256 FROM file_hashes WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (path, stat.st_mtime_ns, stat.st_size)
+        ).fetchone()
+        if row:
+            return row[0]
+        sha256 = _content_hash(path)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, mtime_ns, size, sha256) VALUES (?, ?, ?, ?)",
+                (path, stat.st_mtime_ns, stat.st_size, sha256)
+            )
+        return sha256
+
+    def fingerprint(self, stage):
+        """步骤函数 + 参数 + 每个输入文件的内容哈希"""
+        digest = hashlib.sha256(repr((stage.func_name, sorted(stage.params.items()))).encode('utf-8'))
+        for path in stage.inputs:
+            digest.update(path.encode('utf-8'))
+            digest.update(self.file_hash(path).encode())
+        return digest.hexdigest()
+
+    def last_fingerprint(self, stage_name):
+        row = self.conn.execute("SELECT fingerprint FROM stage_runs WHERE stage = ?", (stage_name,)).fetchone()
+        return row[0] if row else None
+
+    def record(self, stage_name, fingerprint, seconds):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO stage_runs (stage, fingerprint, finished_at, seconds) VALUES (?, ?, ?, ?)",
+                (stage_name, fingerprint, time.strftime("%Y-%m-%d %H:%M:%S"), seconds)
+            )
+
+
+class Pipeline:
+    """
+    pipeline = Pipeline([Stage(...), ...])
+    pipeline.run()                    运行全部（输入没变的步骤跳过）
+    pipeline.run(targets=['weibo'])   只运行名字以 weibo/ 开头的步骤及其上游
+    """
+
+    def __init__(self, stages, state_path=DEFAULT_STATE_PATH):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"步骤名重复：{stage.name}")
+            self.stages[stage.name] = stage
+        self.state_path = state_path
+
+        self.producer = {}
+        for stage in stages:
+            for path in stage.outputs:
+                if path in self.producer:
+                    raise ValueError(f"{path} 同时是 {self.producer[path]} 和 {stage.name} 的输出")
+                self.producer[path] = stage.name
+        # 上游步骤：输入文件由哪些步骤生成
+        self.upstream = {
+            stage.name: {self.producer[p] for p in stage.inputs if p in self.producer}
+            for stage in stages
+        }
+        self.order = self._topological_order()
+
+    def _topological_order(self):
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"步骤之间存在循环依赖：{name}")
+            visiting.add(name)
+            for upstream in sorted(self.upstream[name]):
+                visit(upstream)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _select(self, targets):
+        """目标步骤（名字相同或以“目标/”开头）及其全部上游"""
+        if not targets:
+            return set(self.stages)
+        selected = set()
+        pending = [name for name in self.stages
+                   if any(name == t or name.startswith(t.rstrip('/') + '/') for t in targets)]
+        if not pending:
+            raise ValueError(f"没有匹配的步骤：{targets}")
+        while pending:
+            name = pending.pop()
+            if name not in selected:
+                selected.add(name)
+                pending.extend(self.upstream[name])
+        return selected
+
+    def run(self, targets=None, workers=None, force=False):
+        """
+        workers: 并行进程数，None为CPU核数，1为在当前进程依次执行
+        force: 忽略指纹，全部重跑
+        :return: {步骤名: 运行结果}
+        """
+        selected = self._select(targets)
+        remaining = [name for name in self.order if name in selected]
+        status = {}
+        state = PipelineState(self.state_path)
+        executor = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+        running = {}  # future -> (步骤名, 指纹)
+        start_time = time.time()
+
+        def finish(name, fingerprint, get_seconds):
+            try:
+                seconds = get_seconds()
+            except Exception as e:
+                status[name] = FAILED
+                print(f"✗ {name} 失败：{e}")
+                return
+            state.record(name, fingerprint, seconds)
+            status[name] = RAN
+            print(f"✓ {name} 完成，用时{seconds:.1f}秒")
+
+        try:
+            while remaining or running:
+                # 按拓扑顺序提交上游都已结束的步骤（不用进程池时在这里直接执行）
+                for name in list(remaining):
+                    upstream = self.upstream[name] & selected
+                    if any(status.get(u) in (FAILED, BLOCKED) for u in upstream):
+                        status[name] = BLOCKED
+                        print(f"✗ {name} 跳过：上游步骤失败")
+                        remaining.remove(name)
+                        continue
+                    if not all(u in status for u in upstream):
+                        continue
+                    remaining.remove(name)
+                    stage = self.stages[name]
+                    missing = [p for p in stage.inputs if not os.path.exists(p)]
+                    if missing:
+                        status[name] = FAILED
+                        print(f"✗ {name} 缺少输入文件：{missing}")
+                        continue
+                    fingerprint = state.fingerprint(stage)
+                    outputs_ready = all(os.path.exists(p) for p in stage.outputs)
+                    if not force and outputs_ready and state.last_fingerprint(name) == fingerprint:
+                        status[name] = SKIPPED
+                        print(f"- {name} 输入未变化，跳过")
+                        continue
+                    print(f"▶ {name} 开始运行")
+                    if executor:
+                        future = executor.submit(_run_stage, stage.func, stage.inputs, stage.outputs, stage.params)
+                        running[future] = (name, fingerprint)
+                    else:
+                        finish(name, fingerprint,
+                               lambda: _run_stage(stage.func, stage.inputs, stage.outputs, stage.params))
+
+                if running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name, fingerprint = running.pop(future)
+                        finish(name, fingerprint, future.result)
+        finally:
+            if executor:
+                executor.shutdown(wait=True)
+            state.close()
+
+        counts = {result: sum(1 for s in status.values() if s == result) for result in (RAN, SKIPPED, FAILED, BLOCKED)}
+        print(f"\n流水线结束，用时{time.time() - start_time:.1f}秒："
+              + "，".join(f"{k}{v}个" for k, v in counts.items() if v))
+        return status
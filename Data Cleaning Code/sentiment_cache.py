@@ -0,0 +1,163 @@
+"""
+SnowNLP情感打分（多进程 + 结果缓存）
+- 整列中相同的清洗后文本只打一次分
+- 分数存在 SQLite（sentiment_cache.sqlite），键为 文本sha1 + 模型版本（snownlp版本号 + 情感模型文件哈希），
+  重新运行时只给新增的评论打分；重新训练或升级SnowNLP后模型版本变化，旧分数自动失效
+- 需要打分的文本分块交给进程池，每个子进程只加载一次模型
+"""
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sentiment_cache.sqlite')
+# 少于这么多条待打分文本时直接在当前进程计算（启动进程池反而更慢）
+MIN_PARALLEL = 2000
+# 每个子任务的文本条数
+CHUNK_SIZE = 500
+
+
+@lru_cache(maxsize=None)
+def model_version():
+    """snownlp版本 + 实际加载的情感模型文件内容哈希"""
+    from importlib.metadata import version
+    from snownlp import sentiment
+
+    model_path = sentiment.data_path + '.3'  # Python3下Bayes.load读取带.3后缀的文件
+    if not os.path.exists(model_path):
+        model_path = sentiment.data_path
+    digest = hashlib.sha1()
+    with open(model_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return f"snownlp-{version('snownlp')}-{digest.hexdigest()[:12]}"
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def score_chunk(texts):
+    """子进程中执行：给一块文本打分（snownlp在子进程中首次导入时加载模型）"""
+    from snownlp import SnowNLP
+    return [SnowNLP(text).sentiments for text in texts]
+
+
+def label_sentiment(score):
+    """与原分析代码相同的阈值：>=0.6积极，<=0.4消极，其余中性；无分数为未知"""
+    if pd.isna(score):
+        return "未知"
+    if score >= 0.6:
+        return "积极"
+    if score <= 0.4:
+        return "消极"
+    return "中性"
+
+
+class SentimentCache:
+    """情感分数缓存，text_hash + model 为主键"""
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, model=None):
+        self.db_path = db_path
+        self.model = model or model_version()
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scores (
+                text_hash TEXT,
+                model TEXT,
+                score REAL,
+                PRIMARY KEY (text_hash, model)
+            )
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def lookup(self, hashes, batch_size=500):
+        """批量查询，返回 {text_hash: score}"""
+        found = {}
+        for start in range(0, len(hashes), batch_size):
+            batch = hashes[start:start + batch_size]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.conn.execute(
+                f"SELECT text_hash, score FROM scores WHERE model = ? AND text_hash IN ({placeholders})",
+                [self.model, *batch]
+            )
+            found.update(rows)
+        return found
+
+    def store(self, scores):
+        """scores: {text_hash: score}"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO scores (text_hash, model, score) VALUES (?, ?, ?)",
+            [(h, self.model, s) for h, s in scores.items()]
+        )
+        self.conn.commit()
+
+
+def score_texts(texts, workers=None, cache_path=DEFAULT_CACHE_PATH, chunk_size=CHUNK_SIZE, verbose=True):
+    """
+    批量情感打分
+    texts: 清洗后的文本（Series或列表），空文本/非字符串得分为NaN
+    workers: 进程数，None为CPU核数；1为不使用进程池
+    cache_path: 缓存数据库路径，None为不使用缓存
+    :return: 与输入等长的分数列表（未四舍五入）
+    """
+    items = texts.tolist() if isinstance(texts, pd.Series) else list(texts)
+    unique_texts = list(dict.fromkeys(t for t in items if isinstance(t, str) and t))
+    hashes = {t: text_hash(t) for t in unique_texts}
+
+    cache = SentimentCache(cache_path) if cache_path else None
+    known = cache.lookup(list(hashes.values())) if cache else {}
+    pending = [t for t in unique_texts if hashes[t] not in known]
+    if verbose:
+        print(f"共{len(items)}条文本，去重后{len(unique_texts)}条，缓存命中{len(unique_texts) - len(pending)}条，"
+              f"需要打分{len(pending)}条")
+
+    def collect(chunks, results):
+        for done, (chunk, scores) in enumerate(zip(chunks, results), 1):
+            chunk_scores = {hashes[t]: s for t, s in zip(chunk, scores)}
+            known.update(chunk_scores)
+            if cache:
+                cache.store(chunk_scores)  # 每块算完就写入，中断后已算的部分不会丢
+            if verbose and done % 20 == 0:
+                print(f"  进度 {min(done * chunk_size, len(pending))}/{len(pending)}")
+
+    if pending:
+        start_time = time.time()
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        if workers == 1 or len(pending) < MIN_PARALLEL:
+            collect(chunks, map(score_chunk, chunks))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                collect(chunks, executor.map(score_chunk, chunks))
+        if verbose:
+            print(f"打分完成，用时{time.time() - start_time:.1f}秒")
+    if cache:
+        cache.close()
+
+    return [known[hashes[t]] if isinstance(t, str) and t else np.nan for t in items]
+
+
+def analyze_sentiment_column(texts, workers=None, cache_path=DEFAULT_CACHE_PATH, verbose=True):
+    """
+    整列情感分析，替代 df["cleaned_comment"].apply(analyze_sentiment)
+    :return: DataFrame[sentiment_score(保留4位小数), sentiment_label]，Series输入时保留原索引
+    """
+    scores = pd.Series(score_texts(texts, workers, cache_path, verbose=verbose), dtype=float).round(4)
+    if isinstance(texts, pd.Series):
+        scores.index = texts.index
+    return pd.DataFrame({'sentiment_score': scores, 'sentiment_label': scores.map(label_sentiment)})
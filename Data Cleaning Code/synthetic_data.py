@@ -0,0 +1,283 @@
+"""
+模拟数据生成（清洗/NLP基准测试用，见 cleaning_benchmark.py）
+列结构与 codebook/ 和 data samples/ 一致，文本里带上真实数据中常见的噪声
+（HTML标签、链接、[表情]、@用户、#话题#、换行、英文标点），缺失比例参照 codebook 中的缺失率
+同样的 n 和 seed 总是生成同样的数据；一百万行以内几秒到十几秒
+"""
+import random
+
+import numpy as np
+import pandas as pd
+
+from district_geocoder import load_gazetteer
+
+PET_WORDS = ['宠物', '猫咪', '狗狗', '毛孩子', '小猫', '小狗', '主子', '兔子', '仓鼠']
+FUNERAL_WORDS = ['火化', '殡葬', '安葬', '骨灰盒', '告别', '纪念', '一路走好', '安息', '送最后一程', '善终']
+FEELING_WORDS = ['泪目', '难过', '心疼', '感动', '想念', '不舍', '谢谢', '温暖', '哭了', '怀念']
+CHAT_WORDS = ['今天', '真的', '我家', '十五年', '陪伴', '服务很好', '价格', '推荐', '这个UP主', '画面', 'BGM好听',
+              '哈哈哈', '天气不错', '前排', '打卡', '学习', '了', '吗', '啊', '的']
+EMOTICONS = ['[泪]', '[心]', '[doge]', '[哭哭]', '[热词系列_保护]', '[tv_点赞]', '[老鼠]']
+EMOJIS = ['😭', '❤️', '🙏', '🐱', '🐶', '✨']
+LOCATIONS = ['来自北京', '来自上海', '来自广东', '来自浙江', '来自四川', '来自江苏', '来自湖北', '来自贵州']
+
+SHOP_KEYWORDS = ['宠物殡葬', '宠物火化', '宠物善终', '生命纪念馆', '宠物天堂', '宠物安葬', '毛孩子殡葬', '善终']
+SHOP_OTHERS = ['宠物医院', '宠物店', '宠物美容', '宠物寄养', '水族馆', '猫咖']
+STARS = ['5.0分', '4.5分', '4.0分', '3.5分', '3.0分', '0.0分']
+
+# 殡葬用品（dearpet 商品名为繁体）
+PRODUCT_WORDS = ['骨灰罐', '骨灰盒', '骨灰吊墜', '骨灰項鍊', '紀念相框', '鑰匙圈', '水晶玻璃', '時光沙漏', '毛髮收藏',
+                 '肖像', '線香', '蠟燭', '銅磬', '香插', '祈念台', '鋪巾', '花瓶', '燈籠', '寵物', '客製', '毛孩',
+                 '回憶之橋', '組合', '照片款']
+
+
+def _pick(rng, words, low, high):
+    return ''.join(rng.choice(words) for _ in range(rng.randint(low, high)))
+
+
+def _with_missing(values, rate, rng):
+    """按缺失率把部分值换成None"""
+    return [None if rng.random() < rate else v for v in values]
+
+
+def _timestamps(rng, n, start='2024-01-01', days=700):
+    base = pd.Timestamp(start).value // 10 ** 9
+    return base + rng.integers(0, days * 86400, n)
+
+
+# ---------------------- 大众点评商家 ----------------------
+def make_addresses(city, n, seed=0):
+    """用对照表里的地名拼出模拟地址（商圈名、“A/B”组合、带门牌的完整地址、缺失值）"""
+    rng = random.Random(seed)
+    districts = list(load_gazetteer()['cities'][city].values())
+    keywords = [kw for kws in districts for kw in kws]
+    suffixes = ['', '', '路88号', '大街12号', '商业区', '附近']
+    addresses = []
+    for _ in range(n):
+        roll = rng.random()
+        if roll < 0.02:
+            addresses.append(None)
+        elif roll < 0.2:
+            area = rng.choice(districts)  # 大众点评的“A/B”是同一区里相邻的两个商圈
+            addresses.append(f"{rng.choice(area)}/{rng.choice(area)}")
+        elif roll < 0.25:
+            addresses.append(rng.choice(['未知地点', '郊区', '']))
+        else:
+            addresses.append(rng.choice(keywords) + rng.choice(suffixes))
+    return addresses
+
+
+def make_dianping_shops(n, city='北京', seed=0):
+    """列同 [samples]大众点评数据（北上广深）：page, index, name, link, address, avg_price, comment_num, star"""
+    rng = random.Random(seed)
+    nrng = np.random.default_rng(seed)
+    names = []
+    for _ in range(n):
+        if rng.random() < 0.65:
+            names.append(f"{_pick(rng, ['暮光', '星河', '彩虹桥', '七彩桥', '度宠', '吉祥', '安心'], 1, 2)}"
+                         f"·{rng.choice(SHOP_KEYWORDS)}{rng.choice(['', '服务中心', '告别', '驿站'])}")
+        else:
+            names.append(f"{_pick(rng, ['爱宠', '萌宠', '乐乐', '阿福'], 1, 2)}{rng.choice(SHOP_OTHERS)}")
+    addresses = make_addresses(city, n, seed)
+    prices = nrng.integers(150, 3000, n)
+    has_price = nrng.random(n) < 0.6
+    df = pd.DataFrame({
+        'page': np.arange(n) // 15 + 1,
+        'index': np.arange(n) % 15 + 1,
+        'name': names,
+        'link': [f"https://www.dianping.com/shop/{rng.getrandbits(64):016x}" for _ in range(n)],
+        'address': addresses,
+        'avg_price': np.where(has_price, pd.Series(prices).map('人均 ￥{}'.format), '人均 -'),
+        'comment_num': nrng.integers(0, 800, n),
+        'star': nrng.choice(STARS, n, p=[0.25, 0.2, 0.15, 0.05, 0.05, 0.3]),
+    })
+    # 列表页翻页时会重复出现同一家店
+    duplicates = nrng.random(n) < 0.05
+    df.loc[duplicates, ['name', 'address']] = df[['name', 'address']].shift(1)[duplicates].values
+    return df
+
+
+# ---------------------- 微博 ----------------------
+def make_weibo_texts(n, seed=0):
+    """带HTML标签、链接、表情代码的模拟微博文本"""
+    rng = random.Random(seed)
+    pieces = ['宠物殡葬', '毛孩子', '一路走好', '火化', '骨灰盒', '纪念', '服务很贴心', 'RIP', '想念你',
+              '<a href="/n/用户">@用户</a>', '<br />', 'https://t.cn/A6abcdEf', '[泪]', '[心]', '[doge]', ' ']
+    return [''.join(rng.choice(pieces) for _ in range(rng.randint(3, 12))) for _ in range(n)]
+
+
+def make_weibo_posts(n, seed=0):
+    """搜索接口爬下来的帖子（get_weibo_posts 清洗前的 text）"""
+    nrng = np.random.default_rng(seed)
+    mids = 5100000000000000 + np.arange(n)
+    return pd.DataFrame({
+        'id': mids.astype(str),
+        'mid': mids.astype(str),
+        'created_at': pd.to_datetime(_timestamps(nrng, n), unit='s').strftime('%a %b %d %H:%M:%S +0800 %Y'),
+        'text': make_weibo_texts(n, seed),
+        'attitudes_count': nrng.integers(0, 5000, n),
+        'comments_count': nrng.integers(0, 800, n),
+        'reposts_count': nrng.integers(0, 300, n),
+    })
+
+
+def weibo_comment_text(rng):
+    parts = [_pick(rng, PET_WORDS + FUNERAL_WORDS + FEELING_WORDS + CHAT_WORDS, 2, 18)]
+    roll = rng.random()
+    if roll < 0.15:
+        parts.append(rng.choice(EMOJIS))
+    elif roll < 0.25:
+        parts.append(' https://t.cn/A6' + ''.join(rng.choice('abcdefXYZ0123') for _ in range(6)))
+    elif roll < 0.3:
+        parts.insert(0, f"回复@用户{rng.randint(1, 9999)}:")
+    if rng.random() < 0.2:
+        parts.append('！！' if rng.random() < 0.5 else '...')
+    return ''.join(parts)
+
+
+def make_weibo_comments(n, seed=0):
+    """列同 微博评论批量获取.COMMENT_COLUMNS / [samples]微博数据评论"""
+    rng = random.Random(seed)
+    nrng = np.random.default_rng(seed)
+    weibo_ids = 5227850000000000 + nrng.integers(0, max(1, n // 50), n)
+    return pd.DataFrame({
+        'max_id': 138888000000000 + nrng.integers(0, 10 ** 6, n),
+        '微博id': weibo_ids.astype(str),
+        '评论页码': nrng.integers(1, 11, n),
+        '评论id': (5227860000000000 + np.arange(n)).astype(str),
+        '评论时间': pd.to_datetime(_timestamps(nrng, n), unit='s').strftime('%Y-%m-%d %H:%M:%S'),
+        '评论点赞数': nrng.integers(0, 500, n),
+        '评论者IP归属地': nrng.choice(LOCATIONS, n),
+        '评论者姓名': [f"{rng.choice(['娜就吃点锅巴', '荆棘', '十二画', '小太阳_', '奶茶爱好者'])}{rng.randint(1, 9999)}"
+                  for _ in range(n)],
+        '评论者id': nrng.integers(10 ** 9, 10 ** 10, n),
+        '评论者性别': nrng.choice(['男', '女', '未知'], n, p=[0.3, 0.65, 0.05]),
+        '评论者关注数': nrng.integers(0, 2000, n),
+        '评论者粉丝数': nrng.integers(0, 5000, n),
+        '评论内容': _with_missing([weibo_comment_text(rng) for _ in range(n)], 0.0025, rng),
+    })
+
+
+# ---------------------- B站评论 ----------------------
+def bilibili_comment_text(rng):
+    parts = []
+    for _ in range(rng.randint(1, 4)):
+        parts.append(_pick(rng, PET_WORDS + FUNERAL_WORDS + FEELING_WORDS + CHAT_WORDS, 2, 10))
+        roll = rng.random()
+        if roll < 0.3:
+            parts.append(rng.choice(EMOTICONS))
+        elif roll < 0.4:
+            parts.append(rng.choice([',', '.', '?', '!']))
+        elif roll < 0.5:
+            parts.append('\n')
+    if rng.random() < 0.05:
+        parts.append(f" b23.tv/{rng.getrandbits(24):06x}")
+    if rng.random() < 0.05:
+        parts.insert(0, f"@bili_{rng.randint(1, 99999)} ")
+    if rng.random() < 0.03:
+        parts.append('#宠物殡葬#')
+    return ''.join(parts)
+
+
+def make_bilibili_comments(n, seed=0):
+    """列同 [samples]B站弹幕数据_10rows（评论接口导出，content 列为评论内容）"""
+    rng = random.Random(seed)
+    nrng = np.random.default_rng(seed)
+    contents = [bilibili_comment_text(rng) for _ in range(n)]
+    # 刷屏的重复评论
+    for i in np.flatnonzero(nrng.random(n) < 0.03):
+        contents[i] = contents[i - 1]
+    comment_ids = 3357600000 + np.arange(n)
+    create_time = _timestamps(nrng, n, '2020-08-01', 1900)
+    return pd.DataFrame({
+        'comment_id': comment_ids,
+        'parent_comment_id': np.where(nrng.random(n) < 0.2, comment_ids - nrng.integers(1, 50, n), 0),
+        'create_time': create_time,
+        'video_id': 371839463 + nrng.integers(0, max(1, n // 500), n),
+        'content': _with_missing(contents, 0.0042, rng),
+        'user_id': nrng.integers(10 ** 7, 10 ** 9, n),
+        'nickname': [f"bili_{rng.randint(1, 99999)}" for _ in range(n)],
+        'avatar': 'https://i0.hdslb.com/bfs/face/member/noface.jpg',
+        'sub_comment_count': nrng.integers(0, 100, n),
+        'last_modify_ts': (create_time + nrng.integers(0, 10 ** 7, n)) * 1000,
+        'like_count': nrng.integers(0, 12000, n),
+    })
+
+
+# ---------------------- B站弹幕 ----------------------
+def make_danmaku_texts(n, seed=0):
+    """只有文本的模拟弹幕（关键词匹配测试用，主题词和无关词混在一起）"""
+    rng = random.Random(seed)
+    pieces = ['宠物', '殡葬', '猫咪', '走好', '泪目了', '这个UP主', '画面', '好好告别', '哈哈哈', '想念',
+              '天气不错', '骨灰盒', '今天', '火化', 'BGM好听', '毛孩子', '一路', '安息', '了', '吗']
+    return [''.join(rng.choice(pieces) for _ in range(rng.randint(1, 8))) for _ in range(n)]
+
+
+def make_danmaku(n, seed=0):
+    """列同 codebook/B站弹幕数据 Codebook：bullet_id ... is_subtitle"""
+    rng = random.Random(seed)
+    nrng = np.random.default_rng(seed)
+    words = PET_WORDS + FUNERAL_WORDS + FEELING_WORDS + CHAT_WORDS
+    contents = [_pick(rng, words, 1, 6) + (rng.choice(EMOJIS) if rng.random() < 0.05 else '') for _ in range(n)]
+    video_ids = [f"BV1{rng.getrandbits(40):010x}"[:12] for _ in range(max(1, n // 2000))]
+    return pd.DataFrame({
+        'bullet_id': (1028374695128734 + np.arange(n)).astype(str),
+        'video_id': nrng.choice(video_ids, n),
+        'bullet_content': _with_missing(contents, 0.0031, rng),
+        'send_time': pd.to_datetime(_timestamps(nrng, n) * 1000 + nrng.integers(0, 1000, n), unit='ms'),
+        'user_id': _with_missing(nrng.integers(10 ** 13, 10 ** 14, n).astype(str).tolist(), 0.0125, rng),
+        'user_nickname': _with_missing([f"弹幕用户{rng.randint(1, 99999)}" for _ in range(n)], 0.0125, rng),
+        'bullet_type': nrng.choice(['scroll', 'top', 'bottom', 'colored', 'advanced'], n,
+                                   p=[0.8, 0.08, 0.07, 0.04, 0.01]),
+        'like_count': nrng.integers(0, 300, n),
+        'is_subtitle': nrng.random(n) < 0.01,
+    })
+
+
+# ---------------------- 殡葬用品 ----------------------
+def make_products(n, seed=0):
+    """列同 [samples]dearpet_products_with_images：页面, 商品名称, 价格, 商品图片URL, 商品图片"""
+    rng = random.Random(seed)
+    nrng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        '页面': np.arange(n) // 24 + 1,
+        '商品名称': [_pick(rng, PRODUCT_WORDS, 2, 4) for _ in range(n)],
+        '价格': pd.Series(nrng.integers(300, 25000, n)).map('NT${:,}'.format),
+        '商品图片URL': [f"https://shoplineimg.com/64a3c50d35ef770016dafae9/{rng.getrandbits(96):024x}/375x.webp"
+                    for _ in range(n)],
+        '商品图片': np.nan,
+    })
+
+
+# ---------------------- 企业登记数据 ----------------------
+def make_registry_csv(path, n, targets, seed=0, chunksize=200000):
+    """生成爱企查导出格式的登记数据CSV（其中包含名单targets里的企业），分块写入，生成时不占太多内存"""
+    rng = np.random.default_rng(seed)
+    provinces = ['北京市', '上海市', '广东省', '浙江省', '江苏省', '四川省', '湖北省', '山东省']
+    industries = ['居民服务业', '农业', '商务服务业', '批发业', '零售业']
+    hits = dict(zip(rng.choice(n, size=min(len(targets), n), replace=False).tolist(), targets))
+    for start in range(0, n, chunksize):
+        size = min(chunksize, n - start)
+        names = [hits.get(i, f'测试企业{i}有限公司') for i in range(start, start + size)]
+        pd.DataFrame({
+            '企业名称': names,
+            '法定代表人': rng.choice(['张三', '李四', '王五'], size),
+            '所属省份': rng.choice(provinces, size),
+            '所属行业': rng.choice(industries, size),
+            '成立日期': pd.to_datetime('1995-01-01') + pd.to_timedelta(rng.integers(0, 10000, size), unit='D'),
+            '注册资本': rng.integers(10, 5000, size).astype(str) + '万人民币',
+        }).to_csv(path, index=False, mode='a' if start else 'w', header=not start)
+
+
+# 数据集名 -> 生成函数(n, seed)
+GENERATORS = {
+    'dianping': make_dianping_shops,
+    'weibo_posts': make_weibo_posts,
+    'weibo_comments': make_weibo_comments,
+    'bilibili_comments': make_bilibili_comments,
+    'danmaku': make_danmaku,
+    'products': make_products,
+}
+
+
+def generate(name, n, seed=0):
+    return GENERATORS[name](n, seed=seed)
@@ -0,0 +1,190 @@
+"""
+词频持久化存储（SQLite，term_frequency.sqlite）
+- 按 (来源, 类别, 词) 累计频次，新一批评论只需分词计数后合并进来，不用重新处理全部语料
+- 评论按文本哈希记录已统计的次数，数据集增长后重新运行只统计新增的评论
+- 词云、词频统计直接查询某类别的前K个词
+- 一个来源要么由 merge_texts 按评论累计，要么由 import_table 导入现成词频表，两者不能叠加在同一个来源上
+  （同一批评论的快照和实时统计叠加会让每个词重复计数）
+"""
+import hashlib
+import os
+import sqlite3
+import time
+from collections import Counter
+
+import pandas as pd
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'term_frequency.sqlite')
+ALL = '全部'  # 不分类别时使用的类别名
+
+
+class TermFrequencyStore:
+    """
+    store.merge_texts(texts, source, category)   分词计数并合并（已统计过的评论跳过）
+    store.merge(counter, source, category)        合并现成的词频Counter
+    store.top(source, category, k)                 前K个词的词频表 DataFrame[word, frequency]
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS terms (
+                source TEXT,
+                category TEXT,
+                term TEXT,
+                frequency INTEGER,
+                PRIMARY KEY (source, category, term)
+            );
+            CREATE INDEX IF NOT EXISTS idx_terms_top ON terms (source, category, frequency DESC);
+            CREATE TABLE IF NOT EXISTS seen_texts (
+                source TEXT,
+                category TEXT,
+                text_hash TEXT,
+                count INTEGER,
+                PRIMARY KEY (source, category, text_hash)
+            );
+            CREATE TABLE IF NOT EXISTS batches (
+                source TEXT,
+                category TEXT,
+                batch_id TEXT,
+                added_at TEXT,
+                PRIMARY KEY (source, category, batch_id)
+            );
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _add_counts(self, counter, source, category):
+        self.conn.executemany(
+            "INSERT INTO terms (source, category, term, frequency) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (source, category, term) DO UPDATE SET frequency = frequency + excluded.frequency",
+            [(source, category, term, int(freq)) for term, freq in counter.items() if freq]
+        )
+
+    def merge(self, counter, source, category=ALL, batch_id=None):
+        """
+        合并一个词频Counter
+        batch_id: 批次标识，同一批次重复合并时跳过
+        :return: 是否合并
+        """
+        with self.conn:
+            if batch_id is not None:
+                inserted = self.conn.execute(
+                    "INSERT OR IGNORE INTO batches (source, category, batch_id, added_at) VALUES (?, ?, ?, ?)",
+                    (source, category, str(batch_id), time.strftime("%Y-%m-%d %H:%M:%S"))
+                ).rowcount
+                if not inserted:
+                    print(f"⚠️ 批次 {batch_id} 已合并过，跳过")
+                    return False
+            self._add_counts(counter, source, category)
+        return True
+
+    def merge_texts(self, texts, source, category=ALL, **tokenize_options):
+        """
+        对还没统计过的评论分词计数并合并
+        同一条文本出现n次、已统计过m次时只统计多出来的 n-m 次，所以数据集增长后重新运行只处理新增部分
+        tokenize_options: 传给 jieba_tokenizer.count_terms（stopwords、workers等）
+        :return: 本次统计的评论条数
+        """
+        from jieba_tokenizer import count_terms
+
+        if self.has_source(source) and not self._counts_texts(source):
+            raise ValueError(f"来源“{source}”是导入的现成词频表，不能再叠加分词计数，请换一个来源名")
+        occurrences = Counter(t for t in texts if isinstance(t, str) and t)
+        hashes = {t: hashlib.sha1(t.encode('utf-8')).hexdigest() for t in occurrences}
+        seen = {}
+        hash_list = list(hashes.values())
+        for start in range(0, len(hash_list), 500):
+            batch = hash_list[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT text_hash, count FROM seen_texts WHERE source = ? AND category = ? "
+                f"AND text_hash IN ({','.join('?' * len(batch))})",
+                [source, category, *batch]
+            )
+            seen.update(rows)
+
+        new_texts = []
+        for text, n in occurrences.items():
+            extra = n - seen.get(hashes[text], 0)
+            new_texts.extend([text] * max(extra, 0))
+        if not new_texts:
+            print(f"没有新增文本（{source}/{category}）")
+            return 0
+
+        counter = count_terms(new_texts, **tokenize_options)
+        with self.conn:
+            self._add_counts(counter, source, category)
+            self.conn.executemany(
+                "INSERT INTO seen_texts (source, category, text_hash, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (source, category, text_hash) DO UPDATE SET count = excluded.count",
+                [(source, category, hashes[t], n) for t, n in occurrences.items() if n > seen.get(hashes[t], 0)]
+            )
+        print(f"✓ {source}/{category}：新增统计{len(new_texts)}条文本，{len(counter)}个词")
+        return len(new_texts)
+
+    def import_table(self, df, source, word_col='word', freq_col='frequency', category_col=None, batch_id=None):
+        """
+        导入已有的词频表（如 微博词频_三大类别分类结果.xlsx）
+        category_col: 类别列名，None时全部记入“全部”
+        batch_id: 批次标识（如文件名），同一批次重复导入时跳过
+        """
+        if self._counts_texts(source):
+            raise ValueError(f"来源“{source}”已由merge_texts按评论统计，不能再导入词频表，请换一个来源名")
+        data = df[[word_col, freq_col] + ([category_col] if category_col else [])].dropna(subset=[word_col])
+        imported = 0
+        groups = data.groupby(category_col, sort=False) if category_col else [(ALL, data)]
+        for category, group in groups:
+            counter = Counter()
+            for word, freq in zip(group[word_col].astype(str), pd.to_numeric(group[freq_col], errors='coerce')):
+                if freq > 0:
+                    counter[word] += int(freq)
+            if self.merge(counter, source, category, batch_id):
+                imported += len(counter)
+        return imported
+
+    def has_source(self, source):
+        return self.conn.execute("SELECT 1 FROM terms WHERE source = ? LIMIT 1", (source,)).fetchone() is not None
+
+    def _counts_texts(self, source):
+        """该来源是否由merge_texts按评论统计（记录过已统计的文本）"""
+        return self.conn.execute("SELECT 1 FROM seen_texts WHERE source = ? LIMIT 1", (source,)).fetchone() is not None
+
+    def categories(self, source):
+        rows = self.conn.execute("SELECT DISTINCT category FROM terms WHERE source = ?", (source,))
+        return [row[0] for row in rows]
+
+    def top(self, source, category=None, k=None, min_frequency=1, min_length=1):
+        """
+        前K个词（按频次降序）
+        category: 类别，None时把该来源的所有类别加总
+        min_frequency: 最低频次（如 >=2 过滤低频词）
+        min_length: 词的最小长度
+        :return: DataFrame[word, frequency]
+        """
+        if category is None:
+            sql = ("SELECT term, SUM(frequency) AS freq FROM terms WHERE source = ? AND length(term) >= ? "
+                   "GROUP BY term HAVING freq >= ? ORDER BY freq DESC, term")
+            params = [source, min_length, min_frequency]
+        else:
+            sql = ("SELECT term, frequency FROM terms WHERE source = ? AND category = ? AND frequency >= ? "
+                   "AND length(term) >= ? ORDER BY frequency DESC, term")
+            params = [source, category, min_frequency, min_length]
+        if k:
+            sql += " LIMIT ?"
+            params.append(int(k))
+        return pd.DataFrame(self.conn.execute(sql, params).fetchall(), columns=['word', 'frequency'])
+
+    def frequencies(self, source, category=None, k=None, **options):
+        """前K个词的 {词: 频次}，可直接传给 WordCloud.generate_from_frequencies"""
+        table = self.top(source, category, k, **options)
+        return dict(zip(table['word'], table['frequency']))
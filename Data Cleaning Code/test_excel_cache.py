@@ -0,0 +1,37 @@
+import os
+import warnings
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from excel_cache import read_excel
+
+pytest.importorskip('pyarrow')
+
+
+def read_twice(path, cache_dir, **kwargs):
+    """第一次解析xlsx并写缓存，第二次读缓存"""
+    first = read_excel(path, cache_dir=cache_dir, **kwargs)
+    second = read_excel(path, cache_dir=cache_dir, **kwargs)
+    return first, second
+
+
+@pytest.mark.parametrize('df, kwargs, cache_ext', [
+    (pd.DataFrame({'name': ['a', 'b'], 'price': [1.5, 2.0]}), {}, '.arrow'),
+    # 表头里数字和文字混在一起：Arrow 会把 2020 变成 '2020'
+    (pd.DataFrame({'省份': ['北京', '上海'], 2020: [1, 2], 2021: [3, 4]}), {}, '.pkl'),
+    (pd.DataFrame({'name': ['a', 'b'], 'price': [1.5, 2.0]}), {'index_col': 0}, '.pkl'),
+])
+def test_cached_read_matches_direct_read(tmp_path, df, kwargs, cache_ext):
+    path = tmp_path / 'data.xlsx'
+    df.to_excel(path, index=False, engine='openpyxl')
+    cache_dir = str(tmp_path / 'cache')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')  # 不应再出现 Arrow 转换列名的警告
+        first, second = read_twice(str(path), cache_dir, **kwargs)
+
+    expected = pd.read_excel(path, **kwargs)
+    assert_frame_equal(first, expected)
+    assert_frame_equal(second, expected)
+    assert [os.path.splitext(f)[1] for f in os.listdir(cache_dir)] == [cache_ext]
@@ -0,0 +1,30 @@
+from collections import Counter
+
+from jieba_tokenizer import _run, count_terms, tokenize_texts
+
+
+def _chunk_size(args):
+    texts, _ = args
+    return len(texts)
+
+
+def test_pool_reads_input_lazily():
+    consumed = []
+
+    def texts():
+        for i in range(10000):
+            consumed.append(i)
+            yield '宠物'
+
+    results = _run(_chunk_size, texts(), frozenset(), workers=2, chunk_size=10)
+    assert next(results) == 10
+    # 最多 2×进程数 个块在进程池中，不会一次取完整个生成器
+    assert len(consumed) <= 4 * 10 + 10
+    assert sum(results) == 10000 - 10
+
+
+def test_pool_matches_single_process():
+    texts = ['宠物殡葬服务很贴心', '毛孩子一路走好', '火化和骨灰盒'] * 50
+    assert count_terms(iter(texts), workers=2, chunk_size=7) == count_terms(texts, workers=1)
+    assert tokenize_texts(texts, workers=2, chunk_size=7) == tokenize_texts(texts)
+    assert isinstance(count_terms(texts), Counter)
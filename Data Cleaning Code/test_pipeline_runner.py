@@ -0,0 +1,54 @@
+import time
+
+import pandas as pd
+
+from pipeline_runner import SKIPPED, Pipeline, PipelineState, RAN, Stage
+
+
+def write_sheet(inputs, outputs):
+    pd.read_csv(inputs[0]).to_excel(outputs[0], index=False, engine='openpyxl')
+
+
+def count_rows(inputs, outputs):
+    rows = len(pd.read_excel(inputs[0]))
+    with open(outputs[0], 'a', encoding='utf-8') as f:
+        f.write(f"{rows}\n")
+
+
+def build(tmp_path):
+    raw, sheet, counts = tmp_path / 'raw.csv', tmp_path / 'sheet.xlsx', tmp_path / 'counts.txt'
+    return Pipeline([
+        Stage('a/表格', write_sheet, [str(raw)], [str(sheet)]),
+        Stage('a/计数', count_rows, [str(sheet)], [str(counts)]),
+    ], state_path=str(tmp_path / 'state.sqlite'))
+
+
+def test_xlsx_hash_ignores_save_time(tmp_path):
+    df = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+    first, second = tmp_path / 'first.xlsx', tmp_path / 'second.xlsx'
+    df.to_excel(first, index=False, engine='openpyxl')
+    time.sleep(1.1)  # core.xml 中的时间精确到秒
+    df.to_excel(second, index=False, engine='openpyxl')
+    assert first.read_bytes() != second.read_bytes()
+
+    state = PipelineState(str(tmp_path / 'state.sqlite'))
+    try:
+        assert state.file_hash(str(first)) == state.file_hash(str(second))
+        df.assign(a=[1, 3]).to_excel(second, index=False, engine='openpyxl')
+        assert state.file_hash(str(first)) != state.file_hash(str(second))
+    finally:
+        state.close()
+
+
+def test_resaved_unchanged_xlsx_does_not_rerun_downstream(tmp_path):
+    pd.DataFrame({'a': [1, 2, 3]}).to_csv(tmp_path / 'raw.csv', index=False)
+    pipeline = build(tmp_path)
+    assert pipeline.run(workers=1) == {'a/表格': RAN, 'a/计数': RAN}
+
+    time.sleep(1.1)
+    pipeline.run(targets=['a/表格'], workers=1, force=True)  # 重新保存，内容不变
+    assert pipeline.run(workers=1)['a/计数'] == SKIPPED
+
+    pd.DataFrame({'a': [1, 2, 3, 4]}).to_csv(tmp_path / 'raw.csv', index=False)
+    assert pipeline.run(workers=1) == {'a/表格': RAN, 'a/计数': RAN}
+    assert (tmp_path / 'counts.txt').read_text(encoding='utf-8').split() == ['3', '4']
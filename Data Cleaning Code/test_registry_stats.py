@@ -0,0 +1,38 @@
+import pandas as pd
+
+from registry_stats import CompanyIndex, scan_registry
+
+
+def write_registry(path):
+    pd.DataFrame({
+        '企业名称': ['北京宠物天堂有限公司', '上海测试有限公司', '广州测试有限公司', '杭州测试有限公司'],
+        '所属省份': ['北京市', '上海市', '广东省', '浙江省'],
+        '所属行业': ['居民服务业', '农业', '批发业', '零售业'],
+        '成立日期': ['2015-03-01', '2001-01-01', '2010-06-30', '2020-12-31'],
+    }).to_csv(path, index=False)
+
+
+def test_summaries_only_contain_matched_categories(tmp_path):
+    path = tmp_path / 'registry.csv'
+    write_registry(path)
+    index = CompanyIndex([pd.DataFrame({'企业名称': ['北京宠物天堂 有限公司']})])  # 名称规范化后匹配
+
+    stats = scan_registry(str(path), index, chunksize=2, verbose=False)
+
+    # 与整表读入后 selected['所属省份'].value_counts() 一致：没有计数为0的省份
+    assert stats.province_summary.to_dict() == {'北京市': 1}
+    assert stats.industry_summary.to_dict() == {'居民服务业': 1}
+    assert stats.yearly_counts.to_dict('list') == {'成立年份': [2015], '企业数量': [1]}
+
+
+def test_counts_accumulate_across_chunks(tmp_path):
+    path = tmp_path / 'registry.csv'
+    write_registry(path)
+    index = CompanyIndex([pd.DataFrame({'企业名称': ['北京宠物天堂有限公司', '杭州测试有限公司', '上海测试有限公司']})])
+
+    stats = scan_registry(str(path), index, chunksize=1, verbose=False)
+
+    full = pd.read_csv(path)
+    expected = full[full['企业名称'].isin(index.index)]['所属省份'].value_counts()
+    assert stats.province_summary.sort_index().to_dict() == expected.sort_index().to_dict()
+    assert (stats.province_summary > 0).all()
@@ -0,0 +1,97 @@
+"""清洗函数与原notebook/爬虫中re.sub链的等价性测试（随机拼接的噪声文本）"""
+import random
+import re
+
+import pandas as pd
+import pytest
+
+from text_normalize import clean_bilibili_comment, clean_text, clean_texts, clean_weibo_comment, strip_html
+
+
+# ---------------------- 原写法（逐字照搬） ----------------------
+def legacy_clean_text(text):
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'https?://\S+', '', text)
+    text = re.sub(r'\[.*?\]', '', text)
+    return text.strip()
+
+
+def legacy_strip_html(text):
+    return re.compile(r'<[^>]+>', re.S).sub('', text)
+
+
+def legacy_clean_weibo_comment(text):
+    if pd.isna(text) or not isinstance(text, str):
+        return ""
+    text = re.sub(r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+", "", text)
+    text = re.sub(r"<.*?>", "", text)
+    text = re.sub(r"[^\u4e00-\u9fa5a-zA-Z0-9\s]", "", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+def legacy_clean_bilibili_comment(text):
+    text = str(text).strip()
+    text = re.sub(r"\[tv_\w+\]|\[热词系列_\w+\]|\[\w+\]", "", text)
+    text = re.sub(r"https?://\S+|b23.tv/\S+", "", text)
+    text = re.sub(r"@\w+|#\w+#", "", text)
+    text = re.sub(r"\n+", "。", text)
+    text = re.sub(r"\s+", " ", text)
+    text = text.replace(",", "，").replace(".", "。").replace("?", "？").replace("!", "！")
+    text = re.sub(r"[^\u4e00-\u9fa5a-zA-Z0-9\s，。！？；：“”‘’（）【】、]", "", text)
+    return text.strip()
+
+
+# 容易让合并正则与逐步替换产生差异的片段：标签、链接、表情、@、#话题#互相嵌套或首尾相接
+PIECES = ['宠物', '殡葬', 'a', 'b', 'x', '1', '.', ',', '!', '?', ' ', '\n', '\t', '[', ']', '<', '>', '/',
+          '</a>', '<br />', '<a href="/n/用户">', 'http://', 'https://', 'http://a.b/c', 't.cn/A6', 'b23.tv/',
+          'b23xtv/', '@', '@user', '#', '#话题#', '[doge]', '[tv_点赞]', '[热词系列_好耶]', '[泪]', '%2F', '“',
+          '，', '。', '😀', '_', '$', '\x00']
+
+
+def make_noisy_texts(n, seed):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(PIECES) for _ in range(rng.randint(0, 14))) for _ in range(n)]
+
+
+REVIEW_CASES = ['@userb23.tv/abc', '#话题[doge]#', '</a>]<http://a.b/c>b23.tv/abc.', '[ahttps://x[tv_点赞]]https://x']
+
+CASES = [
+    ('weibo', clean_text, legacy_clean_text),
+    ('weibo_comment', clean_weibo_comment, legacy_clean_weibo_comment),
+    ('bilibili', clean_bilibili_comment, legacy_clean_bilibili_comment),
+]
+
+
+@pytest.mark.parametrize('kind, clean, legacy', CASES, ids=[c[0] for c in CASES])
+def test_single_matches_legacy(kind, clean, legacy):
+    for text in REVIEW_CASES + make_noisy_texts(5000, seed=len(kind)):
+        assert clean(text) == legacy(text), repr(text)
+
+
+@pytest.mark.parametrize('kind, clean, legacy', CASES, ids=[c[0] for c in CASES])
+def test_batch_matches_legacy(kind, clean, legacy):
+    # 不含\x00的文本走拼接批量路径，含\x00时整块退回逐条处理，两种情况都要一致
+    texts = [t.replace('\x00', '') for t in make_noisy_texts(5000, seed=1)] + REVIEW_CASES
+    expected = [legacy(t) for t in texts]
+    assert clean_texts(texts, kind) == expected
+    assert clean_texts(pd.Series(texts), kind).tolist() == expected
+    mixed = make_noisy_texts(500, seed=2)
+    assert clean_texts(mixed, kind) == [legacy(t) for t in mixed]
+
+
+def test_batch_does_not_cross_item_boundaries():
+    texts = ['b23', 'tv/abc', '<a', 'b>', '[x', 'y]', 'http://', 'a.b']
+    for kind, _, legacy in CASES:
+        assert clean_texts(texts, kind) == [legacy(t) for t in texts]
+
+
+def test_non_text_values():
+    values = [None, float('nan'), 12, '[泪]好']
+    assert clean_texts(values, 'weibo_comment') == ['', '', '', '泪好']
+    assert clean_texts(values, 'bilibili') == [legacy_clean_bilibili_comment(v) for v in values]
+
+
+def test_strip_html_matches_legacy():
+    for text in make_noisy_texts(2000, seed=3):
+        assert strip_html(text) == legacy_strip_html(text)
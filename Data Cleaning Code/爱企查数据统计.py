@@ -3,31 +3,42 @@ import numpy as np
 import matplotlib.pyplot as plt
 from collections import defaultdict
 import warnings
+from excel_cache import read_excel
+from registry_stats import CompanyIndex, scan_registry
+from term_store import TermFrequencyStore
 warnings.filterwarnings('ignore')
-df_wordfreq = pd.read_excel('/wangziyi/工作簿4.xlsx')
-df_filtered = df_wordfreq[df_wordfreq['frequency'] >= 2].copy()  # 过滤低频词
+
+# 词频只取一个来源：评论情绪分析notebook用merge_texts增量写入的“微博评论”；
+# notebook还没运行过时改用工作簿4.xlsx快照，快照单独存为一个来源，不与实时统计叠加（同一批评论，叠加会重复计数）
+WORD_FREQ_SOURCE = '微博评论'
+SNAPSHOT_SOURCE = '微博评论-工作簿4快照'
+store = TermFrequencyStore()
+if store.has_source(WORD_FREQ_SOURCE):
+    word_freq_source = WORD_FREQ_SOURCE
+else:
+    word_freq_source = SNAPSHOT_SOURCE
+    if not store.has_source(SNAPSHOT_SOURCE):
+        store.import_table(read_excel('/wangziyi/工作簿4.xlsx'), SNAPSHOT_SOURCE, batch_id='工作簿4.xlsx')
+df_filtered = store.top(word_freq_source, min_frequency=2)  # 过滤低频词
+print(f"词频来源：{word_freq_source}")
 print(f"有效词频数据：{len(df_filtered)}个词语")
-pet_burial_df = pd.read_csv('/wangziyi/宠物殡葬.csv')
 
-# 读取动物无害化处理数据
-animal_disposal_df = pd.read_csv('/wangziyi/动物无害化处理.csv')
+# ---------------------- 企业登记数据：按名单分块统计 ----------------------
+# 全国企业登记数据导出文件（请修改为实际路径）；按块读取，只保留名单内企业，内存占用与文件大小无关
+REGISTRY_PATH = '/wangziyi/企业登记数据.csv'
 
-# 合并两个数据集中的企业名称列
-combined_names = pd.concat([pet_burial_df['企业名称'], animal_disposal_df['企业名称']], ignore_index=True)
+# 宠物殡葬、动物无害化处理两份名单合并成一个哈希索引（名称去空格、全角括号转半角后匹配）
+company_index = CompanyIndex(['/wangziyi/宠物殡葬.csv', '/wangziyi/动物无害化处理.csv'], name_col='企业名称')
+print(f"名单企业：{len(company_index)}家")
 
-# 由于原始数据集中有省份信息，这里假设可以从企业名称中提取地域信息（如果实际不是这样，请提供更明确的方式）
-# 这里简单以省份为地域信息示例，从 df 中获取省份信息
-province_info = df[df['企业名称'].isin(combined_names)][['企业名称', '所属省份']]
+registry_stats = scan_registry(REGISTRY_PATH, company_index, province_col='所属省份', date_col='成立日期')
+selected_data = registry_stats.selected_data
 
 # 对地域（省份）进行总结
-region_summary = province_info['所属省份'].value_counts()
+region_summary = registry_stats.province_summary
 
 print('地域（省份）总结：')
 print(region_summary)
-import matplotlib.pyplot as plt
-
-# 提取成立日期中的年份
-selected_data['成立年份'] = pd.to_datetime(selected_data['成立日期']).dt.year
 
-# 统计每年成立的企业数量
-yearly_counts = selected_data['成立年份'].value_counts().sort_index().reset_index(name='企业数量')
+# 统计每年成立的企业数量（成立年份直接取自成立日期文本）
+yearly_counts = registry_stats.yearly_counts
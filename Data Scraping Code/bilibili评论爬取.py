@@ -1,4 +1,5 @@
 import requests
+import csv
 import json
 import time
 import pandas as pd
@@ -8,10 +9,39 @@ import sys
 from datetime import datetime
 from urllib.parse import urlparse, parse_qs
 import random
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import TokenBucket
+from checkpoint_store import CheckpointStore
+from crawl_metrics import METRICS, instrument_session
+from video_meta_cache import VideoMetaCache
+
+# parse_comments 输出的字段顺序，流式写CSV时作为表头
+COMMENT_FIELDS = ['用户名', '用户ID', '评论ID', '评论内容', '点赞数', '回复数', '发布时间', '楼层', '是否UP主']
+
+# 各保存格式对应的文件扩展名
+SAVE_EXTENSIONS = {'csv': 'csv', 'excel': 'xlsx', 'json': 'json', 'txt': 'txt', 'parquet': 'parquet', 'feather': 'feather'}
 
 class BilibiliCompleteCrawler:
-    def __init__(self, use_cookie=False, cookie_str=None):
-        self.session = requests.Session()
+    def __init__(self, use_cookie=False, cookie_str=None, requests_per_second=None, max_workers=1):
+        """
+        requests_per_second: 所有线程共享的每秒请求数上限，设置后用令牌桶限速代替随机sleep
+        max_workers: 并发爬取评论页的线程数，大于1时启用并发模式
+        """
+        # 每个请求的耗时、状态码、字节数记入METRICS（视频信息缓存也共用这个Session）
+        self.session = instrument_session(requests.Session())
+        
+        # 连接池大小与线程数匹配，避免并发时连接被丢弃
+        self.max_workers = max(1, max_workers)
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # 并发模式下必须限速，未指定时默认每秒3个请求
+        if requests_per_second is None and self.max_workers > 1:
+            requests_per_second = 3
+        self.rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
         
         # 完整的浏览器请求头
         self.headers = {
@@ -32,11 +62,21 @@ class BilibiliCompleteCrawler:
         
         self.session.headers.update(self.headers)
         
+        # 视频元数据（aid/cid/标题/分P）与弹幕爬虫共用一个SQLite缓存
+        self.video_cache = VideoMetaCache(session=self.session)
+        
         if use_cookie and cookie_str:
             self.set_cookies(cookie_str)
         
         self.total_comments_fetched = 0
     
+    def throttle(self, low, high):
+        """请求前限速：有令牌桶时取令牌，否则随机延迟"""
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        else:
+            time.sleep(random.uniform(low, high))
+    
     def set_cookies(self, cookie_str):
         """设置Cookie"""
         cookies = {}
@@ -65,75 +105,47 @@ class BilibiliCompleteCrawler:
         raise ValueError("无法提取BV号，请确保URL格式正确")
     
     def get_video_info(self, bvid):
-        """获取视频信息"""
-        url = f"https://api.bilibili.com/x/web-interface/view?bvid={bvid}"
-        
-        try:
-            response = self.session.get(url, timeout=10)
-            data = response.json()
-            
-            if data['code'] == 0:
-                return data['data']
-            else:
-                print(f"获取视频信息失败: {data.get('message')}")
-                return None
-        except Exception as e:
-            print(f"获取视频信息出错: {e}")
-            return None
+        """获取视频信息（bvid、aid、cid、标题、时长、分P），已缓存的视频不再请求接口"""
+        return self.video_cache.get(bvid)
     
-    def try_multiple_apis(self, aid, page, page_size=20):
-        """尝试多个API接口获取评论"""
-        apis = [
-            # 新版API
-            f"https://api.bilibili.com/x/v2/reply/main?jsonp=jsonp&next={page}&type=1&oid={aid}&mode=3&plat=1",
-            # 旧版API
-            f"https://api.bilibili.com/x/v2/reply?pn={page}&type=1&oid={aid}&ps={page_size}&sort=2",
-            # 备用API
-            f"https://api.bilibili.com/x/v2/reply/main?next={page}&type=1&oid={aid}&mode=2",
-            # 另一个备用API
-            f"https://api.bilibili.com/x/v2/reply?jsonp=jsonp&pn={page}&type=1&oid={aid}&sort=2"
-        ]
-        
-        for api_url in apis:
-            try:
-                # 添加随机延迟避免请求过快
-                time.sleep(random.uniform(0.3, 0.8))
-                
-                response = self.session.get(api_url, timeout=15)
-                data = response.json()
-                
-                if data.get('code') == 0:
-                    return data
-                else:
-                    continue
-                    
-            except Exception as e:
-                continue
-        
-        return None
-    
-    def get_comments_page(self, aid, page, page_size=20):
-        """获取指定页的评论"""
+    def get_reply_data(self, aid, page, page_size=20):
+        """
+        按页码获取一页主评论的原始响应（x/v2/reply，pn/ps分页，可随机访问页码，供并发模式使用）
+        返回: code为0的响应；重试后仍失败返回None
+        """
+        url = "https://api.bilibili.com/x/v2/reply"
+        params = {'pn': page, 'ps': page_size, 'type': 1, 'oid': aid, 'sort': 2}
         max_retries = 3
         
         for retry in range(max_retries):
             try:
-                data = self.try_multiple_apis(aid, page, page_size)
+                self.throttle(0.3, 0.8)
+                data = self.session.get(url, params=params, timeout=15).json()
+                METRICS.api_result('bilibili_reply', data.get('code'))
                 
-                if not data or data.get('code') != 0:
-                    print(f"第{page}页第{retry+1}次重试...")
-                    time.sleep(1)
-                    continue
+                if data.get('code') == 0:
+                    return data
                 
-                # 解析评论
-                comments = self.parse_comments(data)
-                return comments
+                METRICS.retry('bilibili_reply', f"code_{data.get('code')}")
+                print(f"第{page}页第{retry+1}次重试: {data.get('message')}")
+                time.sleep(1)
                 
             except Exception as e:
+                METRICS.retry('bilibili_reply', type(e).__name__)
                 print(f"第{page}页第{retry+1}次重试失败: {e}")
                 time.sleep(2)
         
-        return []
+        return None
+    
+    def get_comments_page(self, aid, page, page_size=20):
+        """
+        获取指定页的评论
+        返回: 评论列表（超出最后一页时为空列表）；请求失败返回None
+        """
+        data = self.get_reply_data(aid, page, page_size)
+        if data is None:
+            return None
+        return self.parse_comments(data)
     
     def parse_comments(self, data):
         """解析评论数据"""
@@ -183,6 +195,7 @@ class BilibiliCompleteCrawler:
                 except Exception as e:
                     continue
             
+            METRICS.rows('bilibili_comments', len(comments))
             return comments
             
         except Exception as e:
@@ -190,60 +203,232 @@ class BilibiliCompleteCrawler:
             return []
     
     def get_total_pages(self, aid, page_size=20):
-        """获取总页数"""
-        try:
-            # 先获取第一页数据来得到总评论数
-            data = self.try_multiple_apis(aid, 1, page_size)
+        """获取总页数（pn分页接口返回的主评论数，不设上限）"""
+        data = self.get_reply_data(aid, 1, page_size)
+        if not data:
+            return 0
+        
+        total_comments = ((data.get('data') or {}).get('page') or {}).get('count', 0)
+        return (total_comments + page_size - 1) // page_size
+    
+    def iter_pages_concurrent(self, aid, pages, max_requeue=3):
+        """
+        多线程并发爬取指定的评论页，按页码顺序产出 (页码, 评论列表)
+        同时在途和已完成待产出的页最多 2×线程数 页，先完成的页等前面的页产出后再产出，内存不随总页数增长
+        请求失败（None）的页会重新放回队列，最多重试max_requeue次，最终失败的页码记在 self.failed_pages；
+        正常返回但没有评论的页（如评论被删导致末页变空）直接产出空列表，不重试
+        """
+        pages = list(pages)
+        window = self.max_workers * 2
+        attempts = {page: 0 for page in pages}
+        ready = {}  # 已完成、等待按顺序产出的页
+        next_index = 0  # 下一个要产出的页在pages中的位置
+        submit_index = 0
+        finished = 0
+        self.failed_pages = []
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {}
+            while next_index < len(pages):
+                # 只提交窗口内的页，最早未产出的页与最后提交的页相差不超过window
+                while submit_index < len(pages) and submit_index < next_index + window:
+                    page = pages[submit_index]
+                    futures[pool.submit(self.get_comments_page, aid, page)] = page
+                    submit_index += 1
+                
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page = futures.pop(future)
+                    try:
+                        comments = future.result()
+                    except Exception as e:
+                        print(f"✗ 第{page}页爬取出错: {e}")
+                        comments = None
+                    
+                    if comments is not None:
+                        ready[page] = comments
+                        self.total_comments_fetched += len(comments)
+                        finished += 1
+                        if finished % 10 == 0 or finished == len(pages):
+                            print(f"✓ 已完成 {finished}/{len(pages)} 页，总计 {self.total_comments_fetched} 条评论")
+                        continue
+                    
+                    # 失败页重新入队
+                    attempts[page] += 1
+                    if attempts[page] <= max_requeue:
+                        print(f"✗ 第{page}页获取失败，重新入队 ({attempts[page]}/{max_requeue})")
+                        futures[pool.submit(self.get_comments_page, aid, page)] = page
+                    else:
+                        ready[page] = []
+                        self.failed_pages.append(page)
+                        print(f"✗ 第{page}页重试{max_requeue}次后仍失败")
+                
+                while next_index < len(pages) and pages[next_index] in ready:
+                    page = pages[next_index]
+                    next_index += 1
+                    yield page, ready.pop(page)
+    
+    def get_main_page(self, aid, cursor, mode=3):
+        """按游标获取一页主评论（x/v2/reply/main），失败返回None"""
+        url = "https://api.bilibili.com/x/v2/reply/main"
+        params = {'next': cursor, 'type': 1, 'oid': aid, 'mode': mode, 'plat': 1}
+        max_retries = 3
+        
+        for retry in range(max_retries):
+            try:
+                self.throttle(0.3, 0.8)
+                data = self.session.get(url, params=params, timeout=15).json()
+                METRICS.api_result('bilibili_main', data.get('code'))
+                
+                if data.get('code') == 0:
+                    return data
+                
+                METRICS.retry('bilibili_main', f"code_{data.get('code')}")
+                print(f"游标{cursor}第{retry+1}次重试: {data.get('message')}")
+                time.sleep(1)
+                
+            except Exception as e:
+                METRICS.retry('bilibili_main', type(e).__name__)
+                print(f"游标{cursor}第{retry+1}次重试失败: {e}")
+                time.sleep(2)
+        
+        return None
+    
+    def iter_comment_pages(self, aid, cursor=0, max_pages=None, mode=3):
+        """
+        沿main接口返回的游标(next)逐页读取评论
+        每页产出 (本页游标, 下一页游标, 本页评论列表)，已到最后一页时下一页游标为None
+        mode: 3按热度, 2按时间
+        """
+        pages = 0
+        
+        while True:
+            data = self.get_main_page(aid, cursor, mode)
+            if not data:
+                print(f"✗ 游标{cursor}处获取失败，停止翻页")
+                return
             
-            if not data or data.get('code') != 0:
-                return 0
+            page_cursor = (data.get('data') or {}).get('cursor') or {}
+            if pages == 0 and page_cursor.get('all_count'):
+                print(f"✓ 评论总数: {page_cursor['all_count']}")
             
-            total_comments = 0
+            comments = self.parse_comments(data)
+            pages += 1
             
-            # 尝试不同的数据结构获取总评论数
-            if 'page' in data.get('data', {}):
-                total_comments = data['data']['page'].get('count', 0)
-            elif 'cursor' in data.get('data', {}):
-                total_comments = data['data']['cursor'].get('all_count', 0)
+            # 游标未前进或本页为空时同样视为结束，避免重复抓取
+            next_cursor = page_cursor.get('next')
+            if page_cursor.get('is_end') or not comments or next_cursor in (None, cursor):
+                next_cursor = None
             
-            # 计算总页数
-            if total_comments > 0:
-                total_pages = (total_comments + page_size - 1) // page_size
-                # 限制最大页数，避免无限爬取
-                return min(total_pages, 500)  # 最多500页
-            else:
-                return 0
-                
-        except Exception as e:
-            print(f"获取总页数失败: {e}")
-            return 0
+            if pages % 10 == 0 or next_cursor is None:
+                print(f"✓ 第 {pages} 页 (游标 {cursor}): 获取到 {len(comments)} 条评论")
+            
+            yield cursor, next_cursor, comments
+            
+            if next_cursor is None or (max_pages and pages >= max_pages):
+                return
+            cursor = next_cursor
     
-    def crawl_all_comments(self, video_url, max_pages=100):
-        """爬取所有评论"""
-        print("=" * 60)
-        print("B站评论爬虫 - 完整版")
-        print("=" * 60)
-        
-        # 提取BV号
+    def iter_comments(self, aid, max_pages=None, mode=3):
+        """流式逐条产出评论，内存占用与评论总数无关"""
+        for _, _, comments in self.iter_comment_pages(aid, max_pages=max_pages, mode=mode):
+            self.total_comments_fetched += len(comments)
+            yield from comments
+    
+    def resolve_video(self, video_url):
+        """提取BV号并获取视频信息，失败返回None"""
         try:
             bvid = self.extract_bvid(video_url)
             print(f"✓ 提取到BV号: {bvid}")
         except ValueError as e:
             print(e)
-            return []
+            return None
         
-        # 获取视频信息
         print("正在获取视频信息...")
         video_info = self.get_video_info(bvid)
         
         if not video_info:
             print("✗ 获取视频信息失败")
-            return []
+            return None
         
-        aid = video_info['aid']
         title = video_info['title']
         print(f"✓ 视频标题: {title[:50]}..." if len(title) > 50 else f"✓ 视频标题: {title}")
-        print(f"✓ 视频AID: {aid}")
+        print(f"✓ 视频AID: {video_info['aid']}")
+        return video_info
+    
+    def iter_all_comments(self, video_url, max_pages=None):
+        """流式爬取视频的所有评论，可直接交给save_stream边爬边写"""
+        video_info = self.resolve_video(video_url)
+        if not video_info:
+            return
+        
+        yield from self.iter_comments(video_info['aid'], max_pages)
+    
+    def crawl_incremental(self, video_url, output_dir=None, max_pages=None, batch_pages=10):
+        """
+        边爬边分批落盘，支持断点续爬
+        每batch_pages页写一个JSONL分批文件并更新断点（游标+已保存评论ID），
+        程序中断后用相同的output_dir重新运行，会从上次的游标继续并跳过重复评论
+        返回: CheckpointStore，可通过iter_rows()读取全部已保存评论
+        """
+        video_info = self.resolve_video(video_url)
+        if not video_info:
+            return None
+        
+        if not output_dir:
+            output_dir = f"B站评论_{video_info['bvid']}"
+        store = CheckpointStore(output_dir, key='评论ID', batch_pages=batch_pages)
+        
+        if store.finished:
+            print(f"✓ 该视频已爬取完成，共 {store.state['total']} 条评论: {os.path.abspath(output_dir)}")
+            return store
+        
+        if store.state['pages']:
+            print(f"✓ 从断点继续: 已完成 {store.state['pages']} 页 / {store.state['total']} 条，游标 {store.next_cursor}")
+        
+        print("\n开始爬取评论...")
+        print("-" * 60)
+        try:
+            for _, next_cursor, comments in self.iter_comment_pages(video_info['aid'], cursor=store.next_cursor,
+                                                                  max_pages=max_pages):
+                self.total_comments_fetched += len(comments)
+                store.add_page(next_cursor, comments)
+        finally:
+            # 无论正常结束还是中断，都把缓冲区中已完成的页落盘
+            store.flush()
+        
+        print("-" * 60)
+        status = "已全部完成" if store.finished else "未完成，可重新运行继续"
+        print(f"✓ 共保存 {store.state['total']} 条评论，{store.state['parts']} 个分批文件（{status}）")
+        print(f"  目录: {os.path.abspath(output_dir)}")
+        return store
+    
+    def crawl_all_comments(self, video_url, max_pages=100):
+        """
+        爬取所有评论，逐条产出（生成器），不在内存中保留全部评论，可直接交给 save_stream 边爬边写
+        逐页模式沿游标翻页；并发模式用pn分页接口，按页码顺序产出
+        """
+        print("=" * 60)
+        print("B站评论爬虫 - 完整版")
+        print("=" * 60)
+        
+        # 逐页模式：沿游标翻页，不再受页数估算和500页上限的限制
+        if self.max_workers == 1:
+            print("\n开始爬取评论...")
+            print("-" * 60)
+            count = 0
+            for comment in self.iter_all_comments(video_url, max_pages):
+                count += 1
+                yield comment
+            print("-" * 60)
+            print(f"✓ 爬取完成！共获取 {count} 条评论")
+            return
+        
+        # 并发模式：需要随机访问页码，使用pn分页接口
+        video_info = self.resolve_video(video_url)
+        if not video_info:
+            return
+        aid = video_info['aid']
         
         # 获取总页数
         print("正在获取评论总数...")
@@ -251,157 +436,254 @@ class BilibiliCompleteCrawler:
         
         if total_pages == 0:
             print("该视频暂无评论")
-            return []
+            return
         
         # 限制最大页数
         actual_pages = min(total_pages, max_pages)
         print(f"✓ 总评论页数: {total_pages}")
         print(f"✓ 实际爬取页数: {actual_pages}")
         
-        all_comments = []
-        failed_pages = []
-        
         print("\n开始爬取评论...")
         print("-" * 60)
-        
-        # 进度显示
-        for page in range(1, actual_pages + 1):
-            try:
-                print(f"正在爬取第 {page}/{actual_pages} 页...", end="\r")
-                
-                comments = self.get_comments_page(aid, page)
-                
-                if comments:
-                    all_comments.extend(comments)
-                    self.total_comments_fetched = len(all_comments)
-                    
-                    # 每10页显示一次进度
-                    if page % 10 == 0 or page == actual_pages:
-                        print(f"✓ 第 {page}/{actual_pages} 页: 获取到 {len(comments)} 条评论，总计 {len(all_comments)} 条")
-                else:
-                    failed_pages.append(page)
-                    print(f"✗ 第{page}页没有评论数据")
-                
-                # 随机延迟，模拟真实用户
-                delay = random.uniform(0.5, 1.2)
-                time.sleep(delay)
-                
-            except Exception as e:
-                failed_pages.append(page)
-                print(f"✗ 第{page}页爬取出错: {e}")
-                continue
+        print(f"并发模式: {self.max_workers} 个线程, 限速 {self.rate_limiter.rate:g} 请求/秒")
+        count = 0
+        for _, comments in self.iter_pages_concurrent(aid, range(1, actual_pages + 1)):
+            count += len(comments)
+            yield from comments
         
         print("-" * 60)
         
-        if failed_pages:
-            print(f"警告: 有 {len(failed_pages)} 页爬取失败: {failed_pages[:10]}...")
+        if self.failed_pages:
+            print(f"警告: 有 {len(self.failed_pages)} 页爬取失败: {self.failed_pages[:10]}...")
         
-        print(f"✓ 爬取完成！共获取 {len(all_comments)} 条评论")
-        
-        return all_comments
+        print(f"✓ 爬取完成！共获取 {count} 条评论")
     
-    def save_to_file(self, comments, filename=None, format='csv'):
+    def default_filename(self, format, timestamp=None):
+        """按格式生成默认文件名"""
+        timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        return f"B站评论_{timestamp}.{SAVE_EXTENSIONS.get(format, 'txt')}"
+    
+    def write_dataframe(self, df, filename, format):
         """
-        保存评论到文件
-        format: 'csv', 'excel', 'json', 'txt'
+        把已构建好的DataFrame写成指定格式，不再重复转换数据
+        format: 'csv', 'excel', 'json', 'txt', 'parquet', 'feather'
+        返回: 成功时返回文件名，失败返回None
         """
-        if not comments:
-            print("没有评论数据可保存")
-            return None
-        
         try:
-            # 创建DataFrame
-            df = pd.DataFrame(comments)
-            
-            # 生成文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            if not filename:
-                if format == 'csv':
-                    filename = f"B站评论_{timestamp}.csv"
-                elif format == 'excel':
-                    filename = f"B站评论_{timestamp}.xlsx"
-                elif format == 'json':
-                    filename = f"B站评论_{timestamp}.json"
-                else:
-                    filename = f"B站评论_{timestamp}.txt"
-            
             # 确保目录存在
             file_dir = os.path.dirname(filename)
-            if file_dir and not os.path.exists(file_dir):
-                os.makedirs(file_dir)
+            if file_dir:
+                os.makedirs(file_dir, exist_ok=True)
             
-            # 根据格式保存
             if format == 'csv':
                 # CSV格式（最可靠）
                 df.to_csv(filename, index=False, encoding='utf-8-sig')
             elif format == 'excel':
-                # Excel格式
-                try:
-                    df.to_excel(filename, index=False)
-                except:
-                    # 如果失败，尝试使用openpyxl引擎
-                    df.to_excel(filename, index=False, engine='openpyxl')
+                # Excel格式，直接指定openpyxl引擎，避免失败后整表重写
+                df.to_excel(filename, index=False, engine='openpyxl')
             elif format == 'json':
                 # JSON格式
                 df.to_json(filename, orient='records', force_ascii=False, indent=2)
+            elif format == 'parquet':
+                # 列式存储，下游notebook读取远快于Excel（需要pyarrow）
+                df.to_parquet(filename, index=False)
+            elif format == 'feather':
+                df.reset_index(drop=True).to_feather(filename)
             elif format == 'txt':
-                # 文本格式
+                # 文本格式，直接按列读取，不再逐行构造字典
+                n = len(df)
+                column = lambda name, default: df[name].tolist() if name in df.columns else [default] * n
+                rows = zip(column('用户名', '未知'), column('评论内容', ''), column('点赞数', 0),
+                           column('回复数', 0), column('发布时间', ''))
                 with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(f"B站评论数据 - 共 {len(comments)} 条\n")
+                    f.write(f"B站评论数据 - 共 {n} 条\n")
                     f.write("=" * 80 + "\n\n")
-                    for i, comment in enumerate(comments, 1):
-                        f.write(f"【{i}】{comment.get('用户名', '未知')}\n")
-                        f.write(f"评论: {comment.get('评论内容', '')}\n")
-                        f.write(f"点赞: {comment.get('点赞数', 0)} | 回复: {comment.get('回复数', 0)} | 时间: {comment.get('发布时间', '')}\n")
+                    for i, (uname, message, like, rcount, ctime) in enumerate(rows, 1):
+                        f.write(f"【{i}】{uname}\n")
+                        f.write(f"评论: {message}\n")
+                        f.write(f"点赞: {like} | 回复: {rcount} | 时间: {ctime}\n")
                         f.write("-" * 80 + "\n\n")
-            
-            # 验证文件是否创建
-            if os.path.exists(filename):
-                file_size = os.path.getsize(filename)
-                file_path = os.path.abspath(filename)
-                
-                print(f"✓ {format.upper()}文件保存成功！")
-                print(f"  文件名: {filename}")
-                print(f"  完整路径: {file_path}")
-                print(f"  文件大小: {file_size} 字节 ({file_size/1024:.2f} KB)")
-                print(f"  数据条数: {len(comments)}")
-                
-                return filename
             else:
-                print(f"✗ 文件创建失败: {filename}")
+                print(f"✗ 不支持的格式: {format}")
                 return None
-                
+            
+            return filename
+            
+        except ImportError as e:
+            print(f"✗ 保存{format.upper()}失败，缺少依赖（parquet/feather需要 pip install pyarrow）: {e}")
+            return None
         except Exception as e:
-            print(f"✗ 保存文件失败: {e}")
+            print(f"✗ 保存{format.upper()}文件失败: {e}")
             return None
     
-    def save_multiple_formats(self, comments):
-        """用多种格式保存数据"""
-        if not comments:
+    def report_saved_file(self, filename, format, count):
+        """打印文件保存结果"""
+        if not filename or not os.path.exists(filename):
+            print(f"✗ 文件创建失败: {filename}")
+            return False
+        
+        file_size = os.path.getsize(filename)
+        print(f"✓ {format.upper()}文件保存成功！")
+        print(f"  文件名: {filename}")
+        print(f"  完整路径: {os.path.abspath(filename)}")
+        print(f"  文件大小: {file_size} 字节 ({file_size/1024:.2f} KB)")
+        print(f"  数据条数: {count}")
+        return True
+    
+    def save_to_file(self, comments, filename=None, format='csv'):
+        """
+        保存评论到文件
+        format: 'csv', 'excel', 'json', 'txt', 'parquet', 'feather'
+        """
+        if comments is None or len(comments) == 0:
             print("没有评论数据可保存")
-            return []
+            return None
         
-        saved_files = []
+        df = comments if isinstance(comments, pd.DataFrame) else pd.DataFrame(comments)
+        filename = self.write_dataframe(df, filename or self.default_filename(format), format)
+        
+        if filename and self.report_saved_file(filename, format, len(df)):
+            return filename
+        return None
+    
+    def save_stream(self, comments, filename=None, format='csv'):
+        """
+        边爬边写：逐条消费评论迭代器并追加写入文件，不在内存中保留全部评论
+        format: 'csv', 'json'(每行一条JSON), 'txt'
+        返回: (文件名, 写入条数)，失败时文件名为None
+        """
+        if format not in ('csv', 'json', 'txt'):
+            print(f"✗ 流式保存不支持{format}格式，请使用csv/json/txt")
+            return None, 0
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if not filename:
+            ext = {'csv': 'csv', 'json': 'jsonl', 'txt': 'txt'}[format]
+            filename = f"B站评论_{timestamp}.{ext}"
+        
+        file_dir = os.path.dirname(filename)
+        if file_dir and not os.path.exists(file_dir):
+            os.makedirs(file_dir)
+        
+        count = 0
+        try:
+            encoding = 'utf-8-sig' if format == 'csv' else 'utf-8'
+            with open(filename, 'w', encoding=encoding, newline='') as f:
+                if format == 'csv':
+                    writer = csv.DictWriter(f, fieldnames=COMMENT_FIELDS, extrasaction='ignore')
+                    writer.writeheader()
+                elif format == 'txt':
+                    f.write("B站评论数据\n")
+                    f.write("=" * 80 + "\n\n")
+                
+                for comment in comments:
+                    count += 1
+                    if format == 'csv':
+                        writer.writerow(comment)
+                    elif format == 'json':
+                        f.write(json.dumps(comment, ensure_ascii=False) + "\n")
+                    else:
+                        f.write(f"【{count}】{comment.get('用户名', '未知')}\n")
+                        f.write(f"评论: {comment.get('评论内容', '')}\n")
+                        f.write(f"点赞: {comment.get('点赞数', 0)} | 回复: {comment.get('回复数', 0)} | 时间: {comment.get('发布时间', '')}\n")
+                        f.write("-" * 80 + "\n\n")
+                
+                if format == 'txt':
+                    f.write(f"共 {count} 条\n")
+            
+            file_size = os.path.getsize(filename)
+            print(f"✓ {format.upper()}文件流式保存成功！")
+            print(f"  文件名: {filename}")
+            print(f"  文件大小: {file_size} 字节 ({file_size/1024:.2f} KB)")
+            print(f"  数据条数: {count}")
+            return filename, count
+            
+        except Exception as e:
+            print(f"✗ 流式保存失败（已写入 {count} 条）: {e}")
+            return None, count
+    
+    def iter_saved_csv(self, filename, chunksize=10000):
+        """分块读回 save_stream 写出的CSV，逐条产出评论（用于转换成其他格式）"""
+        for chunk in pd.read_csv(filename, encoding='utf-8-sig', chunksize=chunksize, keep_default_na=False,
+                                 dtype={'用户名': str, '评论内容': str}):
+            yield from chunk.to_dict('records')
+    
+    def save_multiple_formats(self, comments, formats=('csv', 'excel', 'txt'), parallel=False):
+        """
+        用多种格式保存数据
+        评论只转换一次DataFrame，再由同一份数据写出各个格式，文件名共用同一时间戳
+        formats: 可选 'csv', 'excel', 'json', 'txt', 'parquet', 'feather'
+        parallel: 为True时每种格式一个线程同时写出
+        """
+        if comments is None or len(comments) == 0:
+            print("没有评论数据可保存")
+            return []
         
-        # 首先尝试CSV（最可靠）
         print("\n尝试保存数据...")
-        csv_file = self.save_to_file(comments, format='csv')
-        if csv_file:
-            saved_files.append(csv_file)
+        df = comments if isinstance(comments, pd.DataFrame) else pd.DataFrame(comments)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        targets = [(self.default_filename(fmt, timestamp), fmt) for fmt in formats]
         
-        # 然后尝试Excel
-        excel_file = self.save_to_file(comments, format='excel')
-        if excel_file:
-            saved_files.append(excel_file)
+        if parallel and len(targets) > 1:
+            with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+                results = list(pool.map(lambda target: self.write_dataframe(df, *target), targets))
+        else:
+            results = [self.write_dataframe(df, filename, fmt) for filename, fmt in targets]
         
-        # 最后保存为文本备份
-        txt_file = self.save_to_file(comments, format='txt')
-        if txt_file:
-            saved_files.append(txt_file)
+        saved_files = []
+        for result, (_, fmt) in zip(results, targets):
+            if result and self.report_saved_file(result, fmt, len(df)):
+                saved_files.append(result)
         
         return saved_files
 
+class CommentSummary:
+    """边产出边统计评论（条数、点赞、UP主评论数、前几条预览），不保留全部评论"""
+    
+    def __init__(self, preview=5):
+        self.count = 0
+        self.total_likes = 0
+        self.max_likes = 0
+        self.up_comments = 0
+        self.preview_size = preview
+        self.preview = []
+    
+    def track(self, comments):
+        for comment in comments:
+            likes = comment.get('点赞数', 0)
+            self.count += 1
+            self.total_likes += likes
+            self.max_likes = max(self.max_likes, likes)
+            if comment.get('是否UP主') == 1:
+                self.up_comments += 1
+            if len(self.preview) < self.preview_size:
+                self.preview.append(comment)
+            yield comment
+    
+    def print_report(self):
+        print("\n" + "=" * 60)
+        print("爬取结果统计:")
+        print(f"总评论数: {self.count}")
+        if not self.count:
+            return
+        print(f"平均点赞数: {self.total_likes / self.count:.1f}")
+        print(f"最高点赞数: {self.max_likes}")
+        if self.up_comments > 0:
+            print(f"UP主评论数: {self.up_comments}")
+        
+        # 显示前几条评论
+        print(f"\n前{len(self.preview)}条评论预览:")
+        print("-" * 60)
+        for i, comment in enumerate(self.preview):
+            content = comment['评论内容']
+            if len(content) > 50:
+                content = content[:50] + "..."
+            print(f"{i+1}. [{comment['用户名']}]")
+            print(f"   {content}")
+            print(f"   点赞: {comment['点赞数']}, 时间: {comment['发布时间']}")
+            print()
+
+
 def check_file_permissions():
     """检查文件权限"""
     print("=" * 60)
@@ -496,87 +778,102 @@ def main():
     except:
         max_pages = 100
     
+    # 输入并发线程数和限速
+    try:
+        max_workers = int(input("请输入并发线程数 (默认1, 即逐页爬取): ") or "1")
+    except:
+        max_workers = 1
+    
+    requests_per_second = None
+    if max_workers > 1:
+        try:
+            requests_per_second = float(input("请输入每秒最大请求数 (默认3): ") or "3")
+        except:
+            requests_per_second = 3
+    
     # 创建爬虫实例
     use_cookie = cookie is not None
-    crawler = BilibiliCompleteCrawler(use_cookie=use_cookie, cookie_str=cookie)
+    crawler = BilibiliCompleteCrawler(use_cookie=use_cookie, cookie_str=cookie,
+                                      requests_per_second=requests_per_second,
+                                      max_workers=max_workers)
+    
+    # 三种保存方式都是边爬边写，评论量很大时内存占用保持不变
+    if max_workers == 1:
+        print("\n保存方式: 1. 边爬边写入CSV，再转换为所选格式  2. 只边爬边写入CSV  3. 分批写入磁盘（支持断点续爬）")
+        save_mode = input("请选择保存方式 (默认1): ").strip() or "1"
+        if save_mode == '2':
+            start_time = time.time()
+            filename, count = crawler.save_stream(crawler.iter_all_comments(video_url, max_pages), format='csv')
+            print(f"爬取耗时: {time.time() - start_time:.2f} 秒")
+            if filename:
+                print(f"✓ 共写入 {count} 条评论: {os.path.abspath(filename)}")
+            return
+        if save_mode == '3':
+            start_time = time.time()
+            crawler.crawl_incremental(video_url, max_pages=max_pages)
+            print(f"爬取耗时: {time.time() - start_time:.2f} 秒")
+            return
     
-    # 开始爬取
+    formats = input("保存格式（逗号分隔，可选 csv,excel,json,txt,parquet,feather，默认 csv,excel,txt）: ").strip()
+    formats = [f.strip() for f in formats.split(',') if f.strip() in SAVE_EXTENSIONS] or ['csv', 'excel', 'txt']
+    
+    # 开始爬取：评论边爬边写入CSV并同时统计，内存中不保留全部评论
     print("\n" + "=" * 60)
     print("开始爬取评论...")
     start_time = time.time()
     
-    comments = crawler.crawl_all_comments(video_url, max_pages)
-    
-    end_time = time.time()
-    elapsed = end_time - start_time
+    summary = CommentSummary()
+    comments = summary.track(crawler.crawl_all_comments(video_url, max_pages))
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_file, count = crawler.save_stream(comments, crawler.default_filename('csv', timestamp), format='csv')
+    if not csv_file and count == 0:
+        # 文件没能创建时还没有开始爬取，改存到桌面
+        desktop = os.path.join(os.path.expanduser("~"), "Desktop")
+        if os.path.exists(desktop):
+            print("尝试保存到桌面...")
+            csv_file, count = crawler.save_stream(
+                comments, os.path.join(desktop, crawler.default_filename('csv', timestamp)), format='csv')
     
-    print(f"爬取耗时: {elapsed:.2f} 秒")
+    print(f"爬取耗时: {time.time() - start_time:.2f} 秒")
     
-    if comments:
-        # 显示统计信息
-        print("\n" + "=" * 60)
-        print("爬取结果统计:")
-        print(f"总评论数: {len(comments)}")
-        
-        if comments:
-            avg_likes = sum(c.get('点赞数', 0) for c in comments) / len(comments)
-            print(f"平均点赞数: {avg_likes:.1f}")
-            
-            max_likes = max(c.get('点赞数', 0) for c in comments)
-            print(f"最高点赞数: {max_likes}")
-            
-            up_comments = sum(1 for c in comments if c.get('是否UP主') == 1)
-            if up_comments > 0:
-                print(f"UP主评论数: {up_comments}")
-            
-            # 显示前几条评论
-            print("\n前5条评论预览:")
-            print("-" * 60)
-            for i, comment in enumerate(comments[:5]):
-                content = comment['评论内容']
-                if len(content) > 50:
-                    content = content[:50] + "..."
-                print(f"{i+1}. [{comment['用户名']}]")
-                print(f"   {content}")
-                print(f"   点赞: {comment['点赞数']}, 时间: {comment['发布时间']}")
-                print()
-        
-        # 保存数据
-        print("\n" + "=" * 60)
-        print("正在保存数据...")
-        
-        saved_files = crawler.save_multiple_formats(comments)
-        
-        if saved_files:
-            print(f"\n✓ 成功保存 {len(saved_files)} 个文件:")
-            for file in saved_files:
-                full_path = os.path.abspath(file)
-                size = os.path.getsize(file)
-                print(f"  - {file}")
-                print(f"    路径: {full_path}")
-                print(f"    大小: {size} 字节 ({size/1024:.2f} KB)")
-        else:
-            print("✗ 所有保存方式都失败了！")
-            
-            # 尝试最后的保存方法
-            try:
-                # 强制保存到桌面
-                desktop = os.path.join(os.path.expanduser("~"), "Desktop")
-                if os.path.exists(desktop):
-                    csv_path = os.path.join(desktop, f"B站评论_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
-                    df = pd.DataFrame(comments)
-                    df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-                    
-                    if os.path.exists(csv_path):
-                        print(f"✓ 已强制保存到桌面: {csv_path}")
-            except Exception as e:
-                print(f"✗ 强制保存也失败: {e}")
-    else:
+    if not summary.count:
         print("未获取到评论数据")
+        return
+    summary.print_report()
+    if not csv_file:
+        print("✗ 所有保存方式都失败了！")
+        return
+    
+    # 其他格式由CSV转换：json、txt逐条转换；excel/parquet/feather需要整表，只在选择了这些格式时读入内存
+    print("\n" + "=" * 60)
+    print("正在保存数据...")
+    saved_files = [csv_file]
+    table_formats = [fmt for fmt in formats if fmt in ('excel', 'parquet', 'feather')]
+    for fmt in formats:
+        if fmt in ('json', 'txt'):
+            stream_file = f"B站评论_{timestamp}.{'jsonl' if fmt == 'json' else 'txt'}"
+            filename, _ = crawler.save_stream(crawler.iter_saved_csv(csv_file), stream_file, format=fmt)
+            if filename:
+                saved_files.append(filename)
+    if table_formats:
+        df = pd.read_csv(csv_file, encoding='utf-8-sig', keep_default_na=False, dtype={'用户名': str, '评论内容': str})
+        for fmt in table_formats:
+            filename = crawler.write_dataframe(df, crawler.default_filename(fmt, timestamp), fmt)
+            if filename and crawler.report_saved_file(filename, fmt, len(df)):
+                saved_files.append(filename)
+    
+    print(f"\n✓ 成功保存 {len(saved_files)} 个文件:")
+    for file in saved_files:
+        size = os.path.getsize(file)
+        print(f"  - {file}")
+        print(f"    路径: {os.path.abspath(file)}")
+        print(f"    大小: {size} 字节 ({size/1024:.2f} KB)")
 
 if __name__ == "__main__":
     try:
-        main()
+        # 爬取期间每60秒写一次指标快照，中断或结束时再写一次并打印各接口耗时汇总
+        with METRICS.exporting('metrics/bilibili_comments.json', 'metrics/bilibili_comments.prom', interval=60):
+            main()
     except KeyboardInterrupt:
         print("\n\n用户中断程序")
     except Exception as e:
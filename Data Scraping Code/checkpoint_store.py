@@ -0,0 +1,145 @@
+import json
+import os
+import time
+
+
+class CheckpointStore:
+    """
+    追加写入的分批存储 + 断点记录
+    目录结构:
+        part-00001.jsonl ...  每批数据一个文件，写完后不再修改
+        seen_keys.txt         已保存数据的主键（如评论ID），每行一个，只追加
+        checkpoint.json       最后一批落盘后的游标、批次数、条数
+    进程中途退出时，最多只丢失尚未落盘的一批，重启后从checkpoint中的游标继续，并按主键去重
+    """
+
+    def __init__(self, output_dir, key='评论ID', batch_pages=10):
+        """
+        output_dir: 存放分批文件和断点的目录
+        key: 用于去重的字段名
+        batch_pages: 每累计多少页写一个分批文件
+        """
+        self.output_dir = output_dir
+        self.key = key
+        self.batch_pages = max(1, batch_pages)
+        self.checkpoint_path = os.path.join(output_dir, 'checkpoint.json')
+        self.seen_path = os.path.join(output_dir, 'seen_keys.txt')
+
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        self.state = {'next_cursor': 0, 'finished': False, 'parts': 0, 'pages': 0, 'total': 0}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                self.state.update(json.load(f))
+
+        self.seen = set()
+        if os.path.exists(self.seen_path):
+            with open(self.seen_path, 'r', encoding='utf-8') as f:
+                self.seen = {line.rstrip('\n') for line in f if line.strip()}
+
+        # 上次中断时可能已写出分批文件但未来得及更新断点，把这些文件补记进去
+        orphan_parts = self.part_files()[self.state['parts']:]
+        if orphan_parts:
+            orphan_rows = [row for part_path in orphan_parts for row in self.read_part(part_path)]
+            self.append_seen(orphan_rows)
+            self.state['parts'] += len(orphan_parts)
+            self.state['total'] += len(orphan_rows)
+            self.save_checkpoint()
+
+        self.buffer = []
+        self.buffer_pages = 0
+        self.pending_cursor = self.state['next_cursor']
+        self.pending_finished = self.state['finished']
+
+    @property
+    def next_cursor(self):
+        """下次开始爬取的游标"""
+        return self.state['next_cursor']
+
+    @property
+    def finished(self):
+        return self.state['finished']
+
+    def add_page(self, next_cursor, rows):
+        """
+        记录已完成的一页
+        next_cursor: 该页之后的游标，None表示已到最后一页
+        rows: 该页解析出的数据，重复主键会被跳过
+        """
+        for row in rows:
+            row_key = str(row.get(self.key, ''))
+            if row_key and row_key in self.seen:
+                continue
+            if row_key:
+                self.seen.add(row_key)
+            self.buffer.append(row)
+
+        self.buffer_pages += 1
+        self.pending_finished = next_cursor is None
+        if next_cursor is not None:
+            self.pending_cursor = next_cursor
+
+        if self.buffer_pages >= self.batch_pages or self.pending_finished:
+            self.flush()
+
+    def flush(self):
+        """把缓冲区写成一个新的分批文件，再更新去重表和断点"""
+        if self.buffer:
+            part_no = self.state['parts'] + 1
+            part_path = os.path.join(self.output_dir, f'part-{part_no:05d}.jsonl')
+            tmp_path = part_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for row in self.buffer:
+                    f.write(json.dumps(row, ensure_ascii=False) + '\n')
+            os.replace(tmp_path, part_path)
+
+            self.append_seen(self.buffer)
+
+            self.state['parts'] = part_no
+            self.state['total'] += len(self.buffer)
+
+        self.state['pages'] += self.buffer_pages
+        self.state['next_cursor'] = self.pending_cursor
+        self.state['finished'] = self.pending_finished
+        self.state['updated_at'] = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.save_checkpoint()
+
+        self.buffer = []
+        self.buffer_pages = 0
+
+    def append_seen(self, rows):
+        """把已落盘数据的主键追加到去重表"""
+        with open(self.seen_path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                row_key = str(row.get(self.key, ''))
+                if row_key:
+                    self.seen.add(row_key)
+                    f.write(row_key + '\n')
+
+    def save_checkpoint(self):
+        """先写临时文件再替换，避免断点文件写到一半损坏"""
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def part_files(self):
+        """按批次顺序返回所有分批文件路径"""
+        return sorted(
+            os.path.join(self.output_dir, name)
+            for name in os.listdir(self.output_dir)
+            if name.startswith('part-') and name.endswith('.jsonl')
+        )
+
+    def read_part(self, part_path):
+        """逐条读取一个分批文件"""
+        with open(part_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def iter_rows(self):
+        """按写入顺序逐条读取已保存的数据"""
+        for part_path in self.part_files():
+            yield from self.read_part(part_path)
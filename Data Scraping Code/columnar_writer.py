@@ -0,0 +1,163 @@
+import csv
+import os
+import threading
+import time
+
+
+class ColumnarWriter:
+    """
+    按列缓冲、批量落盘的写入器
+    数据先写进预先分配好的列缓冲区，满flush_rows行或距上次落盘超过flush_seconds秒时才写一次文件；
+    csv格式整个过程只打开一次文件，parquet格式每次落盘写一个row group，超过rotate_rows行换一个新文件
+    多个线程可以同时调用add_rows
+    """
+
+    def __init__(self, path, columns, format='csv', flush_rows=5000, flush_seconds=30, rotate_rows=None,
+                 column_types=None):
+        """
+        path: 输出文件路径（parquet分文件时为 名称-00001.parquet 这样的序号文件）
+        columns: 列名列表，add_rows传入的每行按这个顺序排列
+        column_types: parquet各列的类型 {列名: 'int64'/'float64'/'string'/...}，未列出的列为string；
+                      None时按第一批数据推断（第一批全为空的列按string处理）
+        format: 'csv' 或 'parquet'（需要pyarrow）
+        flush_rows: 缓冲多少行写一次
+        flush_seconds: 距上次写入超过多少秒时，下一次add_rows就写一次（0表示不按时间写）
+        rotate_rows: parquet每个文件最多多少行，None表示只写一个文件
+        """
+        if format not in ('csv', 'parquet'):
+            raise ValueError(f"不支持的格式: {format}")
+        self.path = path
+        self.columns = list(columns)
+        self.format = format
+        self.flush_rows = max(1, flush_rows)
+        self.flush_seconds = flush_seconds
+        self.rotate_rows = rotate_rows
+        self.column_types = column_types
+
+        self.buffers = [[None] * self.flush_rows for _ in self.columns]
+        self.size = 0
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.total = 0
+        self.file = None
+        self.csv_writer = None
+        self.parquet_writer = None
+        self.schema = None
+        self.file_rows = 0
+        self.files = []
+        self.failed_rows = 0
+        self.failed_path = f"{path}.failed.csv"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_rows(self, rows):
+        """追加多行数据，每行是按columns顺序排列的元组"""
+        with self.lock:
+            for row in rows:
+                for buffer, value in zip(self.buffers, row):
+                    buffer[self.size] = value
+                self.size += 1
+                if self.size == self.flush_rows:
+                    self._flush()
+            if self.size and self.flush_seconds and time.monotonic() - self.last_flush >= self.flush_seconds:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        """写出剩余数据并关闭文件（程序退出或中断前必须调用）"""
+        with self.lock:
+            self._flush()
+            if self.file:
+                self.file.close()
+                self.file = None
+            if self.parquet_writer:
+                self.parquet_writer.close()
+                self.parquet_writer = None
+
+    def _flush(self):
+        self.last_flush = time.monotonic()
+        if not self.size:
+            return
+        size = self.size
+        try:
+            if self.format == 'csv':
+                self._write_csv(size)
+            else:
+                self._write_parquet(size)
+            self.total += size
+        except Exception as e:
+            # 这一批写不进去（类型不符等）时转存到旁边的CSV，缓冲区照常清空，后面的批次继续写
+            self._write_failed(size)
+            print(f"✗ {size}行写入{self.path}失败，已转存到{self.failed_path}: {e}")
+        finally:
+            self.size = 0
+
+    def _write_failed(self, size):
+        header = not os.path.exists(self.failed_path) or os.path.getsize(self.failed_path) == 0
+        with open(self.failed_path, 'a', newline='', encoding='utf_8_sig') as f:
+            writer = csv.writer(f)
+            if header:
+                writer.writerow(self.columns)
+            writer.writerows(zip(*(buffer[:size] for buffer in self.buffers)))
+        self.failed_rows += size
+
+    def _write_csv(self, size):
+        if self.file is None:
+            # 追加到已有文件时不再写表头
+            header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            self.file = open(self.path, 'a', newline='', encoding='utf_8_sig')
+            self.csv_writer = csv.writer(self.file)
+            if header:
+                self.csv_writer.writerow(self.columns)
+            self.files.append(self.path)
+        if size == self.flush_rows:
+            self.csv_writer.writerows(zip(*self.buffers))
+        else:
+            self.csv_writer.writerows(zip(*(buffer[:size] for buffer in self.buffers)))
+        self.file.flush()
+
+    def _arrow_schema(self, data):
+        """指定了column_types时按列名构造；否则以第一批数据为准，全为空的列（null类型）改为string"""
+        import pyarrow as pa
+
+        if self.column_types is not None:
+            return pa.schema([(name, self.column_types.get(name, 'string')) for name in self.columns])
+        inferred = pa.Table.from_pydict(data).schema
+        return pa.schema([(field.name, pa.string() if pa.types.is_null(field.type) else field.type)
+                          for field in inferred])
+
+    def _write_parquet(self, size):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        data = {name: buffer[:size] for name, buffer in zip(self.columns, self.buffers)}
+        if self.schema is None:
+            self.schema = self._arrow_schema(data)
+        # 之后的批次都按同一schema转换，保证各row group一致；string列的数字等值转成文本
+        for field in self.schema:
+            if pa.types.is_string(field.type):
+                data[field.name] = [v if v is None or isinstance(v, str) else str(v) for v in data[field.name]]
+        table = pa.Table.from_pydict(data, schema=self.schema)
+
+        if self.parquet_writer and self.rotate_rows and self.file_rows >= self.rotate_rows:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+        if self.parquet_writer is None:
+            if self.rotate_rows:
+                root, ext = os.path.splitext(self.path)
+                file_path = f"{root}-{len(self.files) + 1:05d}{ext or '.parquet'}"
+            else:
+                file_path = self.path
+            self.parquet_writer = pq.ParquetWriter(file_path, self.schema)
+            self.files.append(file_path)
+            self.file_rows = 0
+        self.parquet_writer.write_table(table)
+        self.file_rows += size
@@ -0,0 +1,384 @@
+"""
+爬虫统一埋点：请求耗时直方图、状态码/错误、重试次数、流量字节数、各阶段解析条数
+- instrument_session(session)：包装 requests.Session.send，经过该Session的每个请求自动记录耗时、状态码、字节数
+- trace_config()：aiohttp 的 TraceConfig，异步爬虫（微博多关键词搜索）使用
+- metrics.page_load(driver, url)：Selenium 打开页面并记录加载耗时
+- metrics.retry / metrics.rows / metrics.api_result / metrics.stage：重试、解析条数、接口返回码、阶段耗时
+- metrics.exporting(路径, ...)：长时间爬取时每隔interval秒写一次快照，结束时再写一次并打印汇总
+快照格式按扩展名决定：.json 或 .prom（Prometheus文本格式，可交给node_exporter的textfile收集器）
+
+各爬虫默认共用模块级的 METRICS，一次运行内所有Session、线程的数据汇总在一起：
+    with METRICS.exporting('metrics/weibo_comments.json', 'metrics/weibo_comments.prom', interval=60):
+        get_comments(...)
+"""
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# 请求/页面加载耗时的直方图分桶（秒），最后隐含一个 +Inf 桶
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Prometheus 指标名前缀及各指标说明（未列出的指标类型按名称后缀推断）
+PREFIX = 'crawler_'
+METRIC_HELP = {
+    'http_request_seconds': ('histogram', '单个HTTP请求耗时（非stream请求包括下载响应体）'),
+    'http_requests_total': ('counter', 'HTTP请求数，status为状态码或异常类名'),
+    'http_response_bytes_total': ('counter', '响应体字节数'),
+    'page_load_seconds': ('histogram', 'Selenium页面加载耗时'),
+    'page_loads_total': ('counter', 'Selenium页面加载次数，status为ok或异常类名'),
+    'api_responses_total': ('counter', '接口返回的业务状态码（微博ok、B站code）'),
+    'retries_total': ('counter', '重试次数'),
+    'rows_parsed_total': ('counter', '各阶段解析出的数据条数'),
+    'stage_seconds': ('histogram', '各阶段（解析、写文件等）耗时'),
+}
+
+# URL路径中随请求变化的部分（cid.xml、城市ID、页码、中文关键词）归并为:id，避免接口标签无限增多
+DYNAMIC_SEGMENT = re.compile(r'\d{3,}|%|^\d+$|^p\d+$')
+
+
+def endpoint_label(url):
+    """把URL归并成接口标签：域名 + 路径（去掉查询参数，动态路径段替换为:id）"""
+    parts = urlsplit(url)
+    segments = [':id' if DYNAMIC_SEGMENT.search(segment) else segment for segment in parts.path.split('/')]
+    return f"{parts.netloc}{'/'.join(segments)}"
+
+
+class Histogram:
+    """固定分桶的耗时直方图，记录各桶计数、总和与最大值"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """按分桶估计分位数：返回累计计数达到q的那个桶的上界（落在+Inf桶时返回最大值）"""
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return self.max
+
+    def cumulative(self):
+        """Prometheus 风格的累计分桶：[(上界, 计数), ..., ('+Inf', 总数)]"""
+        result = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            result.append((bound, cumulative))
+        result.append(('+Inf', self.count))
+        return result
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+class CrawlMetrics:
+    """
+    一次爬取运行的指标：计数器和直方图，按 (指标名, 标签) 分别累计
+    多线程共用，所有更新都在一把锁内完成（每个请求只加几次锁，开销远小于网络请求本身）
+    """
+
+    def __init__(self, name='crawler', buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = time.time()
+            self.counters = {}
+            self.histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+    def inc(self, name, value=1, **labels):
+        """计数器加value，标签值为None的标签省略"""
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """在直方图中记录一次耗时"""
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def record_request(self, endpoint, status, seconds, nbytes=0):
+        """记录一个HTTP请求：耗时、状态码（或异常类名）、响应字节数"""
+        self.observe('http_request_seconds', seconds, endpoint=endpoint)
+        self.inc('http_requests_total', endpoint=endpoint, status=status)
+        if nbytes:
+            self.inc('http_response_bytes_total', nbytes, endpoint=endpoint)
+
+    def retry(self, stage, reason=None):
+        """记录一次重试，reason如 http_412、empty、json、timeout"""
+        self.inc('retries_total', stage=stage, reason=reason)
+
+    def rows(self, stage, count):
+        """记录某阶段解析出的数据条数"""
+        self.inc('rows_parsed_total', count, stage=stage)
+
+    def api_result(self, stage, code):
+        """记录接口返回的业务状态码（HTTP 200 但 ok=0 / code=-412 的情况只能从这里看出来）"""
+        self.inc('api_responses_total', stage=stage, code=code)
+
+    @contextmanager
+    def stage(self, stage):
+        """统计一个阶段（解析、写文件等）的耗时，异常时同样记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start, stage=stage)
+
+    def page_load(self, driver, url, stage='page_load'):
+        """用Selenium打开页面并记录加载耗时；driver.get抛出的异常记录后原样抛出"""
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            driver.get(url)
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            self.observe('page_load_seconds', time.perf_counter() - start, stage=stage)
+            self.inc('page_loads_total', stage=stage, status=status)
+
+    def snapshot(self):
+        """当前所有指标的快照（可直接json.dump）"""
+        with self.lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = [{'name': name, 'labels': dict(labels), 'count': h.count, 'sum': round(h.sum, 6),
+                           'max': round(h.max, 6), 'p50': h.quantile(0.5), 'p95': h.quantile(0.95),
+                           'buckets': {str(bound): count for bound, count in h.cumulative()}}
+                          for (name, labels), h in sorted(self.histograms.items())]
+        now = time.time()
+        return {
+            'name': self.name,
+            'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            'snapshot_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)),
+            'uptime_seconds': round(now - self.started_at, 3),
+            'counters': counters,
+            'histograms': histograms,
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Prometheus 文本格式（exposition format 0.0.4）"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, h.cumulative(), h.sum, h.count) for key, h in self.histograms.items())
+        lines = []
+        described = set()
+
+        def describe(name, default_type):
+            if name in described:
+                return
+            described.add(name)
+            metric_type, help_text = METRIC_HELP.get(name, (default_type, name))
+            lines.append(f'# HELP {PREFIX}{name} {help_text}')
+            lines.append(f'# TYPE {PREFIX}{name} {metric_type}')
+
+        for (name, labels), value in counters:
+            describe(name, 'counter')
+            lines.append(f'{PREFIX}{name}{format_labels(labels)} {value}')
+        for (name, labels), buckets, total, count in histograms:
+            describe(name, 'histogram')
+            for bound, cumulative in buckets:
+                lines.append(f'{PREFIX}{name}_bucket{format_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{PREFIX}{name}_sum{format_labels(labels)} {total:.6f}')
+            lines.append(f'{PREFIX}{name}_count{format_labels(labels)} {count}')
+        lines.append(f'{PREFIX}uptime_seconds {time.time() - self.started_at:.3f}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """按扩展名写出快照（.prom/.txt为Prometheus文本格式，其余为JSON）；先写临时文件再替换，读取方不会读到半个文件"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        content = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return path
+
+    @contextmanager
+    def exporting(self, *paths, interval=60, summary=True):
+        """
+        在with块运行期间每interval秒把快照写到paths，退出时（包括异常、Ctrl+C）再写一次
+        summary: 退出时是否打印耗时汇总
+        """
+        stop = threading.Event()
+
+        def export_all():
+            for path in paths:
+                try:
+                    self.export(path)
+                except OSError as e:
+                    print(f"⚠️ 指标快照写入失败 {path}: {e}")
+
+        def loop():
+            while not stop.wait(interval):
+                export_all()
+
+        thread = threading.Thread(target=loop, name='crawl-metrics-export', daemon=True)
+        if interval:
+            thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            if interval:
+                thread.join()
+            export_all()
+            if summary:
+                self.print_summary()
+            for path in paths:
+                print(f"📈 指标快照: {os.path.abspath(path)}")
+
+    def print_summary(self, top=15):
+        """按接口打印请求数、失败数、总耗时、分位数和流量，以及重试、解析条数和各阶段耗时"""
+        snapshot = self.snapshot()
+        counters = snapshot['counters']
+        print(f"\n📈 指标汇总（运行 {snapshot['uptime_seconds']:.1f} 秒）")
+
+        requests_by_endpoint = {}
+        for item in counters:
+            if item['name'] == 'http_requests_total':
+                stats = requests_by_endpoint.setdefault(item['labels']['endpoint'], {'total': 0, 'failed': 0})
+                stats['total'] += item['value']
+                status = item['labels'].get('status', '')
+                if not (status.isdigit() and int(status) < 400):
+                    stats['failed'] += item['value']
+        nbytes = {item['labels']['endpoint']: item['value'] for item in counters
+                  if item['name'] == 'http_response_bytes_total'}
+
+        timings = sorted((h for h in snapshot['histograms'] if h['name'] == 'http_request_seconds'),
+                         key=lambda h: -h['sum'])
+        if timings:
+            print(f"  {'接口':<48}{'请求':>7}{'失败':>6}{'总耗时s':>9}{'p50≤':>7}{'p95≤':>7}{'MB':>8}")
+            for h in timings[:top]:
+                endpoint = h['labels']['endpoint']
+                stats = requests_by_endpoint.get(endpoint, {'total': h['count'], 'failed': 0})
+                print(f"  {endpoint[:48]:<48}{stats['total']:>7}{stats['failed']:>6}{h['sum']:>9.1f}"
+                      f"{h['p50']:>7g}{h['p95']:>7g}{nbytes.get(endpoint, 0) / 1024 / 1024:>8.2f}")
+
+        for name, title in (('page_load_seconds', '页面加载'), ('stage_seconds', '阶段耗时')):
+            for h in snapshot['histograms']:
+                if h['name'] == name:
+                    print(f"  {title} {h['labels'].get('stage')}: {h['count']}次，共{h['sum']:.1f}秒，"
+                          f"p50≤{h['p50']:g}s，p95≤{h['p95']:g}s")
+        for name, title in (('api_responses_total', '接口返回码'), ('retries_total', '重试'), ('rows_parsed_total', '解析条数'),
+                            ('page_loads_total', '页面加载结果')):
+            items = [item for item in counters if item['name'] == name]
+            if items:
+                # stage 标签放在最前面，如 bilibili_reply/-412=3
+                print(f"  {title}: " + '，'.join(
+                    f"{'/'.join(v for _, v in sorted(item['labels'].items(), key=lambda kv: kv[0] != 'stage'))}"
+                    f"={item['value']}" for item in items))
+
+
+# 各爬虫默认共用的指标对象
+METRICS = CrawlMetrics()
+
+
+def instrument_session(session, metrics=None, label=endpoint_label):
+    """
+    给requests.Session加上埋点：替换该实例的send，记录每个请求（含重定向的每一跳）的耗时、状态码、字节数
+    stream=True 的请求按 iter_content 实际读到的字节计数，耗时只算到收到响应头为止
+    label: URL -> 接口标签，图片等路径各不相同的请求可传入自定义函数归为一类
+    同一个Session重复调用不会重复包装；返回session本身
+    """
+    metrics = metrics or METRICS
+    if getattr(session, 'metrics', None) is not None:
+        return session
+    send = session.send
+
+    def instrumented_send(request, **kwargs):
+        endpoint = label(request.url)
+        start = time.perf_counter()
+        try:
+            response = send(request, **kwargs)
+        except Exception as e:
+            metrics.record_request(endpoint, type(e).__name__, time.perf_counter() - start)
+            raise
+        elapsed = time.perf_counter() - start
+        if kwargs.get('stream'):
+            metrics.record_request(endpoint, response.status_code, elapsed)
+            iter_content = response.iter_content
+
+            def counted_iter_content(*args, **iter_kwargs):
+                for chunk in iter_content(*args, **iter_kwargs):
+                    metrics.inc('http_response_bytes_total', len(chunk), endpoint=endpoint)
+                    yield chunk
+
+            response.iter_content = counted_iter_content
+        else:
+            metrics.record_request(endpoint, response.status_code, elapsed, len(response.content or b''))
+        return response
+
+    session.send = instrumented_send
+    session.metrics = metrics
+    return session
+
+
+def trace_config(metrics=None):
+    """
+    aiohttp 的埋点：ClientSession(trace_configs=[trace_config()])
+    耗时记录到收到响应头为止，响应体字节数在读取时累加
+    """
+    import aiohttp  # 只有异步爬虫需要aiohttp
+
+    metrics = metrics or METRICS
+    config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params):
+        context.endpoint = endpoint_label(str(params.url))
+        context.start = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        metrics.record_request(context.endpoint, params.response.status, time.perf_counter() - context.start)
+
+    async def on_request_exception(session, context, params):
+        metrics.record_request(context.endpoint, type(params.exception).__name__, time.perf_counter() - context.start)
+
+    async def on_response_chunk_received(session, context, params):
+        metrics.inc('http_response_bytes_total', len(params.chunk), endpoint=endpoint_label(str(params.url)))
+
+    config.on_request_start.append(on_request_start)
+    config.on_request_end.append(on_request_end)
+    config.on_request_exception.append(on_request_exception)
+    config.on_response_chunk_received.append(on_response_chunk_received)
+    return config
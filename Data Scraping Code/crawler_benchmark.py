@@ -0,0 +1,290 @@
+"""
+爬虫基准测试（连本地回放服务器 replay_server.py，不访问真实平台）
+- 每个场景在单独的子进程中运行，峰值内存（ru_maxrss）互不影响
+- 子进程里把 requests 发往 m.weibo.cn / api.bilibili.com / comment.bilibili.com 的请求改发到回放服务器，
+  爬虫代码本身不做任何修改，走的仍是真实的 Session、连接池、JSON解析和限速逻辑
+- 报告：页数/秒、评论数/秒、请求延迟 p50/p99、峰值内存；可保存为JSON作为基线，之后对比发现性能退化
+
+场景：
+    weibo_posts          get_weibo_posts 关键词搜索翻页
+    weibo_comments       get_comments 多条微博沿 max_id 翻页（多线程）
+    bilibili             BilibiliCompleteCrawler 沿游标逐页爬取
+    bilibili_concurrent  BilibiliCompleteCrawler 多线程按页码爬取
+    danmaku              danmaku_stream.iter_danmaku 流式解析XML弹幕
+
+用法：python crawler_benchmark.py [场景 ...] [--latency 0.02] [--fail-rate 0.05] [--save 基线.json] [--baseline 基线.json]
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+from replay_server import ReplayServer
+
+SCRAPING_DIR = os.path.dirname(os.path.abspath(__file__))
+REPLAYED_HOSTS = ('m.weibo.cn', 'api.bilibili.com', 'comment.bilibili.com')
+# 视频信息等非翻页接口不计入页数
+PAGE_PATHS = ('/api/container/getIndex', '/comments/hotflow', '/x/v2/reply/main', '/x/v2/reply', '.xml')
+# 不限速：令牌桶每秒的令牌数足够大，测的是爬虫本身的开销
+UNLIMITED = 1e9
+
+SCENARIOS = ['weibo_posts', 'weibo_comments', 'bilibili', 'bilibili_concurrent', 'danmaku']
+
+
+def load_script(filename, module_name):
+    """按文件路径导入爬虫脚本（文件名含中文和“+”，不能直接import）"""
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRAPING_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values, q):
+    """最近秩百分位数，values为空时返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def peak_rss_mb():
+    # Linux 下 ru_maxrss 单位为KB，macOS 下为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+class RequestLog:
+    """记录每个请求的用时和回放结果（多线程共用）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = []  # (路径, 用时秒, 结果)
+
+    def add(self, path, seconds, outcome):
+        with self.lock:
+            self.records.append((path, seconds, outcome))
+
+    @property
+    def latencies(self):
+        return [seconds for _, seconds, _ in self.records]
+
+    @property
+    def pages(self):
+        """成功返回的翻页请求数"""
+        return sum(1 for path, _, outcome in self.records if outcome == 'ok' and path.endswith(PAGE_PATHS))
+
+    def outcomes(self):
+        counts = {}
+        for _, _, outcome in self.records:
+            counts[outcome] = counts.get(outcome, 0) + 1
+        return counts
+
+
+@contextlib.contextmanager
+def redirect_requests(server_url, request_log=None):
+    """
+    把 https://{微博/B站域名}/路径 的请求改发到 {server_url}/{域名}/路径，并记录每个请求的用时
+    替换的是 requests.Session.send，爬虫里各自创建的Session都会生效
+    """
+    import requests
+
+    original_send = requests.Session.send
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        if parts.hostname not in REPLAYED_HOSTS:
+            return original_send(self, request, **kwargs)
+        request.url = f"{server_url}/{parts.hostname}{parts.path}" + (f"?{parts.query}" if parts.query else '')
+        start = time.perf_counter()
+        try:
+            response = original_send(self, request, **kwargs)
+        except requests.RequestException:
+            if request_log is not None:
+                request_log.add(parts.path, time.perf_counter() - start, 'exception')
+            raise
+        # 非stream请求在send返回前已读完响应体，用时包括下载
+        if request_log is not None:
+            request_log.add(parts.path, time.perf_counter() - start, response.headers.get('X-Replay-Outcome', 'ok'))
+        return response
+
+    requests.Session.send = send
+    try:
+        yield
+    finally:
+        requests.Session.send = original_send
+
+
+# ---------------------- 各场景（子进程中执行，返回爬到的条数） ----------------------
+def bench_weibo_posts(workdir, keywords=3, pages=20):
+    module = load_script('微博帖子爬取+清洗.py', 'weibo_posts')
+    return sum(len(module.get_weibo_posts(f"宠物殡葬{i}", pages=pages, delay=(0, 0))) for i in range(keywords))
+
+
+def bench_weibo_comments(workdir, posts=20, pages=10, workers=4):
+    module = load_script('微博评论批量获取.py', 'weibo_comments')
+    weibo_ids = [str(5169109194771664 + i) for i in range(posts)]
+    return module.get_comments(weibo_ids, os.path.join(workdir, '数据评论.csv'), pages, max_workers=workers,
+                               requests_per_second=UNLIMITED)
+
+
+def _bilibili_crawler(workdir, workers):
+    from video_meta_cache import VideoMetaCache
+
+    module = load_script('bilibili评论爬取.py', 'bilibili_comments')
+    crawler = module.BilibiliCompleteCrawler(requests_per_second=UNLIMITED, max_workers=workers)
+    # 视频信息缓存放到临时目录，不写入仓库里的 video_meta.sqlite
+    crawler.video_cache.close()
+    crawler.video_cache = VideoMetaCache(os.path.join(workdir, 'video_meta.sqlite'), session=crawler.session)
+    return crawler
+
+
+def _count_comments(crawler, videos, pages):
+    """crawl_all_comments 是生成器，逐条消费计数"""
+    urls = [f"https://www.bilibili.com/video/BV1xx411c7X{i}" for i in range(videos)]
+    return sum(sum(1 for _ in crawler.crawl_all_comments(url, max_pages=pages)) for url in urls)
+
+
+def bench_bilibili(workdir, videos=3, pages=20):
+    crawler = _bilibili_crawler(workdir, workers=1)
+    return _count_comments(crawler, videos, pages)
+
+
+def bench_bilibili_concurrent(workdir, videos=3, pages=20, workers=4):
+    crawler = _bilibili_crawler(workdir, workers=workers)
+    return _count_comments(crawler, videos, pages)
+
+
+def bench_danmaku(workdir, videos=5):
+    import danmaku_stream
+
+    session = danmaku_stream.create_session()
+    return sum(sum(1 for _ in danmaku_stream.iter_danmaku(100000000 + i, session=session)) for i in range(videos))
+
+
+def run_scenario(name, server_url, verbose=False):
+    """子进程入口：运行一个场景，返回指标字典"""
+    sys.path.insert(0, SCRAPING_DIR)
+    request_log = RequestLog()
+    bench = globals()[f"bench_{name}"]
+    output = sys.stdout if verbose else io.StringIO()  # 爬虫的进度输出默认不显示
+    with tempfile.TemporaryDirectory() as workdir, redirect_requests(server_url, request_log), \
+            contextlib.redirect_stdout(output):
+        start = time.perf_counter()
+        items = bench(workdir)
+        seconds = time.perf_counter() - start
+
+    latencies = request_log.latencies
+    pages = request_log.pages
+    return {
+        'scenario': name,
+        'seconds': round(seconds, 3),
+        'requests': len(latencies),
+        'pages': pages,
+        'comments': items,
+        'pages_per_sec': round(pages / seconds, 1) if seconds else None,
+        'comments_per_sec': round(items / seconds, 1) if seconds else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'outcomes': request_log.outcomes(),
+    }
+
+
+# ---------------------- 汇总与基线对比 ----------------------
+def print_report(results):
+    header = f"{'场景':<20}{'页/秒':>10}{'评论/秒':>12}{'p50(ms)':>10}{'p99(ms)':>10}{'峰值内存(MB)':>14}{'请求数':>8}"
+    print(header)
+    print('-' * 86)
+    for r in results:
+        failed = {k: v for k, v in r['outcomes'].items() if k != 'ok'}
+        print(f"{r['scenario']:<20}{r['pages_per_sec']:>10}{r['comments_per_sec']:>12}{r['p50_ms']:>10}"
+              f"{r['p99_ms']:>10}{r['peak_rss_mb']:>14}{r['requests']:>8}" + (f"  失败{failed}" if failed else ''))
+
+
+def compare_with_baseline(results, baseline, tolerance=0.2):
+    """
+    与基线对比：吞吐量下降、p99延迟或峰值内存上升超过tolerance比例时视为退化
+    :return: 退化项列表 [(场景, 指标, 基线值, 当前值)]
+    """
+    previous = {r['scenario']: r for r in baseline}
+    regressions = []
+    for r in results:
+        base = previous.get(r['scenario'])
+        if not base:
+            continue
+        for key in ('pages_per_sec', 'comments_per_sec'):
+            if base.get(key) and r[key] is not None and r[key] < base[key] * (1 - tolerance):
+                regressions.append((r['scenario'], key, base[key], r[key]))
+        for key in ('p99_ms', 'peak_rss_mb'):
+            if base.get(key) and r[key] is not None and r[key] > base[key] * (1 + tolerance):
+                regressions.append((r['scenario'], key, base[key], r[key]))
+    return regressions
+
+
+def run_benchmarks(scenarios=None, latency=0.0, jitter=0.0, error_rate=0.0, fail_rate=0.0, fixtures_dir=None,
+                   verbose=False, **options):
+    """
+    启动回放服务器，逐个场景在新的子进程中运行
+    options: 合成数据规模，见 replay_server.DEFAULT_OPTIONS
+    :return: 各场景的指标列表
+    """
+    scenarios = scenarios or SCENARIOS
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"未知的场景：{unknown}，可选 {SCENARIOS}")
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    with ReplayServer(latency=latency, jitter=jitter, error_rate=error_rate, fail_rate=fail_rate,
+                      fixtures_dir=fixtures_dir, **options) as server:
+        print(f"回放服务器：{server.url}（延迟{latency}s+{jitter}s，HTTP错误率{error_rate}，接口失败率{fail_rate}）")
+        for name in scenarios:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(run_scenario, name, server.url, verbose).result()
+            print(f"✓ {name}: {result['comments']}条，{result['seconds']}秒")
+            results.append(result)
+    print()
+    print_report(results)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="爬虫基准测试（本地回放服务器）")
+    parser.add_argument('scenarios', nargs='*', help=f"要运行的场景，默认全部：{' '.join(SCENARIOS)}")
+    parser.add_argument('--latency', type=float, default=0.0, help="回放服务器每个请求的固定延迟(秒)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="额外的随机延迟上限(秒)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="HTTP 500 的比例")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="ok: 0 / code 非0 的比例")
+    parser.add_argument('--fixtures', default=None, help="录制响应目录")
+    parser.add_argument('--save', default=None, help="把结果保存为JSON（作为基线）")
+    parser.add_argument('--baseline', default=None, help="与基线JSON对比，有退化时退出码为1")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="允许的波动比例，默认0.2")
+    parser.add_argument('--verbose', action='store_true', help="显示爬虫自身的输出")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scenarios, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             fail_rate=args.fail_rate, fixtures_dir=args.fixtures, verbose=args.verbose)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.save}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n✗ 发现 {len(regressions)} 项性能退化（超过{args.tolerance:.0%}）：")
+            for scenario, key, before, after in regressions:
+                print(f"  {scenario} {key}: {before} -> {after}")
+            sys.exit(1)
+        print(f"\n✓ 与基线相比没有超过{args.tolerance:.0%}的退化")
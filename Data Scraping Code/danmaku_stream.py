@@ -0,0 +1,266 @@
+"""
+B站弹幕流式解析
+- XML弹幕（comment.bilibili.com/{cid}.xml）：边下载边用XMLPullParser解析，解析完的元素立即清除
+- 分段protobuf弹幕（x/v2/dm/web/seg.so，每段6分钟）：逐段下载解析，内存只与单段大小有关，适合10万条以上弹幕的长视频
+两种方式产出的每条弹幕字段相同，p属性/protobuf字段一次转换为对应类型
+crawl_danmaku_batch 批量模式：多个BV号的所有分P并发爬取，视频cid从VideoMetaCache读取
+"""
+import json
+import os
+import random
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from crawl_metrics import METRICS, instrument_session
+from rate_limiter import TokenBucket
+from video_meta_cache import VideoMetaCache
+
+XML_URL = "https://comment.bilibili.com/{cid}.xml"
+SEGMENT_URL = "https://api.bilibili.com/x/v2/dm/web/seg.so"
+SEGMENT_SECONDS = 360  # 每个分段覆盖6分钟
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
+    "Referer": "https://www.bilibili.com/"
+}
+
+# XML中p属性的字段顺序：出现时间(秒),类型,字体大小,颜色,发送时间戳,弹幕池,发送者ID哈希,弹幕ID,屏蔽等级
+P_FIELDS = (
+    ('出现时间', float), ('弹幕类型', int), ('字体大小', int), ('颜色', int), ('发送时间', int),
+    ('弹幕池', int), ('用户哈希', str), ('弹幕ID', str), ('权重', int),
+)
+
+# XML 1.0 不允许的控制字符（\t \n \r 以外的 0x00-0x1F）；弹幕里偶尔会有，不去掉的话整个文件从这里开始解析失败
+# 这些字节不会出现在UTF-8多字节字符中，可以直接按字节删除
+XML_INVALID_BYTES = bytes(b for b in range(0x20) if b not in (0x09, 0x0A, 0x0D))
+
+
+def decode_text(value):
+    """protobuf字符串字段解码，个别弹幕编码有误时用替换字符，不中断整个分段"""
+    return value.decode('utf-8', errors='replace')
+
+
+# protobuf DanmakuElem 字段号 -> (字段名, 转换函数)；出现时间在protobuf中为毫秒
+ELEM_FIELDS = {
+    1: ('弹幕ID', str), 2: ('出现时间', lambda ms: ms / 1000), 3: ('弹幕类型', int), 4: ('字体大小', int),
+    5: ('颜色', int), 6: ('用户哈希', decode_text), 7: ('弹幕内容', decode_text), 8: ('发送时间', int),
+    9: ('权重', int), 11: ('弹幕池', int),
+}
+
+
+def create_session(pool_size=1):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(HEADERS)
+    return instrument_session(session)
+
+
+def parse_p(p):
+    """把p属性一次转换成带类型的字段"""
+    return {name: convert(value) for (name, convert), value in zip(P_FIELDS, p.split(','))}
+
+
+def iter_danmaku_xml(chunks):
+    """
+    从字节块流中逐条解析XML弹幕
+    chunks: 可迭代的bytes（如response.iter_content()）
+    XML 1.0 不允许的控制字符在送入解析器前去掉，避免一条弹幕导致后面的弹幕全部丢失
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    root = None
+    for chunk in chunks:
+        parser.feed(chunk.translate(None, XML_INVALID_BYTES))
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+            if elem.tag != 'd':
+                continue
+            p = elem.get('p')
+            content = elem.text
+            if p and content:
+                try:
+                    row = parse_p(p)
+                except ValueError:
+                    row = None
+                if row and len(row) >= 5:
+                    row['弹幕内容'] = content
+                    yield row
+            # 已解析的弹幕从根节点移除，内存不随弹幕数增长
+            root.clear()
+    parser.close()
+
+
+def iter_danmaku(cid, session=None, chunk_size=64 * 1024, rate_limiter=None):
+    """边下载边解析某个cid的XML弹幕"""
+    session = session or create_session()
+    if rate_limiter:
+        rate_limiter.acquire()
+    with session.get(XML_URL.format(cid=cid), timeout=15, stream=True) as response:
+        if response.status_code != 200:
+            print(f"获取弹幕失败，状态码：{response.status_code}")
+            return
+        yield from iter_danmaku_xml(response.iter_content(chunk_size=chunk_size))
+
+
+def read_varint(buf, pos):
+    """读取protobuf的varint，返回(值, 新位置)"""
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def iter_fields(buf, pos=0, end=None):
+    """
+    遍历protobuf消息的字段，产出(字段号, 值)
+    varint字段的值为int，length-delimited字段的值为bytes，定长字段跳过
+    """
+    end = len(buf) if end is None else end
+    while pos < end:
+        key, pos = read_varint(buf, pos)
+        field_no, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = read_varint(buf, pos)
+            yield field_no, value
+        elif wire_type == 2:
+            length, pos = read_varint(buf, pos)
+            yield field_no, bytes(buf[pos:pos + length])
+            pos += length
+        elif wire_type == 1:
+            pos += 8
+        elif wire_type == 5:
+            pos += 4
+        else:
+            raise ValueError(f"不支持的protobuf wire type: {wire_type}")
+
+
+def parse_segment(buf):
+    """解析一个分段（DmSegMobileReply，字段1为重复的DanmakuElem）"""
+    for field_no, value in iter_fields(buf):
+        if field_no != 1 or not isinstance(value, bytes):
+            continue
+        row = {}
+        for elem_field, elem_value in iter_fields(value):
+            if elem_field in ELEM_FIELDS:
+                name, convert = ELEM_FIELDS[elem_field]
+                row[name] = convert(elem_value)
+        if row.get('弹幕内容'):
+            yield row
+
+
+def iter_danmaku_segments(cid, duration=None, session=None, delay=(0.3, 0.8), rate_limiter=None):
+    """
+    逐段下载并解析protobuf弹幕
+    duration: 视频时长(秒)，用于计算分段数；None时一直请求到返回空分段为止
+    delay: 每段请求之间的随机等待(秒)，传入rate_limiter时改用令牌桶限速
+    """
+    session = session or create_session()
+    total_segments = -(-int(duration) // SEGMENT_SECONDS) if duration else None
+    segment_index = 1
+    while total_segments is None or segment_index <= total_segments:
+        if rate_limiter:
+            rate_limiter.acquire()
+        response = session.get(SEGMENT_URL, params={'type': 1, 'oid': cid, 'segment_index': segment_index},
+                               timeout=15)
+        if response.status_code != 200:
+            print(f"分段{segment_index}获取失败，状态码：{response.status_code}")
+            break
+        count = 0
+        for row in parse_segment(response.content):
+            count += 1
+            yield row
+        if count == 0 and total_segments is None:
+            break
+        segment_index += 1
+        if not rate_limiter:
+            time.sleep(random.uniform(*delay))
+
+
+def save_danmaku_json(rows, filename):
+    """把弹幕逐条写成JSON数组文件，不需要先把全部弹幕放进列表；返回写入条数"""
+    count = 0
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write("[")
+        for row in rows:
+            f.write(",\n  " if count else "\n  ")
+            f.write(json.dumps(row, ensure_ascii=False))
+            count += 1
+        f.write("\n]\n" if count else "]\n")
+    return count
+
+
+def crawl_danmaku_batch(bvids, output_dir='弹幕数据', workers=4, requests_per_second=3, use_segments=False,
+                        cache=None):
+    """
+    批量爬取多个视频所有分P的弹幕，每个分P一个JSON文件（{bvid}_p{分P}_弹幕数据.json）
+    bvids: BV号列表
+    workers: 并发线程数（同时下载的分P数）
+    requests_per_second: 所有线程共享的每秒请求数上限
+    use_segments: 使用分段protobuf接口（弹幕多的长视频）
+    cache: VideoMetaCache，None时使用默认数据库
+    :return: {(bvid, 分P): 弹幕条数}，失败的分P为None
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    session = create_session(workers)
+    cache = cache or VideoMetaCache(session=session)
+    rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+
+    # 1. 查出每个视频的分P列表（已缓存的视频不请求接口）
+    tasks = []
+    for bvid in dict.fromkeys(bvids):
+        info = cache.lookup(bvid)
+        if info is None:
+            if rate_limiter:
+                rate_limiter.acquire()
+            info = cache.fetch(bvid)
+        if info is None:
+            print(f"✗ {bvid} 获取视频信息失败，跳过")
+            continue
+        for page in info['pages']:
+            tasks.append((bvid, page))
+    print(f"共{len(tasks)}个分P待爬取弹幕，{workers}个线程")
+
+    # 2. 所有分P并发下载，每个分P边解析边写文件
+    def crawl_page(bvid, page):
+        if use_segments:
+            rows = iter_danmaku_segments(page['cid'], duration=page.get('duration'), session=session,
+                                         rate_limiter=rate_limiter)
+        else:
+            rows = iter_danmaku(page['cid'], session=session, rate_limiter=rate_limiter)
+        tagged = ({'BV号': bvid, '分P': page['page'], **row} for row in rows)
+        # 边下载边解析边写文件，三者交错进行，按分P整体计时
+        with METRICS.stage('danmaku_part'):
+            count = save_danmaku_json(tagged, os.path.join(output_dir, f"{bvid}_p{page['page']}_弹幕数据.json"))
+        METRICS.rows('danmaku', count)
+        return count
+
+    results = {}
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(crawl_page, bvid, page): (bvid, page['page']) for bvid, page in tasks}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+                print(f"✓ {key[0]} P{key[1]}: {results[key]}条弹幕")
+            except Exception as e:
+                results[key] = None
+                print(f"✗ {key[0]} P{key[1]} 爬取失败: {str(e)[:80]}")
+
+    total = sum(count for count in results.values() if count)
+    print(f"批量完成：{len(results)}个分P，共{total}条弹幕，用时{time.time() - start_time:.1f}秒，保存在 {output_dir}")
+    return results
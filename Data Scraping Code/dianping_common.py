@@ -0,0 +1,132 @@
+"""
+大众点评爬虫的公共部分：城市/页码设置、搜索地址、ShopStore、分片和本地HTML样本服务
+不依赖selenium，HTTP快速通道（dianping_http）和浏览器池（dianping_scraper）共用
+"""
+import functools
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+BASE_URL = 'https://www.dianping.com'
+KEYWORD = '宠物殡葬'
+# 大众点评城市ID及各城市搜索结果页数（与各城市notebook中的设置一致）
+CITY_IDS = {'北京': 2, '上海': 1, '广州': 4, '深圳': 7}
+CITY_PAGES = {'北京': 14, '上海': 25, '广州': 16, '深圳': 12}
+
+
+def search_url(city, page, keyword=KEYWORD, base_url=BASE_URL):
+    """某城市搜索结果第page页的地址（第1页没有/p1后缀）"""
+    url = f"{base_url}/search/keyword/{CITY_IDS[city]}/0_{quote(keyword)}"
+    return url if page == 1 else f"{url}/p{page}"
+
+
+class ShopStore:
+    """
+    按城市保存店铺的JSON文件
+    {"shops": {城市: [店铺, ...]}, "pages": {城市: [已完成的页码, ...]}}
+    同一城市内按链接去重；已完成的页码在重新运行时会跳过
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.shops = {}
+        self.pages = {}
+        self.links = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.shops = data.get('shops', {})
+            self.pages = {city: set(pages) for city, pages in data.get('pages', {}).items()}
+            self.links = {city: {s['link'] for s in shops} for city, shops in self.shops.items()}
+
+    def is_done(self, city, page):
+        return page in self.pages.get(city, ())
+
+    def add_page(self, city, page, shops):
+        """记录一页的店铺，返回新增的店铺数"""
+        with self.lock:
+            city_shops = self.shops.setdefault(city, [])
+            links = self.links.setdefault(city, set())
+            added = 0
+            for shop in shops:
+                if shop['link'] != "无链接" and shop['link'] in links:
+                    continue
+                links.add(shop['link'])
+                city_shops.append(shop)
+                added += 1
+            self.pages.setdefault(city, set()).add(page)
+            return added
+
+    def save(self):
+        """先写临时文件再替换，避免中断时文件损坏"""
+        with self.lock:
+            data = {
+                'shops': self.shops,
+                'pages': {city: sorted(pages) for city, pages in self.pages.items()},
+                'updated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def count(self, city=None):
+        if city:
+            return len(self.shops.get(city, []))
+        return sum(len(shops) for shops in self.shops.values())
+
+    def to_dataframe(self):
+        """所有城市合并为一张表，按城市、页码、序号排序"""
+        rows = [shop for shops in self.shops.values() for shop in shops]
+        df = pd.DataFrame(rows)
+        if not df.empty:
+            df = df.sort_values(['city', 'page', 'index']).reset_index(drop=True)
+        return df
+
+    def to_excel(self, path):
+        self.to_dataframe().to_excel(path, index=False, engine="openpyxl")
+        print(f"✅ 已导出Excel：{path}")
+
+
+def make_shards(cities=None, pages=None):
+    """
+    生成(城市, 页码)分片，不同城市交错排列，避免同一时间集中请求一个城市
+    pages: 每个城市的页数，None时使用CITY_PAGES；也可以是{城市: 页数}
+    """
+    cities = list(cities or CITY_PAGES)
+    if pages is None:
+        pages = CITY_PAGES
+    page_counts = {city: pages[city] if isinstance(pages, dict) else pages for city in cities}
+    max_pages = max(page_counts.values()) if page_counts else 0
+    return [(city, page) for page in range(1, max_pages + 1) for city in cities if page <= page_counts[city]]
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """本地HTML样本服务：/search/keyword/<城市ID>/0_<关键词>[/p<页码>] 对应目录下的 <城市ID>_p<页码>.html"""
+
+    def translate_path(self, path):
+        match = re.search(r'/search/keyword/(\d+)/0_[^/?]*(?:/p(\d+))?', unquote(path))
+        if match:
+            return os.path.join(self.directory, f"{match.group(1)}_p{match.group(2) or 1}.html")
+        return super().translate_path(path)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_fixtures(fixture_dir, port=0):
+    """
+    在后台线程启动本地HTTP服务，用保存的列表页HTML代替大众点评
+    :return: (server, base_url)，把base_url传给crawl_cities即可离线测试；用完调用server.shutdown()
+    """
+    handler = functools.partial(FixtureHandler, directory=fixture_dir)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
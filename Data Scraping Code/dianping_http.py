@@ -0,0 +1,208 @@
+"""
+大众点评搜索列表页的HTTP快速通道
+店铺名、地址、星级、评论数、人均都在静态HTML里，直接用requests请求 + lxml预编译XPath解析，不用启动Chrome；
+只有拿不到店铺列表的页（验证码、需要执行JS）才交给 dianping_scraper 的浏览器池重新抓取；
+selenium只在需要补抓时才导入，没有安装selenium也能单独使用HTTP通道（browser_fallback=False）
+"""
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from urllib.parse import urljoin
+
+import requests
+from lxml import etree, html as lxml_html
+from requests.adapters import HTTPAdapter
+
+from crawl_metrics import METRICS, instrument_session
+from dianping_common import BASE_URL, CITY_PAGES, KEYWORD, ShopStore, make_shards, search_url, serve_fixtures
+from rate_limiter import TokenBucket
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/130.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9',
+    'Referer': 'https://www.dianping.com/',
+}
+
+
+def has_class(name):
+    """XPath中按class精确匹配（等价于CSS的 .name）"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# 与浏览器版 extract_shops 的CSS选择器一一对应，导入时编译一次
+SHOP_LIST = etree.XPath('//*[@id="shop-all-list"]')
+SHOP_ITEMS = etree.XPath(f'//*[@id="shop-all-list"]/ul/li/div[{has_class("txt")}]')
+NAME = etree.XPath(f'.//*[{has_class("tit")}]/a/h4')                                  # .tit > a > h4
+LINK = etree.XPath(f'.//div[{has_class("tit")}]/a/@href')                             # div.tit > a
+ADDRESS = etree.XPath(f'.//div[{has_class("tag-addr")}]/*[3][self::a]/span')          # div.tag-addr > a:nth-child(3) > span
+AVG_PRICE = etree.XPath(f'.//*[{has_class("mean-price")}]')                           # .mean-price
+REVIEW_NUM = etree.XPath(f'.//div[{has_class("comment")}]/a[{has_class("review-num")}]')  # div.comment > a.review-num
+STAR_CLASS = etree.XPath(f'.//*[{has_class("nebula_star")}]//*[{has_class("star_icon")}]'
+                         f'//*[{has_class("star")}]/@class')                          # .nebula_star .star_icon .star
+DIGITS = re.compile(r"\d+")
+STAR_LEVEL = re.compile(r"star_(\d+)")
+SPACES = re.compile(r"\s+")
+
+
+def element_text(elements):
+    """取第一个元素的文本（含子元素），合并空白，与selenium的.text一致"""
+    if not elements:
+        return None
+    return SPACES.sub(' ', elements[0].text_content()).strip()
+
+
+def parse_shops_html(page_html, city, page, page_url):
+    """
+    解析一页列表页HTML
+    :return: 店铺列表；页面为空、无法解析或没有店铺列表容器（验证码或需要JS渲染）时返回None
+    """
+    if not page_html or not page_html.strip():
+        return None  # 反爬时常返回空白页
+    try:
+        tree = lxml_html.fromstring(page_html)
+    except (etree.ParserError, ValueError):
+        return None
+    if not SHOP_LIST(tree):
+        return None
+
+    shops = []
+    for idx, item in enumerate(SHOP_ITEMS(tree), 1):
+        links = LINK(item)
+        comment_num = "无评论数"
+        comment_text = element_text(REVIEW_NUM(item))
+        if comment_text:
+            match = DIGITS.search(comment_text)
+            if match:
+                comment_num = match.group()
+        star = "无星级"
+        star_classes = STAR_CLASS(item)
+        if star_classes:
+            match = STAR_LEVEL.search(star_classes[0])
+            if match:
+                star = f"{int(match.group(1))/10}分"
+
+        shops.append({
+            "city": city, "page": page, "index": idx,
+            "name": element_text(NAME(item)) or f"无名_{idx}",
+            "link": urljoin(page_url, links[0]) if links else "无链接",
+            "address": element_text(ADDRESS(item)) or "无地址",
+            "avg_price": element_text(AVG_PRICE(item)) or "无人均",
+            "comment_num": comment_num, "star": star
+        })
+    return shops
+
+
+def create_session(pool_size=8, cookie=None):
+    """所有线程共用的Session（连接池大小与线程数一致）"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(HEADERS)
+    if cookie:
+        session.headers['Cookie'] = cookie
+    return instrument_session(session)
+
+
+def fetch_shops(session, city, page, keyword=KEYWORD, base_url=BASE_URL, rate_limiter=None, timeout=15):
+    """请求并解析一页，返回店铺列表；请求失败或需要浏览器时返回None"""
+    if rate_limiter:
+        rate_limiter.acquire()
+    url = search_url(city, page, keyword, base_url)
+    try:
+        response = session.get(url, timeout=timeout)
+    except requests.RequestException as e:
+        print(f"⚠️ {city}第{page}页请求失败：{str(e)[:80]}")
+        return None
+    if response.status_code != 200:
+        return None
+    if 'charset' not in response.headers.get('Content-Type', ''):
+        response.encoding = 'utf-8'  # 未声明编码时按utf-8解码（大众点评页面均为utf-8）
+    with METRICS.stage('dianping_http_parse'):
+        shops = parse_shops_html(response.text, city, page, response.url)
+    # 拿不到店铺列表多半是验证码，单独计数便于判断是否该降速或换Cookie
+    METRICS.api_result('dianping_http', 'no_shop_list' if shops is None else 'ok')
+    if shops is not None:
+        METRICS.rows('dianping_http', len(shops))
+    return shops
+
+
+def crawl_cities_http(store, cities=None, pages=None, workers=8, requests_per_second=2, cookie=None,
+                      keyword=KEYWORD, base_url=BASE_URL, browser_fallback=True, browser_workers=2,
+                      **browser_options):
+    """
+    先用HTTP并发抓取所有列表页，拿不到店铺列表的页再用浏览器池补抓
+    store: ShopStore（与浏览器版共用，已完成的页会跳过）
+    workers: HTTP并发线程数
+    requests_per_second: 所有线程共享的每秒请求数上限，None为不限速
+    browser_fallback: 是否用浏览器补抓失败页（需要selenium和Chrome）
+    :return: 最终仍失败的(城市, 页码)列表
+    """
+    shards = [shard for shard in make_shards(cities, pages) if not store.is_done(*shard)]
+    print(f"\n📌 HTTP快速通道：{len(shards)}页待爬取，{workers}个线程")
+    session = create_session(workers, cookie)
+    rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+
+    start_time = time.time()
+    need_browser = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(fetch_shops, session, city, page, keyword, base_url, rate_limiter): (city, page)
+            for city, page in shards
+        }
+        for future in as_completed(futures):
+            city, page = futures[future]
+            try:
+                shops = future.result()
+            except Exception as e:
+                # 单页的意外错误不影响其他页，交给浏览器补抓
+                print(f"⚠️ {city}第{page}页抓取异常：{str(e)[:80]}")
+                shops = None
+            if shops is None:
+                need_browser.append((city, page))
+                continue
+            added = store.add_page(city, page, shops)
+            store.save()
+            print(f"📊 {city}第{page}页：{len(shops)}家，新增{added}家（{city}累计{store.count(city)}家）")
+    print(f"✅ HTTP完成{len(shards) - len(need_browser)}/{len(shards)}页，用时{time.time() - start_time:.1f}秒")
+
+    if not need_browser:
+        return []
+    need_browser.sort()
+    if not browser_fallback:
+        print(f"⚠️ {len(need_browser)}页需要浏览器：{need_browser}")
+        return need_browser
+
+    # 只有这里才会导入selenium并启动Chrome；失败页之外的页都已记入store，浏览器版会自动跳过
+    from dianping_scraper import crawl_cities
+
+    print(f"🔁 {len(need_browser)}页改用浏览器抓取")
+    fallback_pages = {}
+    for city, page in need_browser:
+        fallback_pages[city] = max(fallback_pages.get(city, 0), page)
+    return crawl_cities(store, cities=list(fallback_pages), pages=fallback_pages, workers=browser_workers,
+                        keyword=keyword, base_url=base_url, **browser_options)
+
+
+if __name__ == "__main__":
+    cities = input(f"要爬取的城市（逗号分隔，默认 {','.join(CITY_PAGES)}）: ").strip()
+    cities = [c.strip() for c in re.split(r'[,，]', cities) if c.strip()] or list(CITY_PAGES)
+    cookie = input("大众点评Cookie（可留空）: ").strip() or None
+    fixture_dir = input("本地HTML样本目录（留空则爬取大众点评）: ").strip()
+
+    store = ShopStore("pet_funeral_shops.json")
+    server = None
+    base_url = BASE_URL
+    if fixture_dir:
+        server, base_url = serve_fixtures(fixture_dir)
+        print(f"使用本地样本：{base_url}")
+    try:
+        with METRICS.exporting('metrics/dianping.json', 'metrics/dianping.prom', interval=60):
+            crawl_cities_http(store, cities=cities, cookie=cookie, base_url=base_url)
+    finally:
+        if server:
+            server.shutdown()
+    store.to_excel(f"pet_funeral_shops_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
@@ -0,0 +1,291 @@
+"""
+大众点评搜索列表页并发爬取
+多个无头Chrome组成浏览器池，按(城市, 页码)分片并发抓取，四个城市一次跑完，结果写入按城市分组的同一个ShopStore
+字段与各城市「大众点评-爬取」notebook中的 get_current_page_shops 一致
+"""
+import os
+import queue
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from crawl_metrics import METRICS
+from dianping_common import (BASE_URL, CITY_IDS, CITY_PAGES, KEYWORD, ShopStore, make_shards, search_url,
+                             serve_fixtures)
+
+# 列表页只需要DOM文本，图片、字体、样式表全部拦截
+BLOCKED_URLS = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+                '*.css', '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot']
+
+# 隐藏webdriver特征
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+    Object.defineProperty(navigator, 'languages', {get: () => ['zh-CN', 'zh']});
+    Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3]});
+"""
+
+SHOP_LIST = "#shop-all-list"
+SHOP_ITEMS = "#shop-all-list > ul > li > div.txt"
+
+
+def create_browser(headless=True, block_resources=True, driver_path=None):
+    """
+    启动一个Chrome
+    headless: 无头模式
+    block_resources: 拦截图片/字体/CSS，减少页面加载时间
+    driver_path: chromedriver路径，None时由selenium自动查找
+    """
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument('--headless=new')
+    options.add_argument('--window-size=1920,1080')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    if block_resources:
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+    service = Service(executable_path=driver_path) if driver_path else Service()
+    browser = webdriver.Chrome(service=service, options=options)
+    browser.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": STEALTH_SCRIPT})
+    if block_resources:
+        browser.execute_cdp_cmd("Network.enable", {})
+        browser.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+    return browser
+
+
+class BrowserPool:
+    """浏览器池：最多size个Chrome，按需启动，用完放回，多页之间复用同一个实例"""
+
+    def __init__(self, size=4, **browser_options):
+        self.size = max(1, size)
+        self.browser_options = browser_options
+        self.idle = queue.Queue()
+        self.browsers = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def browser(self):
+        """取出一个浏览器；出现WebDriverException时关闭该实例，下次重新启动"""
+        browser = self._acquire()
+        healthy = True
+        try:
+            yield browser
+        except WebDriverException:
+            healthy = False
+            raise
+        finally:
+            if healthy:
+                self.idle.put(browser)
+            else:
+                self._discard(browser)
+
+    def _acquire(self):
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self.lock:
+                create = len(self.browsers) < self.size
+                if create:
+                    self.browsers.append(None)  # 先占位，避免多个线程同时超额启动
+            if create:
+                break
+            # 池已满时等待归还；有实例被关闭时会空出名额，所以定时重新检查
+            try:
+                return self.idle.get(timeout=1)
+            except queue.Empty:
+                continue
+        try:
+            browser = create_browser(**self.browser_options)
+        except Exception:
+            with self.lock:
+                self.browsers.remove(None)
+            raise
+        with self.lock:
+            self.browsers[self.browsers.index(None)] = browser
+        return browser
+
+    def _discard(self, browser):
+        with self.lock:
+            if browser in self.browsers:
+                self.browsers.remove(browser)
+        try:
+            browser.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        with self.lock:
+            browsers = [b for b in self.browsers if b is not None]
+            self.browsers = []
+        for browser in browsers:
+            try:
+                browser.quit()
+            except Exception:
+                pass
+        print(f"📌 已关闭{len(browsers)}个浏览器")
+
+
+def first_text(item, selector):
+    elements = item.find_elements(By.CSS_SELECTOR, selector)
+    return elements[0].text.strip() if elements else None
+
+
+def extract_shops(browser, city, page, wait_seconds=20, scroll=True):
+    """
+    从当前已打开的列表页提取店铺
+    :return: 店铺列表；列表容器没有出现（验证码或加载失败）时返回None
+    """
+    try:
+        WebDriverWait(browser, wait_seconds).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, SHOP_LIST))
+        )
+    except TimeoutException:
+        return None
+
+    if scroll:
+        # 滚动到底部触发懒加载
+        browser.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        time.sleep(random.uniform(0.5, 1.0))
+
+    shops = []
+    for idx, item in enumerate(browser.find_elements(By.CSS_SELECTOR, SHOP_ITEMS), 1):
+        try:
+            name = first_text(item, ".tit > a > h4") or f"无名_{idx}"
+            links = item.find_elements(By.CSS_SELECTOR, "div.tit > a")
+            link = links[0].get_attribute("href") if links else "无链接"
+            address = first_text(item, "div.tag-addr > a:nth-child(3) > span") or "无地址"
+            avg_price = first_text(item, ".mean-price") or "无人均"
+
+            # 评论数（正则提取）
+            comment_num = "无评论数"
+            comment_text = first_text(item, "div.comment > a.review-num")
+            if comment_text:
+                match = re.search(r"\d+", comment_text)
+                if match:
+                    comment_num = match.group()
+
+            # 星级（解析star_xx）
+            star = "无星级"
+            star_spans = item.find_elements(By.CSS_SELECTOR, ".nebula_star .star_icon .star")
+            if star_spans:
+                match = re.search(r"star_(\d+)", star_spans[0].get_attribute("class") or "")
+                if match:
+                    star = f"{int(match.group(1))/10}分"
+
+            shops.append({
+                "city": city, "page": page, "index": idx, "name": name, "link": link,
+                "address": address, "avg_price": avg_price,
+                "comment_num": comment_num, "star": star
+            })
+        except WebDriverException as e:
+            print(f"  ❌ {city}第{page}页第{idx}家失败：{str(e)[:40]}")
+    return shops
+
+
+def crawl_shard(pool, city, page, keyword=KEYWORD, base_url=BASE_URL, save_html_dir=None):
+    """用池中的一个浏览器抓取一页，返回店铺列表或None（加载失败）"""
+    with pool.browser() as browser:
+        METRICS.page_load(browser, search_url(city, page, keyword, base_url), stage='dianping_browser')
+        with METRICS.stage('dianping_extract'):
+            shops = extract_shops(browser, city, page)
+        METRICS.api_result('dianping_browser', 'no_shop_list' if shops is None else 'ok')
+        if shops is not None:
+            METRICS.rows('dianping_browser', len(shops))
+        if save_html_dir and shops is not None:
+            # 保存页面源码，可作为本地测试用的HTML样本（文件名与serve_fixtures对应）
+            with open(os.path.join(save_html_dir, f"{CITY_IDS[city]}_p{page}.html"), 'w', encoding='utf-8') as f:
+                f.write(browser.page_source)
+    return shops
+
+
+def crawl_cities(store, cities=None, pages=None, workers=4, keyword=KEYWORD, base_url=BASE_URL,
+                 max_retries=1, save_html_dir=None, **browser_options):
+    """
+    并发爬取多个城市的搜索列表页
+    store: ShopStore，每完成一页就保存一次，重新运行时跳过已完成的页
+    workers: 浏览器数量（同时抓取的页数）
+    max_retries: 加载失败（验证码、超时）的页最多重试几轮
+    browser_options: 传给create_browser，如headless=False、block_resources=False
+    :return: 最终仍失败的(城市, 页码)列表
+    """
+    shards = [shard for shard in make_shards(cities, pages) if not store.is_done(*shard)]
+    print(f"\n📌 共{len(shards)}页待爬取，{workers}个浏览器")
+    if save_html_dir and not os.path.exists(save_html_dir):
+        os.makedirs(save_html_dir)
+
+    pool = BrowserPool(workers, **browser_options)
+    start_time = time.time()
+    try:
+        for attempt in range(max_retries + 1):
+            if not shards:
+                break
+            if attempt:
+                print(f"\n🔁 第{attempt}轮重试，{len(shards)}页")
+            failed = []
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(crawl_shard, pool, city, page, keyword, base_url, save_html_dir): (city, page)
+                    for city, page in shards
+                }
+                for future in as_completed(futures):
+                    city, page = futures[future]
+                    try:
+                        shops = future.result()
+                    except WebDriverException as e:
+                        print(f"❌ {city}第{page}页浏览器异常：{str(e)[:80]}")
+                        shops = None
+                    if shops is None:
+                        print(f"⚠️ {city}第{page}页加载失败（验证码或超时）")
+                        failed.append((city, page))
+                        if attempt < max_retries:
+                            METRICS.retry('dianping_browser', 'no_shop_list')
+                        continue
+                    added = store.add_page(city, page, shops)
+                    store.save()
+                    print(f"📊 {city}第{page}页：{len(shops)}家，新增{added}家（{city}累计{store.count(city)}家）")
+            shards = sorted(failed)
+    finally:
+        pool.close()
+
+    print(f"\n🎉 爬取结束，共{store.count()}家店铺，用时{time.time() - start_time:.1f}秒")
+    for city in store.shops:
+        print(f"  {city}: {store.count(city)}家")
+    if shards:
+        print(f"⚠️ 仍有{len(shards)}页失败：{shards}")
+    return shards
+
+
+if __name__ == "__main__":
+    cities = input(f"要爬取的城市（逗号分隔，默认 {','.join(CITY_PAGES)}）: ").strip()
+    cities = [c.strip() for c in re.split(r'[,，]', cities) if c.strip()] or list(CITY_PAGES)
+    workers = input("浏览器数量（默认4）: ").strip()
+    workers = int(workers) if workers.isdigit() else 4
+    fixture_dir = input("本地HTML样本目录（留空则爬取大众点评）: ").strip()
+
+    store = ShopStore("pet_funeral_shops.json")
+    server = None
+    base_url = BASE_URL
+    if fixture_dir:
+        server, base_url = serve_fixtures(fixture_dir)
+        print(f"使用本地样本：{base_url}")
+    try:
+        with METRICS.exporting('metrics/dianping.json', 'metrics/dianping.prom', interval=60):
+            crawl_cities(store, cities=cities, workers=workers, base_url=base_url)
+    finally:
+        if server:
+            server.shutdown()
+    store.to_excel(f"pet_funeral_shops_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
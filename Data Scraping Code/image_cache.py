@@ -0,0 +1,207 @@
+"""
+商品图片下载缓存
+- 图片按内容的sha256存放（objects/ab/abcdef....jpg），同一URL或内容相同的图片只存一份
+- index.json 记录 URL -> 哈希、文件路径、ETag、Last-Modified；重新运行时带条件请求，服务器返回304就不再下载
+- 多线程并发下载，与爬取、生成Excel分开执行
+- 缩略图单独一步生成（thumbs/），Excel只嵌入缩略图
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from crawl_metrics import METRICS, instrument_session
+from rate_limiter import TokenBucket
+
+CONTENT_TYPE_EXTENSIONS = {
+    'image/jpeg': '.jpg', 'image/png': '.png', 'image/gif': '.gif', 'image/webp': '.webp', 'image/svg+xml': '.svg',
+}
+
+
+class ImageCache:
+    """按内容哈希去重的图片缓存目录"""
+
+    def __init__(self, cache_dir, base_url=None):
+        """
+        cache_dir: 缓存目录
+        base_url: 相对地址的图片URL用它补全
+        """
+        self.cache_dir = cache_dir
+        self.base_url = base_url
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.lock = threading.Lock()
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+
+    def full_url(self, url):
+        return urljoin(self.base_url, url) if self.base_url else url
+
+    def cached_path(self, url):
+        """已缓存的本地路径，没有时返回None"""
+        entry = self.index.get(self.full_url(url))
+        if entry and os.path.exists(entry['path']):
+            return entry['path']
+        return None
+
+    def save_index(self):
+        """先写临时文件再替换，避免中断时索引损坏"""
+        with self.lock:
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.index_path)
+
+    def store_bytes(self, content, content_type=''):
+        """按sha256存放图片内容，已存在相同内容时直接复用"""
+        digest = hashlib.sha256(content).hexdigest()
+        ext = CONTENT_TYPE_EXTENSIONS.get(content_type.split(';')[0].strip(), '.jpg')
+        object_dir = os.path.join(self.cache_dir, 'objects', digest[:2])
+        path = os.path.join(object_dir, digest + ext)
+        if not os.path.exists(path):
+            os.makedirs(object_dir, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return digest, path
+
+    def fetch(self, session, url, revalidate=True, rate_limiter=None):
+        """
+        下载一张图片（已缓存时带If-None-Match/If-Modified-Since条件请求）
+        :return: (本地路径或"下载失败：..."，状态) 状态为 'cached' / 'not_modified' / 'downloaded' / 'failed'
+        """
+        entry = self.index.get(url)
+        if entry and not os.path.exists(entry['path']):
+            entry = None
+        if entry and not revalidate:
+            return entry['path'], 'cached'
+
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        if rate_limiter:
+            rate_limiter.acquire()
+        try:
+            response = session.get(url, headers=headers, timeout=10)
+            if response.status_code == 304 and entry:
+                return entry['path'], 'not_modified'
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if entry:
+                return entry['path'], 'cached'  # 重新验证失败时继续使用旧文件
+            return f"下载失败：{str(e)[:20]}", 'failed'
+
+        content_type = response.headers.get('Content-Type', '')
+        digest, path = self.store_bytes(response.content, content_type)
+        with self.lock:
+            self.index[url] = {
+                'sha256': digest,
+                'path': path,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'content_type': content_type,
+                'fetched_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+        return path, 'downloaded'
+
+    def download_all(self, urls, workers=8, requests_per_second=None, revalidate=True):
+        """
+        并发下载一批图片（相同URL只请求一次）
+        workers: 下载线程数
+        requests_per_second: 所有线程共享的每秒请求数上限，None时每次请求前随机等待0.5~1.5秒
+        revalidate: 已缓存的图片是否向服务器确认有没有更新；False时完全不请求
+        :return: {原始URL: 本地路径或"下载失败：..."}
+        """
+        wanted = {}
+        for url in urls:
+            if url and str(url).strip() and url not in ('无图片URL', '无图片'):
+                wanted.setdefault(self.full_url(str(url).strip()), []).append(url)
+
+        # 图片路径各不相同，指标按域名归为一类
+        session = instrument_session(requests.Session(), label=lambda url: f"{urlsplit(url).netloc}/images")
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['User-Agent'] = (f"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                                         f"(KHTML, like Gecko) Chrome/{random.randint(90, 120)}.0.0.0 Safari/537.36")
+        rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+
+        def fetch_one(url):
+            sends_request = revalidate or not self.cached_path(url)
+            if sends_request and rate_limiter is None:
+                time.sleep(random.uniform(0.5, 1.5))
+            return self.fetch(session, url, revalidate, rate_limiter)
+
+        print(f"\n🖼️  需要处理 {len(wanted)} 张图片（{workers}个线程）")
+        results = {}
+        counts = {'cached': 0, 'not_modified': 0, 'downloaded': 0, 'failed': 0}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {executor.submit(fetch_one, url): url for url in wanted}
+            for done, future in enumerate(as_completed(futures), 1):
+                url = futures[future]
+                path, status = future.result()
+                counts[status] += 1
+                METRICS.api_result('images', status)
+                for original_url in wanted[url]:
+                    results[original_url] = path
+                if done % 50 == 0:
+                    self.save_index()
+                    print(f"  进度 {done}/{len(wanted)}")
+        self.save_index()
+
+        unique_files = len({entry['sha256'] for entry in self.index.values()})
+        print(f"✅ 新下载{counts['downloaded']}张，未变化{counts['not_modified'] + counts['cached']}张，"
+              f"失败{counts['failed']}张；缓存中共{unique_files}个不同的图片文件")
+        return results
+
+
+def make_thumbnail(path, thumb_dir, size=(160, 160)):
+    """生成一张缩略图，文件名沿用内容哈希，已存在时直接返回"""
+    from PIL import Image as PILImage
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    thumb_path = os.path.join(thumb_dir, f"{name}_{size[0]}x{size[1]}.png")
+    if os.path.exists(thumb_path):
+        return thumb_path
+    with PILImage.open(path) as img:
+        img.thumbnail(size)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA')
+        tmp_path = f"{thumb_path}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, format='PNG')
+    os.replace(tmp_path, thumb_path)
+    return thumb_path
+
+
+def make_thumbnails(paths, thumb_dir, size=(160, 160), workers=4):
+    """
+    批量生成缩略图（需要Pillow），与下载分开执行
+    :return: {原图路径: 缩略图路径}，生成失败的图片不在结果中
+    """
+    if not os.path.exists(thumb_dir):
+        os.makedirs(thumb_dir)
+    sources = {p for p in paths if p and os.path.exists(p)}
+    thumbs = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(make_thumbnail, path, thumb_dir, size): path for path in sources}
+        for future in as_completed(futures):
+            try:
+                thumbs[futures[future]] = future.result()
+            except Exception as e:
+                print(f"⚠️  缩略图生成失败 {futures[future]}：{str(e)[:40]}")
+    print(f"✅ 缩略图 {len(thumbs)}/{len(sources)} 张：{os.path.abspath(thumb_dir)}")
+    return thumbs
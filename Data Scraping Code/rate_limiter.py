@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """令牌桶限速器：多个线程共享同一个每秒请求数预算"""
+
+    def __init__(self, rate, capacity=None):
+        """
+        rate: 每秒补充的令牌数（即每秒允许的请求数）
+        capacity: 桶容量（允许的瞬时突发请求数），默认与rate相同且至少为1
+        """
+        if rate <= 0:
+            raise ValueError("rate必须大于0")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        """按流逝时间补充令牌"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self, tokens=1):
+        """取出令牌，不足时阻塞等待"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class AsyncTokenBucket:
+    """协程版令牌桶：同一事件循环中的所有协程共享请求速率预算"""
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate必须大于0")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = None
+
+    async def acquire(self, tokens=1):
+        """取出令牌，不足时挂起等待（不阻塞事件循环）"""
+        # 锁需要在事件循环内创建
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class HostRateLimiter:
+    """按域名分别限速，每个域名一个AsyncTokenBucket"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+
+    async def acquire(self, url):
+        host = urlparse(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = AsyncTokenBucket(self.rate, self.capacity)
+        await self.buckets[host].acquire()
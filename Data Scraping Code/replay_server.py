@@ -0,0 +1,388 @@
+"""
+本地回放服务器：代替微博、B站的真实接口，用于离线测试和爬虫基准测试（crawler_benchmark.py）
+- 按真实接口的JSON/XML结构返回合成数据（或录制好的响应文件），不访问真实平台
+    m.weibo.cn/api/container/getIndex          微博关键词搜索（page分页，超出页数返回 ok: 0）
+    m.weibo.cn/comments/hotflow                微博评论（max_id链分页，最后一页 max_id 为0）
+    api.bilibili.com/x/v2/reply/main           B站评论（next游标分页，最后一页 cursor.is_end）
+    api.bilibili.com/x/v2/reply                B站评论（pn页码分页）
+    api.bilibili.com/x/web-interface/view      B站视频信息
+    comment.bilibili.com/{cid}.xml             B站XML弹幕
+- 请求路径的第一段是原域名，如 http://127.0.0.1:端口/m.weibo.cn/comments/hotflow?id=...；
+  爬虫代码不用改，crawler_benchmark.redirect_requests 会把 https://域名/... 的请求改发到这里
+- 可配置：固定延迟 + 随机抖动、HTTP错误率（500）、接口失败率（微博 ok: 0，B站 code 非0）
+- 合成数据由 (接口, 参数) 决定，同样的请求总是返回同样的内容；生成过的响应体会缓存，服务器本身不成为瓶颈
+- fixtures_dir 下有录制的响应文件时优先回放（record_fixture 从真实接口录制）
+
+用法：python replay_server.py [--port 8765] [--latency 0.05] [--error-rate 0.01] [--fail-rate 0.02]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+from xml.sax.saxutils import escape
+
+# 合成数据规模的默认值
+DEFAULT_OPTIONS = {
+    'search_pages': 20,  # 每个关键词的搜索结果页数
+    'posts_per_page': 10,
+    'comment_pages': 10,  # 每条微博的评论页数
+    'comments_per_page': 20,
+    'reply_pages': 20,  # 每个B站视频的评论页数
+    'replies_per_page': 20,
+    'danmaku_count': 3000,  # 每个cid的弹幕条数
+}
+
+# 参与故障注入的接口（视频信息接口不注入，保证每次基准都能走到翻页）
+PAGED_ROUTES = {
+    ('m.weibo.cn', '/api/container/getIndex'),
+    ('m.weibo.cn', '/comments/hotflow'),
+    ('api.bilibili.com', '/x/v2/reply/main'),
+    ('api.bilibili.com', '/x/v2/reply'),
+    ('comment.bilibili.com', '*.xml'),
+}
+
+MAX_ID_BASE = 138000000000000  # 微博max_id：基数 + 下一页页码
+WORDS = ['宠物殡葬', '毛孩子', '火化', '纪念', '难过', '谢谢', '服务很好', '价格', '安葬', '回家', '小猫', '小狗',
+         '陪伴', '十五年', '天堂', '一路走好', '哈哈', '推荐', '北京', '上海']
+EMOTICON = '<span class="url-icon"><img alt="[心]" src="https://h5.sinaimg.cn/m/emoticon/icon/others/l_xin.png" ' \
+           'style="width:1em; height:1em;" /></span>'
+LOCATIONS = ['来自北京', '来自上海', '来自广东', '来自浙江', '来自四川']
+
+
+def _rng(*key):
+    """由参数决定的随机数生成器，同样的请求生成同样的数据"""
+    return random.Random(hashlib.md5(repr(key).encode('utf-8')).hexdigest())
+
+
+def _sentence(rng, low=4, high=20):
+    return ''.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _weibo_time(rng):
+    ts = 1760000000 + rng.randint(0, 5000000)
+    return time.strftime('%a %b %d %H:%M:%S +0800 %Y', time.gmtime(ts + 8 * 3600))
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# ---------------------- 各接口的合成响应 ----------------------
+@lru_cache(maxsize=4096)
+def weibo_search_body(keyword, page, pages, per_page):
+    if page < 1 or page > pages:
+        return _dumps({'ok': 0, 'msg': '这里还没有内容', 'data': {'cards': []}})
+    rng = _rng('search', keyword, page)
+    first_mid = 5100000000000000 + rng.randint(0, 10 ** 8) * 1000
+    cards = []
+    for i in range(per_page):
+        mid = str(first_mid + i)
+        cards.append({
+            'card_type': 9,
+            'mblog': {
+                'id': mid, 'mid': mid, 'created_at': _weibo_time(rng),
+                'text': f"#{keyword}# {_sentence(rng, 10, 40)}{EMOTICON}",
+                'attitudes_count': rng.randint(0, 5000), 'comments_count': rng.randint(0, 800),
+                'reposts_count': rng.randint(0, 300),
+                'user': {'id': rng.randint(10 ** 9, 10 ** 10), 'screen_name': f"用户{rng.randint(1, 99999)}",
+                         'followers_count': rng.randint(0, 10 ** 6), 'verified': rng.random() < 0.2,
+                         'verified_reason': ''},
+            },
+        })
+    # 真实搜索结果里夹杂着非帖子卡片
+    cards.insert(per_page // 2, {'card_type': 11, 'card_group': []})
+    return _dumps({'ok': 1, 'data': {'cardlistInfo': {'page': page + 1 if page < pages else None}, 'cards': cards}})
+
+
+@lru_cache(maxsize=4096)
+def weibo_comments_body(weibo_id, page, pages, per_page):
+    if page < 1 or page > pages:
+        return _dumps({'ok': 0, 'msg': '还没有人评论哦~快来抢沙发！'})
+    rng = _rng('hotflow', weibo_id, page)
+    comments = [{
+        'id': f"{weibo_id}{page:03d}{i:03d}",
+        'created_at': _weibo_time(rng),
+        'like_count': rng.randint(0, 2000),
+        'source': rng.choice(LOCATIONS),
+        'text': _sentence(rng) + (EMOTICON if rng.random() < 0.3 else ''),
+        'user': {'id': rng.randint(10 ** 9, 10 ** 10), 'screen_name': f"用户{rng.randint(1, 99999)}",
+                 'gender': rng.choice(['m', 'f']), 'follow_count': str(rng.randint(0, 2000)),
+                 'followers_count': str(rng.randint(0, 10 ** 5))},
+    } for i in range(per_page)]
+    max_id = MAX_ID_BASE + page + 1 if page < pages else 0
+    return _dumps({'ok': 1, 'data': {'data': comments, 'total_number': pages * per_page, 'max_id': max_id,
+                                     'max_id_type': 0}})
+
+
+def _replies(aid, page, per_page):
+    rng = _rng('reply', aid, page)
+    return [{
+        'rpid': aid * 10000 + page * 100 + i, 'oid': aid, 'mid': rng.randint(10 ** 6, 10 ** 9),
+        'ctime': 1760000000 + rng.randint(0, 5000000), 'like': rng.randint(0, 3000), 'rcount': rng.randint(0, 50),
+        'floor': 0,
+        'member': {'mid': str(rng.randint(10 ** 6, 10 ** 9)), 'uname': f"bili_{rng.randint(1, 99999)}",
+                   'official_verify': {'type': -1, 'desc': ''}},
+        'content': {'message': _sentence(rng)},
+    } for i in range(per_page)]
+
+
+@lru_cache(maxsize=4096)
+def bilibili_main_body(aid, cursor, pages, per_page):
+    page = max(int(cursor), 1)  # next=0 为第一页
+    total = pages * per_page
+    if page > pages:
+        replies, is_end = [], True
+    else:
+        replies, is_end = _replies(aid, page, per_page), page == pages
+    return _dumps({'code': 0, 'message': '0', 'ttl': 1, 'data': {
+        'cursor': {'all_count': total, 'is_begin': page == 1, 'prev': page - 1, 'next': page + 1,
+                   'is_end': is_end, 'mode': 3},
+        'replies': replies,
+    }})
+
+
+@lru_cache(maxsize=4096)
+def bilibili_page_body(aid, pn, ps, pages, per_page):
+    total = pages * per_page
+    start = (pn - 1) * ps
+    # 按pn/ps切出对应的评论（合成数据按每页per_page条生成）
+    replies = []
+    for page in range(start // per_page + 1, min(pages, (start + ps - 1) // per_page + 1) + 1):
+        replies.extend(_replies(aid, page, per_page))
+    offset = start % per_page
+    return _dumps({'code': 0, 'message': '0', 'ttl': 1, 'data': {
+        'page': {'num': pn, 'size': ps, 'count': total, 'acount': total},
+        'replies': replies[offset:offset + ps] if start < total else [],
+    }})
+
+
+def bilibili_view_body(bvid):
+    rng = _rng('view', bvid)
+    aid = rng.randint(10 ** 8, 10 ** 9)
+    cid = rng.randint(10 ** 8, 10 ** 9)
+    duration = rng.randint(60, 1800)
+    return _dumps({'code': 0, 'message': '0', 'ttl': 1, 'data': {
+        'bvid': bvid, 'aid': aid, 'cid': cid, 'title': f"测试视频 {bvid} {_sentence(rng, 3, 6)}",
+        'duration': duration, 'pages': [{'cid': cid, 'page': 1, 'part': 'P1', 'duration': duration}],
+    }})
+
+
+@lru_cache(maxsize=256)
+def danmaku_xml_body(cid, count):
+    rng = _rng('danmaku', cid)
+    parts = ['<?xml version="1.0" encoding="UTF-8"?><i><chatserver>chat.bilibili.com</chatserver>'
+             f'<chatid>{cid}</chatid><maxlimit>{count}</maxlimit>']
+    for i in range(count):
+        p = f"{rng.uniform(0, 1800):.5f},1,25,16777215,{1760000000 + rng.randint(0, 5000000)},0," \
+            f"{rng.getrandbits(32):08x},{cid * 100000 + i},{rng.randint(0, 10)}"
+        parts.append(f'<d p="{p}">{escape(_sentence(rng, 1, 6))}</d>')
+    parts.append('</i>')
+    return ''.join(parts).encode('utf-8')
+
+
+def failure_body(host):
+    """接口层面的失败：微博 ok: 0，B站 code 非0（-412 请求被拦截）"""
+    if host == 'm.weibo.cn':
+        return _dumps({'ok': 0, 'msg': '请求过于频繁'})
+    return _dumps({'code': -412, 'message': '请求被拦截', 'ttl': 1, 'data': None})
+
+
+# ---------------------- 录制的响应 ----------------------
+def fixture_path(fixtures_dir, host, path, query):
+    """录制文件路径：{目录}/{域名}/{路径}/{查询参数的哈希}.json|.xml"""
+    key = hashlib.sha1('&'.join(f"{k}={v}" for k, v in sorted(query.items())).encode('utf-8')).hexdigest()[:16]
+    suffix = '.xml' if path.endswith('.xml') else '.json'
+    return os.path.join(fixtures_dir, host, path.strip('/').replace('/', '_') or '_', key + suffix)
+
+
+def record_fixture(url, fixtures_dir, session=None, **kwargs):
+    """请求一次真实接口并保存响应体，之后回放服务器遇到相同的请求就返回这份录制内容"""
+    import requests
+
+    session = session or requests.Session()
+    response = session.get(url, **kwargs)
+    prepared = urlparse(response.request.url)
+    target = fixture_path(fixtures_dir, prepared.hostname, prepared.path, dict(parse_qsl(prepared.query)))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'wb') as f:
+        f.write(response.content)
+    print(f"✓ 已录制 {url} -> {target}")
+    return target
+
+
+# ---------------------- 服务器 ----------------------
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 支持keep-alive，与真实接口一样复用连接
+    disable_nagle_algorithm = True  # 响应头和响应体分两次写出，不关Nagle会多等一个延迟ACK（约40ms）
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.replay
+        parsed = urlparse(self.path)
+        host, _, path = parsed.path.lstrip('/').partition('/')
+        path = '/' + path
+        query = dict(parse_qsl(parsed.query))
+
+        server.delay()
+        route = (host, '*.xml') if path.endswith('.xml') else (host, path)
+        outcome = 'ok'
+        if route in PAGED_ROUTES:
+            outcome = server.draw_fault()
+
+        if outcome == 'error':
+            status, body, content_type = 500, b'<html><body>500 Internal Server Error</body></html>', 'text/html'
+        elif outcome == 'fail':
+            status, body, content_type = 200, failure_body(host), 'application/json; charset=utf-8'
+        else:
+            try:
+                status, body, content_type = server.respond(host, path, query)
+            except (KeyError, ValueError) as e:
+                status, body, content_type = 400, _dumps({'code': -400, 'message': f'请求参数错误: {e}'}), \
+                    'application/json; charset=utf-8'
+            if status != 200:
+                outcome = 'error'
+        server.count(outcome)
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Replay-Outcome', outcome)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ReplayServer:
+    """
+    with ReplayServer(latency=0.05, error_rate=0.01, fail_rate=0.02) as server:
+        server.url   # http://127.0.0.1:端口
+    latency/jitter: 每个请求固定延迟 + [0, jitter] 的随机延迟（秒）
+    error_rate: 返回HTTP 500的比例
+    fail_rate: 返回 ok: 0 / code 非0 的比例
+    fixtures_dir: 录制响应的目录，有对应文件时优先回放
+    options: 合成数据规模，见 DEFAULT_OPTIONS
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, fail_rate=0.0,
+                 fixtures_dir=None, seed=0, **options):
+        unknown = set(options) - set(DEFAULT_OPTIONS)
+        if unknown:
+            raise ValueError(f"未知的参数：{sorted(unknown)}")
+        self.options = {**DEFAULT_OPTIONS, **options}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.fail_rate = fail_rate
+        self.fixtures_dir = fixtures_dir
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'ok': 0, 'fail': 0, 'error': 0}
+        self.httpd = ThreadingHTTPServer((host, port), ReplayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.replay = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def delay(self):
+        seconds = self.latency
+        if self.jitter:
+            with self.lock:
+                seconds += self.random.uniform(0, self.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def draw_fault(self):
+        """按配置的比例抽取本次请求的结果：'ok' / 'fail' / 'error'"""
+        if not (self.error_rate or self.fail_rate):
+            return 'ok'
+        with self.lock:
+            x = self.random.random()
+        if x < self.error_rate:
+            return 'error'
+        if x < self.error_rate + self.fail_rate:
+            return 'fail'
+        return 'ok'
+
+    def count(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def respond(self, host, path, query):
+        """:return: (状态码, 响应体, Content-Type)"""
+        json_type = 'application/json; charset=utf-8'
+        if self.fixtures_dir:
+            recorded = fixture_path(self.fixtures_dir, host, path, query)
+            if os.path.exists(recorded):
+                with open(recorded, 'rb') as f:
+                    return 200, f.read(), 'text/xml' if recorded.endswith('.xml') else json_type
+
+        o = self.options
+        if host == 'm.weibo.cn' and path == '/api/container/getIndex':
+            keyword = query['containerid'].split('q=', 1)[-1].split('&', 1)[0]
+            return 200, weibo_search_body(keyword, int(query.get('page', 1)), o['search_pages'],
+                                          o['posts_per_page']), json_type
+        if host == 'm.weibo.cn' and path == '/comments/hotflow':
+            max_id = int(query.get('max_id', 0))
+            page = max_id - MAX_ID_BASE if max_id else 1
+            return 200, weibo_comments_body(query['id'], page, o['comment_pages'], o['comments_per_page']), json_type
+        if host == 'api.bilibili.com' and path == '/x/v2/reply/main':
+            return 200, bilibili_main_body(int(query['oid']), int(query.get('next', 0)), o['reply_pages'],
+                                           o['replies_per_page']), json_type
+        if host == 'api.bilibili.com' and path == '/x/v2/reply':
+            return 200, bilibili_page_body(int(query['oid']), int(query.get('pn', 1)), int(query.get('ps', 20)),
+                                           o['reply_pages'], o['replies_per_page']), json_type
+        if host == 'api.bilibili.com' and path == '/x/web-interface/view':
+            return 200, bilibili_view_body(query['bvid']), json_type
+        if host == 'comment.bilibili.com' and path.endswith('.xml'):
+            cid = int(os.path.basename(path)[:-len('.xml')])
+            return 200, danmaku_xml_body(cid, o['danmaku_count']), 'text/xml'
+        return 404, _dumps({'code': -404, 'message': '啥都木有'}), json_type
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="微博/B站接口本地回放服务器")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="每个请求的固定延迟(秒)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="额外的随机延迟上限(秒)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="HTTP 500 的比例")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="ok: 0 / code 非0 的比例")
+    parser.add_argument('--fixtures', default=None, help="录制响应目录")
+    args = parser.parse_args()
+
+    server = ReplayServer(port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          fail_rate=args.fail_rate, fixtures_dir=args.fixtures)
+    print(f"回放服务器已启动：{server.url}（Ctrl+C 退出）")
+    print(f"  例：{server.url}/m.weibo.cn/comments/hotflow?id=5169109194771664&mid=5169109194771664&max_id_type=0")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"请求统计：{server.counts}")
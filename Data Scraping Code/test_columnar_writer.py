@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from columnar_writer import ColumnarWriter
+
+COLUMNS = ['max_id', '微博id', '评论页码', '评论者IP归属地', '评论内容']
+TYPES = {'max_id': 'int64', '评论页码': 'int64'}
+
+
+def make_rows(page, n, source):
+    return [(1000 + page, '5169109194771664', page, source, f'第{page}页第{i}条') for i in range(n)]
+
+
+def test_parquet_first_batch_with_null_column(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'comments.parquet')
+    with ColumnarWriter(path, COLUMNS, format='parquet', flush_rows=3, flush_seconds=0,
+                        column_types=TYPES) as writer:
+        writer.add_rows(make_rows(1, 3, None))      # 第一批IP归属地全为空
+        writer.add_rows(make_rows(2, 3, '来自北京'))
+        writer.add_rows(make_rows(3, 2, '来自上海'))
+
+    table = pq.read_table(path)
+    assert writer.total == 8 and writer.failed_rows == 0
+    assert table.num_rows == 8
+    assert str(table.schema.field('max_id').type) == 'int64'
+    assert table.column('评论者IP归属地').to_pylist() == [None] * 3 + ['来自北京'] * 3 + ['来自上海'] * 2
+
+
+def test_parquet_inferred_schema_with_null_column(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'comments.parquet')
+    with ColumnarWriter(path, COLUMNS, format='parquet', flush_rows=2, flush_seconds=0) as writer:
+        writer.add_rows(make_rows(1, 2, None))
+        writer.add_rows(make_rows(2, 2, '来自北京'))
+
+    assert pq.read_table(path).column('评论者IP归属地').to_pylist() == [None, None, '来自北京', '来自北京']
+
+
+def test_failed_batch_is_saved_and_buffer_cleared(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'comments.parquet')
+    writer = ColumnarWriter(path, COLUMNS, format='parquet', flush_rows=2, flush_seconds=0, column_types=TYPES)
+    writer.add_rows(make_rows(1, 2, '来自北京'))
+    writer.add_rows([('不是数字', '1', 2, '来自上海', 'a'), (1, '1', 2, '来自上海', 'b')])  # 这一批写入失败
+    writer.add_rows(make_rows(3, 3, '来自广州'))
+    writer.close()
+
+    assert writer.failed_rows == 2
+    assert writer.total == 5
+    assert pq.read_table(path).num_rows == 5
+    with open(writer.failed_path, encoding='utf_8_sig') as f:
+        assert len(f.read().splitlines()) == 3  # 表头 + 2行
+
+
+def test_csv_appends_without_repeating_header(tmp_path):
+    path = str(tmp_path / 'comments.csv')
+    for page in (1, 2):
+        with ColumnarWriter(path, COLUMNS, flush_rows=2, flush_seconds=0) as writer:
+            writer.add_rows(make_rows(page, 3, '来自北京'))
+    with open(path, encoding='utf_8_sig') as f:
+        lines = f.read().splitlines()
+    assert lines[0] == ','.join(COLUMNS)
+    assert len(lines) == 7
+    assert not os.path.exists(writer.failed_path)
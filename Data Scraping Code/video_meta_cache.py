@@ -0,0 +1,124 @@
+"""
+B站视频元数据缓存（SQLite）
+评论爬虫（bilibili评论爬取.py）和弹幕爬虫（bilibili弹幕爬取.ipynb / danmaku_stream.py）共用，
+同一个BV号的aid、cid、标题、分P列表只请求一次接口
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+from crawl_metrics import METRICS, instrument_session
+
+VIEW_API = "https://api.bilibili.com/x/web-interface/view"
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'video_meta.sqlite')
+
+
+class VideoMetaCache:
+    """
+    B站视频元数据的SQLite缓存：bvid -> aid, cid, title, duration, pages(分P列表)
+    评论爬虫和弹幕爬虫共用同一个数据库文件，同一个视频只请求一次 x/web-interface/view
+    多线程共用一个连接（加锁），多进程通过SQLite的WAL模式共享
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, session=None, max_age_days=None):
+        """
+        db_path: 数据库文件路径
+        session: 请求接口用的requests.Session，None时新建一个
+        max_age_days: 缓存有效天数，None表示一直有效
+        """
+        self.db_path = db_path
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        if session is None:
+            session = requests.Session()
+            session.headers.update({
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
+                "Referer": "https://www.bilibili.com/",
+            })
+        self.session = instrument_session(session)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS videos (
+                    bvid TEXT PRIMARY KEY,
+                    aid INTEGER,
+                    cid INTEGER,
+                    title TEXT,
+                    duration INTEGER,
+                    pages TEXT,
+                    fetched_at REAL
+                )
+            """)
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def lookup(self, bvid):
+        """只查缓存，不请求接口；没有或已过期时返回None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT bvid, aid, cid, title, duration, pages, fetched_at FROM videos WHERE bvid = ?", (bvid,)
+            ).fetchone()
+        if not row:
+            return None
+        if self.max_age and time.time() - row[6] > self.max_age:
+            return None
+        return {
+            'bvid': row[0], 'aid': row[1], 'cid': row[2], 'title': row[3], 'duration': row[4],
+            'pages': json.loads(row[5]),
+        }
+
+    def store(self, data):
+        """把view接口返回的data写入缓存，返回精简后的元数据"""
+        info = {
+            'bvid': data['bvid'],
+            'aid': data['aid'],
+            'cid': data['cid'],
+            'title': data['title'],
+            'duration': data.get('duration'),
+            'pages': [
+                {'cid': p['cid'], 'page': p['page'], 'part': p.get('part', ''), 'duration': p.get('duration')}
+                for p in data.get('pages') or [{'cid': data['cid'], 'page': 1, 'duration': data.get('duration')}]
+            ],
+        }
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO videos (bvid, aid, cid, title, duration, pages, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (info['bvid'], info['aid'], info['cid'], info['title'], info['duration'],
+                 json.dumps(info['pages'], ensure_ascii=False), time.time())
+            )
+            self.conn.commit()
+        return info
+
+    def fetch(self, bvid):
+        """请求 x/web-interface/view 并写入缓存，失败返回None"""
+        try:
+            response = self.session.get(VIEW_API, params={'bvid': bvid}, timeout=10)
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"获取视频信息出错: {e}")
+            return None
+        METRICS.api_result('bilibili_view', data.get('code'))
+        if data.get('code') != 0:
+            print(f"获取视频信息失败: {data.get('message', '未知错误')}")
+            return None
+        return self.store(data['data'])
+
+    def get(self, bvid, refresh=False):
+        """
+        获取视频元数据，优先读缓存
+        :return: {'bvid', 'aid', 'cid', 'title', 'duration', 'pages': [{'cid', 'page', 'part', 'duration'}, ...]}
+        """
+        if not refresh:
+            info = self.lookup(bvid)
+            if info:
+                return info
+        return self.fetch(bvid)
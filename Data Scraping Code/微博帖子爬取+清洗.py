@@ -5,6 +5,16 @@ import csv
 from datetime import datetime
 import re
 import random
+import asyncio
+import json
+import sys
+
+from crawl_metrics import METRICS, instrument_session, trace_config
+from rate_limiter import HostRateLimiter
+
+# 文本清洗与清洗阶段共用同一个模块
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Data Cleaning Code'))
+from text_normalize import clean_text
 
 headers = {
     'sec-ch-ua-platform': '"Android"',
@@ -18,9 +28,14 @@ headers = {
     'Accept': 'application/json, text/plain, */*',
 }
 
-def get_weibo_posts(keyword, pages=3, max_retries=2):
-    """爬取微博关键词搜索结果"""
+def get_weibo_posts(keyword, pages=3, max_retries=2, delay=(1, 3)):
+    """
+    爬取微博关键词搜索结果
+    delay: 每页之间的随机等待(秒)，(0, 0)为不等待（连本地回放服务器做基准测试时使用）
+    """
     all_posts = []
+    # 复用连接（keep-alive），避免每页重新建立TCP/TLS连接
+    session = instrument_session(requests.Session())
     
     for page in range(1, pages+1):
         params = {
@@ -33,11 +48,12 @@ def get_weibo_posts(keyword, pages=3, max_retries=2):
         success = False
         for retry in range(max_retries + 1):
             try:
-                response = requests.get('https://m.weibo.cn/api/container/getIndex', params=params, headers=headers)
+                response = session.get('https://m.weibo.cn/api/container/getIndex', params=params, headers=headers)
                 
                 # 检查响应状态
                 if response.status_code != 200:
                     if retry < max_retries:
+                        METRICS.retry('weibo_search', f'http_{response.status_code}')
                         print(f"第{page}页HTTP状态错误: {response.status_code}，第{retry+1}次重试")
                         time.sleep(2)
                         continue
@@ -48,6 +64,7 @@ def get_weibo_posts(keyword, pages=3, max_retries=2):
                 # 检查响应内容是否为空
                 if not response.text.strip():
                     if retry < max_retries:
+                        METRICS.retry('weibo_search', 'empty')
                         print(f"第{page}页返回空响应，第{retry+1}次重试")
                         time.sleep(2)
                         continue
@@ -60,6 +77,7 @@ def get_weibo_posts(keyword, pages=3, max_retries=2):
                     data = response.json()
                 except ValueError as json_error:
                     if retry < max_retries:
+                        METRICS.retry('weibo_search', 'json')
                         print(f"第{page}页JSON解析失败: {json_error}，第{retry+1}次重试")
                         time.sleep(2)
                         continue
@@ -68,30 +86,12 @@ def get_weibo_posts(keyword, pages=3, max_retries=2):
                         print(f"响应内容前200字符: {response.text[:200]}")
                         break
                 
+                METRICS.api_result('weibo_search', data.get('ok'))
                 if data.get('ok') == 1 and 'data' in data:
                     cards = data['data'].get('cards', [])
-                    
-                    for card in cards:
-                        if card.get('card_type') == 9 and 'mblog' in card:
-                            mblog = card['mblog']
-                            
-                            # 提取帖子数据
-                            post = {
-                                'id': mblog.get('id'),
-                                'mid': mblog.get('mid'),
-                                'created_at': mblog.get('created_at'),
-                                'text': clean_text(mblog.get('text', '')),
-                                'attitudes_count': mblog.get('attitudes_count', 0),  # 点赞数
-                                'comments_count': mblog.get('comments_count', 0),    # 评论数
-                                'reposts_count': mblog.get('reposts_count', 0),      # 转发数
-                                'user_id': mblog['user'].get('id'),
-                                'user_name': mblog['user'].get('screen_name'),
-                                'followers_count': mblog['user'].get('followers_count'),
-                                'verified': mblog['user'].get('verified', False),
-                                'verified_reason': mblog['user'].get('verified_reason', '')
-                            }
-                            
-                            all_posts.append(post)
+                    page_posts = parse_posts(data)
+                    METRICS.rows('weibo_search', len(page_posts))
+                    all_posts.extend(page_posts)
                 
                 print(f"第{page}页爬取完成，获取{len(cards) if 'cards' in locals() else 0}条数据")
                 success = True
@@ -99,18 +99,152 @@ def get_weibo_posts(keyword, pages=3, max_retries=2):
                 
             except Exception as e:
                 if retry < max_retries:
+                    METRICS.retry('weibo_search', type(e).__name__)
                     print(f"爬取第{page}页时出错: {e}，第{retry+1}次重试")
                     time.sleep(2)
                 else:
                     print(f"爬取第{page}页时出错: {e}，已达到最大重试次数")
         
         # 随机延迟，防止请求过于频繁
-        if success:
-            delay = random.uniform(1, 3)
-            time.sleep(delay)
+        if success and delay[1] > 0:
+            time.sleep(random.uniform(*delay))
     
     return all_posts
 
+def parse_posts(data):
+    """从搜索接口返回的JSON中提取帖子数据"""
+    posts = []
+    if data.get('ok') != 1 or 'data' not in data:
+        return posts
+    
+    for card in data['data'].get('cards', []):
+        if card.get('card_type') == 9 and 'mblog' in card:
+            mblog = card['mblog']
+            user = mblog.get('user') or {}  # 用户被删除或屏蔽时没有user字段
+            
+            # 提取帖子数据
+            post = {
+                'id': mblog.get('id'),
+                'mid': mblog.get('mid'),
+                'created_at': mblog.get('created_at'),
+                'text': clean_text(mblog.get('text', '')),
+                'attitudes_count': mblog.get('attitudes_count', 0),  # 点赞数
+                'comments_count': mblog.get('comments_count', 0),    # 评论数
+                'reposts_count': mblog.get('reposts_count', 0),      # 转发数
+                'user_id': user.get('id'),
+                'user_name': user.get('screen_name'),
+                'followers_count': user.get('followers_count'),
+                'verified': user.get('verified', False),
+                'verified_reason': user.get('verified_reason', '')
+            }
+            
+            posts.append(post)
+    
+    return posts
+
+def page_list(pages):
+    """页码参数统一为列表：整数n表示1~n页，(start, end)表示闭区间，也可直接传页码列表"""
+    if isinstance(pages, int):
+        return list(range(1, pages + 1))
+    if isinstance(pages, tuple) and len(pages) == 2:
+        return list(range(pages[0], pages[1] + 1))
+    return list(pages)
+
+async def fetch_search_page(session, limiter, keyword, page, max_retries=2):
+    """协程：获取某个关键词的一页搜索结果，失败（含响应格式异常）返回空列表，不影响其他页和其他关键词"""
+    import aiohttp  # 只有异步批量爬取需要aiohttp，单关键词同步爬取不依赖它
+    
+    url = 'https://m.weibo.cn/api/container/getIndex'
+    params = {
+        'containerid': f'100103type=60&q={keyword}&t=',
+        'page_type': 'searchall',
+        'page': str(page),
+    }
+    
+    for retry in range(max_retries + 1):
+        await limiter.acquire(url)
+        try:
+            async with session.get(url, params=params) as response:
+                text = await response.text()
+                
+                if response.status != 200:
+                    error = f"HTTP状态错误: {response.status}"
+                    reason = f'http_{response.status}'
+                elif not text.strip():
+                    error = "返回空响应"
+                    reason = 'empty'
+                else:
+                    data = json.loads(text)
+                    METRICS.api_result('weibo_search', data.get('ok'))
+                    posts = parse_posts(data)
+                    METRICS.rows('weibo_search', len(posts))
+                    return posts
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            error = f"请求出错: {e}"
+            reason = type(e).__name__
+        except (KeyError, TypeError, AttributeError) as e:
+            # JSON不是预期的结构（如不是对象、字段类型不对）
+            error = f"响应格式异常: {e!r}"
+            reason = 'bad_format'
+        
+        if retry < max_retries:
+            METRICS.retry('weibo_search', reason)
+            await asyncio.sleep(2)
+    
+    print(f"关键词'{keyword}'第{page}页{error}，已达到最大重试次数")
+    return []
+
+async def crawl_keywords_async(keywords, pages=3, concurrency=8, requests_per_second=2, max_retries=2):
+    """
+    并发爬取多个关键词的多页搜索结果
+    keywords: 关键词列表
+    pages: 每个关键词的页码，整数/(起始页, 结束页)/页码列表，也可以是 {关键词: 页码} 字典
+    concurrency: 连接池大小（同时进行的请求数上限）
+    requests_per_second: 每个域名每秒最多请求数
+    返回按mid去重后的帖子列表，keywords字段记录该帖子命中的所有关键词
+    """
+    import aiohttp
+    
+    limiter = HostRateLimiter(requests_per_second)
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=20)
+    
+    posts_by_mid = {}
+    
+    async with aiohttp.ClientSession(headers=headers, connector=connector, timeout=timeout,
+                                     trace_configs=[trace_config()]) as session:
+        
+        async def crawl_one_keyword(keyword):
+            keyword_pages = page_list(pages.get(keyword, 3) if isinstance(pages, dict) else pages)
+            tasks = [asyncio.create_task(fetch_search_page(session, limiter, keyword, page, max_retries))
+                     for page in keyword_pages]
+            done_pages, keyword_posts = 0, 0
+            
+            for task in asyncio.as_completed(tasks):
+                page_posts = await task
+                done_pages += 1
+                keyword_posts += len(page_posts)
+                
+                for post in page_posts:
+                    mid = post.get('mid') or post.get('id')
+                    if mid in posts_by_mid:
+                        matched = posts_by_mid[mid]['keywords']
+                        if keyword not in matched.split('|'):
+                            posts_by_mid[mid]['keywords'] = f"{matched}|{keyword}"
+                    else:
+                        post['keywords'] = keyword
+                        posts_by_mid[mid] = post
+                
+                print(f"[{keyword}] {done_pages}/{len(keyword_pages)}页，获取{keyword_posts}条，去重后总计{len(posts_by_mid)}条")
+        
+        await asyncio.gather(*(crawl_one_keyword(keyword) for keyword in keywords))
+    
+    return list(posts_by_mid.values())
+
+def get_weibo_posts_batch(keywords, pages=3, concurrency=8, requests_per_second=2, max_retries=2):
+    """批量爬取多个关键词（同步入口，内部使用异步HTTP连接池）"""
+    return asyncio.run(crawl_keywords_async(keywords, pages, concurrency, requests_per_second, max_retries))
+
 def save_posts_to_csv(posts, keyword):
     """保存帖子数据到CSV文件"""
     if not os.path.exists('results'):
@@ -123,6 +257,9 @@ def save_posts_to_csv(posts, keyword):
     fieldnames = ['id', 'mid', 'created_at', 'text', 'attitudes_count', 
                   'comments_count', 'reposts_count', 'user_id', 'user_name', 
                   'followers_count', 'verified', 'verified_reason']
+    # 批量爬取时额外记录命中的关键词
+    if posts and 'keywords' in posts[0]:
+        fieldnames.append('keywords')
     
     with open(filename, 'w', encoding='utf-8', newline='') as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
@@ -131,22 +268,20 @@ def save_posts_to_csv(posts, keyword):
     
     print(f"CSV数据已保存到 {filename}，共{len(posts)}条帖子")
 
-def clean_text(text):
-    """清理微博文本内容，去除HTML标签和特殊字符"""
-    # 去除HTML标签
-    text = re.sub(r'<[^>]+>', '', text)
-    # 去除URL
-    text = re.sub(r'https?://\S+', '', text)
-    # 去除表情符号代码
-    text = re.sub(r'\[.*?\]', '', text)
-    return text.strip()
-
 if __name__ == "__main__":
-    keyword = input("请输入要搜索的关键词: ")
+    keyword = input("请输入要搜索的关键词（多个关键词用逗号分隔）: ")
     pages = int(input("请输入要爬取的页数: "))
     
-    print(f"开始爬取关键词 '{keyword}' 的微博数据...")
-    posts = get_weibo_posts(keyword, pages)
+    keywords = [k.strip() for k in re.split(r'[,，]', keyword) if k.strip()]
+    # 爬取期间每60秒写一次指标快照，结束时打印各接口耗时汇总
+    with METRICS.exporting('metrics/weibo_posts.json', 'metrics/weibo_posts.prom', interval=60):
+        if len(keywords) > 1:
+            print(f"开始并发爬取 {len(keywords)} 个关键词的微博数据...")
+            posts = get_weibo_posts_batch(keywords, pages)
+            keyword = f"{keywords[0]}等{len(keywords)}个关键词"
+        else:
+            print(f"开始爬取关键词 '{keyword}' 的微博数据...")
+            posts = get_weibo_posts(keyword, pages)
     
     if posts:
         # 保存为CSV格式
@@ -4,8 +4,21 @@ import pandas as pd
 import datetime
 from time import sleep
 import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 # from fake_useragent import UserAgent
-import re
+
+from columnar_writer import ColumnarWriter
+from crawl_metrics import METRICS, instrument_session
+from rate_limiter import TokenBucket
+
+# 评论清洗用的正则在共用模块中预编译，不再每条评论编译一次
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Data Cleaning Code'))
+from text_normalize import strip_html
+
+
 def trans_time(v_str):
     """转换GMT时间为标准格式"""
     GMT_FORMAT = '%a %b %d %H:%M:%S +0800 %Y'
@@ -20,120 +33,175 @@ def tran_gender(gender_tag):
         return '女'
     else:  # -1
         return '未知'
-def get_comments(v_weibo_ids, v_comment_file, v_max_page):
+# 如果cookie失效，会返回-100响应码
+COOKIE = "SCF=AoFJYrZTwGmTshIOqU4XM_wl1jJ-zz9ImSihXG7A2Mdtdtij_Pin1t-0AJmk9mKWlEZd1Z94YgKd_-EOgP9-aD4.; ALF=1764067176; SUB=_2A25F-Yo4DeRhGeFG41MS-S3LyTSIHXVndoPwrDV8PUJbkNANLXKgkW1NeNXnrwxLloLQ4PUB3LhgUZW6fFVVPlZA; SUBP=0033WrSXqPxfM725Ws9jqgMF55529P9D9WWBScXJ4z.-UXG95R_XoX4N5JpX5KMhUgL.FoMR1h201KeNeon2dJLoIp7LxKML1KBLBKnLxKqL1hnLBoMN1hnpe0.0S0zR; SINAGLOBAL=3682539800686.303.1761475187742; ULV=1761639471464:3:3:3:43669868734.157455.1761639471462:1761585572566; PC_TOKEN=5a1feb3bf3; XSRF-TOKEN=bqxChH7-YGcvpp6oBWM0z0DY; WBPSESS=iYR8mHPW8f6JwXuDuy8Ayk7QLuWcLJbhIzjG1sNerg9R5cgnna8g1O8OeODE88_4I3LHGaqM4NJhbglwZDYoq2-b7RmPMrbn3v8_HD9EgbLkP0BDRsC4rYUEXOZLE4m8aoq0tVvb326uGuMiIyWNdg=="
+
+COMMENT_COLUMNS = ['max_id', '微博id', '评论页码', '评论id', '评论时间', '评论点赞数', '评论者IP归属地',
+                   '评论者姓名', '评论者id', '评论者性别', '评论者关注数', '评论者粉丝数', '评论内容']
+# parquet各列固定类型，不再按第一批数据推断（第一批某列全为空时后面的批次会写不进去）；
+# 关注数、粉丝数接口有时返回“1.2万”这样的文本，按string保存，未列出的列均为string
+COMMENT_TYPES = {'max_id': 'int64', '评论页码': 'int64', '评论点赞数': 'int64'}
+
+
+def create_session(cookie=COOKIE, pool_size=1):
+    """所有线程共用一个带cookie的Session，连接池大小与线程数一致"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        "user-agent": 'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/68.0.3440.106 Safari/537.36',
+        "cookie": cookie,
+        "accept": "application/json, text/plain, */*",
+        "accept-encoding": "gzip, deflate, br",
+        "accept-language": "zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7",
+        "x-requested-with": "XMLHttpRequest",
+        "mweibo-pwa": '1',
+    })
+    return instrument_session(session)  # 每个请求的耗时、状态码、字节数记入METRICS
+
+
+def log(weibo_id, message):
+    """多线程时每行带上微博ID，便于区分"""
+    print(f'[{weibo_id}] {message}')
+
+
+def fetch_comment_page(session, weibo_id, max_id, rate_limiter=None):
+    """
+    请求一页评论，响应只解析一次
+    :return: 解析后的json；请求失败或不是json时返回None
+    """
+    if rate_limiter:
+        rate_limiter.acquire()
+    else:
+        sleep(random.uniform(0, 1))  # 随机等待
+    url = 'https://m.weibo.cn/comments/hotflow?id={}&mid={}&max_id_type=0'.format(weibo_id, weibo_id)
+    if str(max_id) != '0':  # 非第一页，需要max_id参数
+        url += '&max_id={}'.format(max_id)
+    try:
+        r = session.get(url, headers={"referer": "https://m.weibo.cn/detail/{}".format(weibo_id)}, timeout=10)
+        return r.json()
+    except (requests.RequestException, ValueError) as e:
+        log(weibo_id, f'请求失败: {e}')
+        return None
+
+
+def parse_comment_rows(weibo_id, page, max_id, datas):
+    """把一页评论数据转换成元组，字段顺序同COMMENT_COLUMNS"""
+    rows = []
+    for data in datas:
+        user = data['user']
+        rows.append((
+            max_id,
+            weibo_id,
+            page,
+            data['id'],  # 评论id
+            trans_time(v_str=data['created_at']),  # 评论时间
+            data['like_count'],  # 评论点赞数
+            data['source'],  # 评论者IP归属地
+            user['screen_name'],  # 评论者姓名
+            user['id'],  # 评论者id
+            tran_gender(user['gender']),  # 评论者性别
+            user['follow_count'],  # 评论者关注数
+            user['followers_count'],  # 评论者粉丝数
+            strip_html(data['text']),  # 评论内容（去除HTML标签）
+        ))
+    return rows
+
+
+def crawl_post_comments(session, weibo_id, v_max_page, save_page, rate_limiter=None, verbose=False):
+    """
+    沿着max_id链爬取一条微博的评论，每页调用一次save_page(rows)
+    :return: 该微博爬到的评论条数
+    """
+    max_id = '0'  # 初始化max_id
+    consecutive_failures = 0  # 初始化连续失败计数器
+    total = 0
+    for page in range(1, v_max_page + 1):
+        if page > 1 and str(max_id) == '0':  # 如果发现max_id为0，说明没有下一页了
+            break
+        result = fetch_comment_page(session, weibo_id, max_id, rate_limiter)
+
+        # 检查响应是否为 {'ok': 0}
+        if not result or result.get('ok') == 0:
+            METRICS.api_result('weibo_comments', result.get('ok') if result else 'invalid')
+            METRICS.retry('weibo_comments', 'ok_0' if result else 'invalid')
+            consecutive_failures += 1
+            if verbose:
+                log(weibo_id, f'第{page}页失败，失败次数: {consecutive_failures}')
+            if consecutive_failures >= 2:
+                log(weibo_id, f'连续 {consecutive_failures} 次失败，停止爬取当前帖子')
+                break
+            continue
+        consecutive_failures = 0  # 如果成功，重置失败计数器
+
+        try:
+            max_id = result['data']['max_id']  # 获取max_id给下页请求用
+            datas = result['data']['data']
+        except (KeyError, TypeError) as e:
+            METRICS.api_result('weibo_comments', 'bad_format')
+            log(weibo_id, f'响应格式异常: {e} {str(result)[:200]}')
+            continue
+        METRICS.api_result('weibo_comments', result.get('ok'))
+
+        with METRICS.stage('weibo_comments_parse'):
+            rows = parse_comment_rows(weibo_id, page, max_id, datas)
+        METRICS.rows('weibo_comments', len(rows))
+        with METRICS.stage('weibo_comments_write'):
+            save_page(rows)
+        total += len(rows)
+        if verbose:
+            log(weibo_id, f'第{page}页: {len(rows)}条评论')
+    return total
+
+
+def get_comments(v_weibo_ids, v_comment_file, v_max_page, max_workers=1, requests_per_second=None, cookie=COOKIE,
+                 verbose=False, format='csv', flush_rows=5000, flush_seconds=30):
     """
     爬取微博评论
-    :param v_weibo_id: 微博id组成的列表
+    :param v_weibo_ids: 微博id组成的列表
     :param v_comment_file: 保存文件名
-    :param v_max_page: 最大页数
-    :return: None
+    :param v_max_page: 每条微博最大页数
+    :param max_workers: 同时爬取的微博数，1为逐条爬取
+    :param requests_per_second: 所有线程共享的每秒请求数上限，None时每次请求前随机等待0~1秒
+    :param cookie: 请求使用的cookie
+    :param verbose: 是否打印每一页的进度
+    :param format: 'csv' 或 'parquet'（需要pyarrow，体积更小、读取更快）
+    :param flush_rows: 缓冲多少条评论写一次文件
+    :param flush_seconds: 距上次写文件超过多少秒也写一次
+    :return: 成功写入的评论总数
     """
-    for weibo_id in v_weibo_ids:
-        print(f'开始爬取微博ID: {weibo_id}')
-        # 初始化max_id
-        max_id = '0'
-        # 初始化连续失败计数器
-        consecutive_failures = 0
-        # 爬取前n页，可任意修改
-        for page in range(1, v_max_page + 1):
-            wait_seconds = random.uniform(0, 1)  # 等待时长秒
-            print('开始等待{}秒'.format(wait_seconds))
-            sleep(wait_seconds)  # 随机等待
-            print('开始爬取第{}页'.format(page))
-            if page == 1:  # 第一页，没有max_id参数
-                url = 'https://m.weibo.cn/comments/hotflow?id={}&mid={}&max_id_type=0'.format(weibo_id, weibo_id)
-            else:  # 非第一页，需要max_id参数
-                if str(max_id) == '0':  # 如果发现max_id为0，说明没有下一页了，break结束循环
-                    print('max_id is 0, break now')
-                    break
-                url = 'https://m.weibo.cn/comments/hotflow?id={}&mid={}&max_id_type=0&max_id={}'.format(weibo_id,
-                                                                                                        weibo_id,
-                                                                                                        max_id)
-            # 发送请求
-            # ua = UserAgent(verify_ssl=False)
-            headers = {
-                "user-agent": 'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/68.0.3440.106 Safari/537.36',
-                # 如果cookie失效，会返回-100响应码
-                "cookie": "SCF=AoFJYrZTwGmTshIOqU4XM_wl1jJ-zz9ImSihXG7A2Mdtdtij_Pin1t-0AJmk9mKWlEZd1Z94YgKd_-EOgP9-aD4.; ALF=1764067176; SUB=_2A25F-Yo4DeRhGeFG41MS-S3LyTSIHXVndoPwrDV8PUJbkNANLXKgkW1NeNXnrwxLloLQ4PUB3LhgUZW6fFVVPlZA; SUBP=0033WrSXqPxfM725Ws9jqgMF55529P9D9WWBScXJ4z.-UXG95R_XoX4N5JpX5KMhUgL.FoMR1h201KeNeon2dJLoIp7LxKML1KBLBKnLxKqL1hnLBoMN1hnpe0.0S0zR; SINAGLOBAL=3682539800686.303.1761475187742; ULV=1761639471464:3:3:3:43669868734.157455.1761639471462:1761585572566; PC_TOKEN=5a1feb3bf3; XSRF-TOKEN=bqxChH7-YGcvpp6oBWM0z0DY; WBPSESS=iYR8mHPW8f6JwXuDuy8Ayk7QLuWcLJbhIzjG1sNerg9R5cgnna8g1O8OeODE88_4I3LHGaqM4NJhbglwZDYoq2-b7RmPMrbn3v8_HD9EgbLkP0BDRsC4rYUEXOZLE4m8aoq0tVvb326uGuMiIyWNdg==",
-                "accept": "application/json, text/plain, */*",
-                "accept-encoding": "gzip, deflate, br",
-                "accept-language": "zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7",
-                "referer": "https://m.weibo.cn/detail/{}".format(weibo_id),
-                "x-requested-with": "XMLHttpRequest",
-                "mweibo-pwa": '1',
-            }
-            r = requests.get(url, headers=headers)  # 发送请求
-            print(r.status_code)  # 查看响应码
-            print(r.json())  # 查看响应内容
-            
-            # 检查响应是否为 {'ok': 0}
-            if r.json().get('ok') == 0:
-                consecutive_failures += 1
-                print(f'失败次数: {consecutive_failures}')
-                if consecutive_failures >= 2:
-                    print(f'连续 {consecutive_failures} 次失败，停止爬取当前帖子')
-                    break
-                continue
-            else:
-                # 如果成功，重置失败计数器
-                consecutive_failures = 0
-                
+    max_workers = max(1, max_workers)
+    session = create_session(cookie, pool_size=max_workers)
+    rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+    # 所有线程共用一个按列缓冲的写入器，攒够一批才写文件；中断时with退出也会写出缓冲区
+    writer = ColumnarWriter(v_comment_file, COMMENT_COLUMNS, format=format, column_types=COMMENT_TYPES,
+                            flush_rows=flush_rows, flush_seconds=flush_seconds)
+
+    def crawl_one(weibo_id):
+        return crawl_post_comments(session, weibo_id, v_max_page, writer.add_rows, rate_limiter, verbose)
+
+    start_time = time.time()
+    total = 0
+    done = 0
+    with writer, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(crawl_one, weibo_id): weibo_id for weibo_id in v_weibo_ids}
+        for future in as_completed(futures):
+            weibo_id = futures[future]
+            done += 1
             try:
-                max_id = r.json()['data']['max_id']  # 获取max_id给下页请求用
-                datas = r.json()['data']['data']
+                count = future.result()
             except Exception as e:
-                print('excepted: ' + str(e))
-                print('Response content:', r.text[:200])  # 打印部分响应内容
+                log(weibo_id, f'✗ 爬取出错: {e}')
                 continue
-            page_list = []  # 评论页码
-            id_list = []  # 评论id
-            text_list = []  # 评论内容
-            time_list = []  # 评论时间
-            like_count_list = []  # 评论点赞数
-            source_list = []  # 评论者IP归属地
-            user_name_list = []  # 评论者姓名
-            user_id_list = []  # 评论者id
-            user_gender_list = []  # 评论者性别
-            follow_count_list = []  # 评论者关注数
-            followers_count_list = []  # 评论者粉丝数
-            for data in datas:
-                page_list.append(page)
-                id_list.append(data['id'])
-                dr = re.compile(r'<[^>]+>', re.S)  # 用正则表达式清洗评论数据
-                text2 = dr.sub('', data['text'])
-                text_list.append(text2)  # 评论内容
-                time_list.append(trans_time(v_str=data['created_at']))  # 评论时间
-                like_count_list.append(data['like_count'])  # 评论点赞数
-                source_list.append(data['source'])  # 评论者IP归属地
-                user_name_list.append(data['user']['screen_name'])  # 评论者姓名
-                user_id_list.append(data['user']['id'])  # 评论者id
-                user_gender_list.append(tran_gender(data['user']['gender']))  # 评论者性别
-                follow_count_list.append(data['user']['follow_count'])  # 评论者关注数
-                followers_count_list.append(data['user']['followers_count'])  # 评论者粉丝数
-            df = pd.DataFrame(
-                {
-                    'max_id': max_id,
-                    '微博id': [weibo_id] * len(time_list),
-                    '评论页码': page_list,
-                    '评论id': id_list,
-                    '评论时间': time_list,
-                    '评论点赞数': like_count_list,
-                    '评论者IP归属地': source_list,
-                    '评论者姓名': user_name_list,
-                    '评论者id': user_id_list,
-                    '评论者性别': user_gender_list,
-                    '评论者关注数': follow_count_list,
-                    '评论者粉丝数': followers_count_list,
-                    '评论内容': text_list,
-                }
-            )
-            if os.path.exists(v_comment_file):  # 如果文件存在，不再设置表头
-                header = False
-            else:  # 否则，设置csv文件表头
-                header = True
-            # 保存csv文件
-            df.to_csv(v_comment_file, mode='a+', index=False, header=header, encoding='utf_8_sig')
-            print('结果保存成功:{}'.format(v_comment_file))
+            total += count
+            log(weibo_id, f'✓ {count}条评论 ({done}/{len(futures)})')
+
+    print(f'全部完成: {len(futures)}条微博, {total}条评论, 用时{time.time() - start_time:.1f}秒')
+    if writer.failed_rows:
+        print(f'✗ {writer.failed_rows}条评论写入失败，已转存到 {writer.failed_path}')
+    print('结果保存成功:{}'.format(v_comment_file))
+    return total
 
 def read_weibo_ids_from_csv(csv_file):
     """
@@ -165,9 +233,14 @@ if __name__ == '__main__':
         weibo_id_list = ['5169109194771664']  # 如果没有读取到ID，使用默认ID
     
     max_page = 10  # 爬取最大页数
-    comment_file = '数据评论.csv'
+    max_workers = 8  # 同时爬取的微博数
+    requests_per_second = 4  # 所有线程合计的每秒请求数
+    output_format = 'csv'  # 评论很多时可改为 'parquet'
+    comment_file = '数据评论.csv' if output_format == 'csv' else '数据评论.parquet'
     # 如果结果文件存在，先删除
     if os.path.exists(comment_file):
         os.remove(comment_file)
-    # 爬取评论
-    get_comments(v_weibo_ids=weibo_id_list, v_comment_file=comment_file, v_max_page=max_page)
+    # 爬取评论；每60秒写一次指标快照（请求耗时、状态码、重试、解析条数），结束时打印汇总
+    with METRICS.exporting('metrics/weibo_comments.json', 'metrics/weibo_comments.prom', interval=60):
+        get_comments(v_weibo_ids=weibo_id_list, v_comment_file=comment_file, v_max_page=max_page,
+                     max_workers=max_workers, requests_per_second=requests_per_second, format=output_format)
@@ -0,0 +1,247 @@
+"""
+大众点评商家 人均价格/评分 分布图（北上广深共用）
+- avg_price、star 整列用 str.extract 解析，不再逐行 apply + re.search
+- 所有城市的数据合并成一张带 city 列的表，价格区间和评分区间各分组统计一次，
+  每个城市的图都从这张汇总表里取数；新增城市只需在 CITY_STYLES 里加一项配色
+- 直接运行本文件：一次读取所有城市数据并生成全部图表
+"""
+import os
+import sys
+from datetime import datetime
+
+import matplotlib.pyplot as plt
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Data Cleaning Code'))
+from excel_cache import read_excel
+
+PRICE_BINS = [0, 500, 800, 1200, 1500, float('inf')]
+PRICE_LABELS = ['0-500 RMB', '501-800 RMB', '801-1200 RMB', '1201-1500 RMB', '>1500 RMB']
+RATING_BINS = [0, 3.5, 4.0, 4.5, 5.0]
+RATING_LABELS = ['<3.5(Poor)', '3.5-4.0(Fair)', '4.0-4.5(Good)', '4.5-5.0 (Excellent)']
+MISSING = 'Missing Data'
+
+# 各城市的清洗数据文件前缀和配色（与原各城市notebook一致）
+CITY_STYLES = {
+    '北京': {
+        'name': 'Beijing',
+        'file_prefix': 'pet_funeral_beijing_cleaned_20251110_202439',
+        'price_colors': ['#64b5f6', '#42a5f5', '#2196f3', '#1976d2', '#0d47a1', '#d0d7e3'],
+        'price_text': '#333',
+        'price_title': '#2c3e50',
+        'rating_colors': ['#b8ddff', '#8ec5fc', '#5bacf4', '#3d85c6', '#d0d7e3'],
+        'rating_text': '#1c4587',
+        'rating_title': '#1c4587',
+        'legend_edge': '#b8ddff',
+        'legend_bottom': False,
+    },
+    '上海': {
+        'name': 'Shanghai',
+        'file_prefix': 'pet_funeral_shanghai_cleaned_20251113_140525',
+        'price_colors': ['#ffddee', '#ffbbcc', '#ff99bb', '#ff77aa', '#ff5599', '#f0e6e6'],
+        'price_text': '#5d4037',
+        'price_title': '#ff5599',
+        'rating_colors': ['#ffeff2', '#ffd9e0', '#ffb8c7', '#ff6d93', '#f0e6e6'],
+        'rating_text': '#6d4c41',
+        'rating_title': '#ff6d93',
+        'legend_edge': '#ffd9e0',
+        'legend_bottom': False,
+    },
+    '广州': {
+        'name': 'Guangzhou',
+        'file_prefix': 'pet_funeral_guangzhou_cleaned_20251114_220208',
+        'price_colors': ['#e8f5e9', '#c8e6c9', '#a5d6a7', '#66bb6a', '#2e7d32', '#e0e0d1'],
+        'price_text': '#2e3b2f',
+        'price_title': '#2e7d32',
+        'rating_colors': ['#e8f5e9', '#c8e6c9', '#a5d6a7', '#2e7d32', '#e0e0d1'],
+        'rating_text': '#2e3b2f',
+        'rating_title': '#2e7d32',
+        'legend_edge': '#c8e6c9',
+        'legend_bottom': True,  # 图例分2列放在底部，避免重叠
+    },
+    '深圳': {
+        'name': 'Shenzhen',
+        'file_prefix': 'pet_funeral_shenzhen_cleaned_20251115_001632',
+        'price_colors': ['#f3e5f5', '#e1bee7', '#ce93d8', '#ba68c8', '#9c27b0', '#e0d4e0'],
+        'price_text': '#333',
+        'price_title': '#6a1b9a',
+        'rating_colors': ['#f3e5f5', '#e1bee7', '#ce93d8', '#9c27b0', '#e0d4e0'],
+        'rating_text': '#4a148c',
+        'rating_title': '#9c27b0',
+        'legend_edge': '#e1bee7',
+        'legend_bottom': True,
+    },
+}
+
+
+def parse_price(prices):
+    """人均价格列 -> 数值（取第一个整数；'人均 -'、空值等为NaN）"""
+    return prices.astype(str).str.extract(r'(\d+)', expand=False).astype(float)
+
+
+def parse_rating(stars):
+    """评分列 -> 数值（'0.0分'、'无评分'、空值等为NaN）"""
+    ratings = stars.astype(str).str.extract(r'(\d+\.?\d*)', expand=False).astype(float)
+    return ratings.where(ratings > 0)
+
+
+def load_city(city, directory=None):
+    """读取某城市最新的清洗数据文件，找不到时返回None"""
+    directory = directory or os.getcwd()
+    style = CITY_STYLES[city]
+    files = [f for f in os.listdir(directory) if f.startswith(style['file_prefix'])]
+    if not files:
+        print(f"❌ No {style['name']} filtered files found!")
+        return None
+    latest_file = max(files, key=lambda x: os.path.getmtime(os.path.join(directory, x)))
+    df = read_excel(os.path.join(directory, latest_file))
+    print(f"✅ Loaded {style['name']} data: {latest_file} (Total: {len(df)} merchants in {style['name']})")
+    return df
+
+
+def combine_cities(frames):
+    """
+    {城市: 清洗后的DataFrame} -> 一张带 city 列的表（价格、评分原值及解析后的数值）
+    值为None的城市（load_city 没找到文件）跳过；一个城市都没有时返回None
+    """
+    parts = [
+        pd.DataFrame({'city': city, 'avg_price': df['avg_price'], 'star': df['star']})
+        for city, df in frames.items() if df is not None
+    ]
+    if not parts:
+        return None
+    combined = pd.concat(parts, ignore_index=True)
+    combined['city'] = pd.Categorical(combined['city'], categories=[c for c in frames if frames[c] is not None])
+    combined['valid_price'] = parse_price(combined['avg_price'])
+    combined['valid_rating'] = parse_rating(combined['star'])
+    return combined
+
+
+def _bin_counts(combined, column, bins, labels):
+    """
+    所有城市一次分组：行为城市，列为各区间 + Missing Data
+    超出区间的值（如评分正好5.0）与原代码一样不计入任何一列
+    """
+    groups = pd.cut(combined[column], bins=bins, labels=labels, right=False)
+    counts = pd.crosstab(combined['city'], groups, dropna=False).reindex(columns=labels, fill_value=0)
+    counts[MISSING] = combined[column].isna().groupby(combined['city'], observed=False).sum()
+    return counts.astype(int)
+
+
+def summarize(combined):
+    """
+    :return: {'total': 各城市商家数, 'price': 价格区间计数表, 'rating': 评分区间计数表}
+    """
+    return {
+        'total': combined.groupby('city', observed=False).size(),
+        'price': _bin_counts(combined, 'valid_price', PRICE_BINS, PRICE_LABELS),
+        'rating': _bin_counts(combined, 'valid_rating', RATING_BINS, RATING_LABELS),
+    }
+
+
+def _save(city_name, kind, output_dir, save_path=None):
+    if save_path is None:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        save_path = os.path.join(output_dir or os.getcwd(), f"{city_name.lower()}_{kind}_distribution_{timestamp}.png")
+    plt.tight_layout()
+    plt.savefig(save_path, dpi=300, bbox_inches='tight', facecolor='white')
+    plt.close()
+    print(f"📁 {city_name} {kind} chart saved to: {save_path}")
+    return save_path
+
+
+def plot_price_distribution(summary, city, output_dir=None, save_path=None):
+    """人均价格分布柱状图（save_path为None时按城市名+时间戳保存到output_dir）"""
+    style = CITY_STYLES[city]
+    price_counts = summary['price'].loc[city]
+    total = summary['total'][city]
+
+    plt.style.use('seaborn-v0_8-whitegrid')
+    plt.rcParams['font.family'] = ['Arial', 'Helvetica']
+    plt.rcParams['axes.unicode_minus'] = False
+
+    fig, ax = plt.subplots(figsize=(12, 7))
+    bars = ax.bar(price_counts.index, price_counts.values, color=style['price_colors'], width=0.65,
+                  edgecolor='white', linewidth=1.5, alpha=0.9)
+
+    # 数据标签（数量+百分比）
+    for bar in bars:
+        height = bar.get_height()
+        percentage = (height / total) * 100
+        ax.text(bar.get_x() + bar.get_width()/2, height + 0.5,
+                f"{int(height)}\n({percentage:.1f}%)",
+                ha='center', va='bottom', fontsize=9, fontweight='bold', color=style['price_text'])
+
+    ax.set_title(f"Per Capita Price Distribution of Pet Funeral Merchants in {style['name']}",
+                 fontsize=16, fontweight='bold', color=style['price_title'])
+    ax.set_xlabel('Price Range', fontsize=12, fontweight='medium')
+    ax.set_ylabel('Number of Merchants', fontsize=12, fontweight='medium')
+
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.tick_params(axis='x', labelsize=10, rotation=30)
+    ax.tick_params(axis='y', labelsize=10)
+    ax.set_ylim(0, max(price_counts.values) * 1.2)
+    return _save(style['name'], 'price', output_dir, save_path)
+
+
+def plot_rating_distribution(summary, city, output_dir=None, save_path=None):
+    """评分分布饼图"""
+    style = CITY_STYLES[city]
+    rating_counts = summary['rating'].loc[city]
+    rating_labels = RATING_LABELS + [MISSING]
+
+    plt.style.use('seaborn-v0_8-white')
+    plt.rcParams['font.family'] = ['Arial', 'Helvetica']
+
+    fig, ax = plt.subplots(figsize=(9, 9))
+    wedges, texts, autotexts = ax.pie(
+        rating_counts.values,
+        labels=rating_labels,
+        colors=style['rating_colors'],
+        autopct='%1.1f%%',
+        startangle=90,
+        pctdistance=0.82,
+        labeldistance=1.1,
+        wedgeprops={'edgecolor': 'white', 'linewidth': 2},
+        textprops={'fontsize': 11}
+    )
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontweight('bold')
+    for text in texts:
+        text.set_fontweight('bold')
+        text.set_color(style['rating_text'])
+
+    ax.set_title(f"Distribution of Pet Funeral Merchant Ratings in {style['name']}",
+                 fontsize=16, fontweight='bold', color=style['rating_title'])
+    legend_labels = [f'{label} (n={int(rating_counts.iloc[i])})' for i, label in enumerate(rating_labels)]
+    if style['legend_bottom']:
+        ax.legend(legend_labels, loc='center', bbox_to_anchor=(0.5, -0.1), ncol=2,
+                  fontsize=10, frameon=True, edgecolor=style['legend_edge'])
+    else:
+        ax.legend(legend_labels, loc='center left', bbox_to_anchor=(1, 0.5),
+                  fontsize=10, frameon=True, edgecolor=style['legend_edge'])
+    return _save(style['name'], 'rating', output_dir, save_path)
+
+
+def render_city_charts(cities=None, directory=None, output_dir=None):
+    """
+    读取各城市数据 -> 合并 -> 一次分组 -> 逐个城市出图
+    cities: 城市列表，None为 CITY_STYLES 中的全部城市
+    :return: 汇总结果（见 summarize）
+    """
+    cities = list(cities or CITY_STYLES)
+    combined = combine_cities({city: load_city(city, directory) for city in cities})
+    if combined is None:
+        print("❌ 没有可用的城市数据")
+        return None
+    summary = summarize(combined)
+    for city in summary['total'].index:
+        plot_price_distribution(summary, city, output_dir)
+        plot_rating_distribution(summary, city, output_dir)
+    return summary
+
+
+if __name__ == "__main__":
+    render_city_charts()